@@ -20,6 +20,10 @@ from utils.memory.conversation_manager import ConversationManager
 from utils.voice_manager import VoiceManager, VoiceState
 from utils.piper import llm_speak
 from utils.llm_exchange_logger import LLMExchangeLogger
+from utils.tracing import Tracer
+from utils.profiler import Profiler
+from models import fact_store
+from core.profile_prompt import ProfilePrompt
 
 # Set up logging
 logger = logging.getLogger("jupiter.core.chat_engine")
@@ -27,6 +31,9 @@ logger = logging.getLogger("jupiter.core.chat_engine")
 class ChatEngine:
     """Core chat functionality for Jupiter"""
     
+    # Default number of messages shown per /conversation page
+    CONVERSATION_PAGE_SIZE = 20
+    
     def __init__(self, llm_client, user_data_manager, logger, ui, config, test_mode=False):
         """Initialize chat engine with dependencies"""
         self.llm_client = llm_client
@@ -40,7 +47,15 @@ class ChatEngine:
         self.current_platform = "terminal"
         
         # Initialize conversation manager (replaces conversation_history)
-        self.conversation_manager = ConversationManager(config, user_data_manager)
+        self.conversation_manager = ConversationManager(config, user_data_manager, llm_client)
+        
+        # Rendered "What You Know About The User" blocks, shared by every platform
+        self.profile_prompt = ProfilePrompt(
+            user_data_manager,
+            self.conversation_manager.tokenizer,
+            token_budget=config.get('chat', {}).get('profile_token_budget', 300),
+            half_life_days=getattr(user_data_manager, 'fact_half_life_days', 90)
+        )
         
         # Create necessary folders
         os.makedirs(config['paths']['prompt_folder'], exist_ok=True)
@@ -59,7 +74,24 @@ class ChatEngine:
         self.voice_manager = self._initialize_voice_manager()
         
         # Initialize LLM exchange logger
-        self.exchange_logger = LLMExchangeLogger(config['paths']['logs_folder'])
+        retention_config = config.get('log_retention', {})
+        self.exchange_logger = LLMExchangeLogger(
+            config['paths']['logs_folder'],
+            max_bytes=retention_config.get('max_file_mb', 10) * 1024 * 1024,
+            max_age=retention_config.get('max_file_age_hours', 24) * 3600
+        )
+        
+        # Per-turn latency spans, shared with Discord (see /perf)
+        tracing_config = config.get('tracing', {})
+        self.tracer = Tracer(
+            config['paths']['logs_folder'],
+            enabled=tracing_config.get('enabled', True),
+            samples_per_stage=tracing_config.get('samples_per_stage', 1000)
+        )
+        
+        # Opt-in profiling of upcoming turns (main.py --profile-* flags or /profile)
+        self.profiler = Profiler(config['paths']['logs_folder'])
+        self.tracer.add_turn_hook(self.profiler.turn)
         
         if self.test_mode:
             print(f"🧪 ChatEngine initialized in TEST MODE")
@@ -137,51 +169,40 @@ class ChatEngine:
                 f.write(default_prompt)
             return default_prompt
     
-    def format_user_information(self):
-        """Format user information for inclusion in system prompt"""
-        user_info = self.user_data_manager.current_user
-        
-        if not user_info or len(user_info) <= 1:  # Only contains name
-            return ""
-            
-        # Start with header
-        formatted_info = "\n\n## What You Know About The User\n"
-        
-        # Basic identity information
-        formatted_info += f"- Name: {user_info.get('name', 'Unknown')}\n"
+    def format_user_information(self, user=None):
+        """Format user information for inclusion in system prompt
         
-        # Add other information categories
-        for category, value in user_info.items():
-            # Skip name as it's already added
-            if category == 'name':
-                continue
-                
-            # Skip system fields
-            if category in ['user_id', 'created_at', 'last_seen', 'platforms', 'conversations']:
-                continue
-                
-            # Format lists (likes, dislikes, etc.)
-            if isinstance(value, list) and value:
-                formatted_info += f"- {category.capitalize()}: {', '.join(value)}\n"
-            # Format simple key-value pairs
-            elif value and not isinstance(value, list) and not isinstance(value, dict):
-                formatted_info += f"- {category.capitalize()}: {value}\n"
-        
-        return formatted_info
+        The block is kept within chat.profile_token_budget tokens and cached
+        until the user's profile changes (see core.profile_prompt).
+        """
+        return self.profile_prompt.render(user or self.user_data_manager.current_user)
+    
+    def get_prompt_blocks(self, user=None):
+        """Get the fixed blocks the LLM prompt starts with: system prompt and user information"""
+        with self.tracer.span("prompt.load"):
+            system_prompt = self.load_system_prompt()
+        with self.tracer.span("prompt.profile"):
+            user_info = self.format_user_information(user)
+        return [system_prompt, user_info]
     
-    def prepare_message_for_llm(self, user_input):
-        """Prepare complete message for LLM with history and prompt using conversation manager"""
+    def prepare_message_for_llm(self, user_input, prompt_blocks=None, user=None):
+        """Prepare complete message for LLM with history and prompt using conversation manager
+        
+        The prompt is built for user (default: the current user); threads
+        answering other users, such as Discord's workers, pass theirs.
+        """
         # Load and enhance system prompt
-        system_prompt = self.load_system_prompt()
-        user_info = self.format_user_information()
-        enhanced_system_prompt = system_prompt + user_info
+        enhanced_system_prompt = "".join(prompt_blocks or self.get_prompt_blocks(user))
         
         # Use conversation manager to prepare the message with appropriate context
-        return self.conversation_manager.prepare_for_llm(
-            user_input,
-            enhanced_system_prompt,
-            self.config['llm']['token_limit']
-        )
+        # (history truncation, memory recall and assembly)
+        with self.tracer.span("prompt.context"):
+            return self.conversation_manager.prepare_for_llm(
+                user_input,
+                enhanced_system_prompt,
+                self.config['llm']['token_limit'],
+                user=user
+            )
     
     def get_user_prefix(self):
         """Return user prefix based on known name"""
@@ -210,7 +231,7 @@ class ChatEngine:
         }
         
         # Track which keys we've processed
-        processed_keys = set(['user_id', 'created_at', 'last_seen', 'platforms'])  # Skip system fields
+        processed_keys = set(['user_id', 'created_at', 'last_seen', 'platforms', fact_store.META_FIELD])  # Skip system fields
         
         # Add information by category groups
         for category_group, keys in categories.items():
@@ -302,7 +323,9 @@ class ChatEngine:
                     "user_manager": self.user_data_manager,
                     "llm_client": self.llm_client,
                     "client": getattr(self, "client", None),
-                    "conversation_manager": self.conversation_manager
+                    "conversation_manager": self.conversation_manager,
+                    "tracer": self.tracer,
+                    "profiler": self.profiler
                 }
                 
                 # Execute the command handler
@@ -398,7 +421,7 @@ class ChatEngine:
             help_text += "- `/voice on|off` - Enable or disable voice recognition\n"
             help_text += "- `/memory` - Show what I remember about you\n"
             help_text += "- `/history [limit|with username]` - Show conversation history\n"
-            help_text += "- `/conversation [ID|current]` - View a specific conversation\n"
+            help_text += "- `/conversation [ID|current] [page] [size]` - View a specific conversation (page 1 is the most recent)\n"
             help_text += "- `/search [query]` - Search your conversations\n"
             
             # Add test mode info
@@ -445,6 +468,11 @@ class ChatEngine:
         if not conversations:
             return "You don't have any saved conversations yet."
         
+        # Resolve all participant names in one batch
+        names = self.user_data_manager.get_user_names(
+            [p_id for conv in conversations for p_id in conv["participants"]]
+        )
+        
         # Format output
         result = f"## Your Recent Conversations (Last {len(conversations)})\n\n"
         
@@ -452,14 +480,9 @@ class ChatEngine:
             # Format date
             date_str = datetime.datetime.fromtimestamp(conv["created_at"]).strftime("%Y-%m-%d %H:%M")
             
-            # Get participant names
-            participant_names = []
-            for p_id in conv["participants"]:
-                if p_id == user_id:
-                    continue  # Skip current user
-                user = self.user_data_manager.get_user_by_id(p_id)
-                if user:
-                    participant_names.append(user.get("name", "Unknown"))
+            # Get participant names (skipping the current user)
+            participant_names = [names[p_id] for p_id in conv["participants"]
+                                 if p_id != user_id and p_id in names]
             
             # Format participants
             with_users = ""
@@ -516,7 +539,9 @@ class ChatEngine:
         Handle /conversation command to view a specific conversation
         
         Arguments:
-            args: Command arguments - can be 'current' or a conversation ID
+            args: Command arguments - 'current' or a conversation ID, optionally
+                  followed by a page number (1 = most recent messages) and a
+                  page size
             
         Returns:
             Formatted conversation display
@@ -525,53 +550,76 @@ class ChatEngine:
         if not args:
             return "Please specify a conversation ID or 'current' to view the current conversation."
         
+        parts = args.split()
+        
         # Handle 'current' shortcut
-        if args.lower() == 'current':
+        if parts[0].lower() == 'current':
             conversation_id = self.conversation_manager.current_conversation_id
             if not conversation_id:
                 return "No active conversation found."
         else:
             # Use the provided ID
-            conversation_id = args.strip()
+            conversation_id = parts[0].strip()
+        
+        # Parse paging arguments
+        try:
+            page = int(parts[1]) if len(parts) > 1 else 1
+            page_size = int(parts[2]) if len(parts) > 2 else self.CONVERSATION_PAGE_SIZE
+        except ValueError:
+            return "Usage: /conversation [ID|current] [page] [page size]"
+        
+        if page < 1 or page_size < 1:
+            return "Page number and page size must be positive."
         
-        # Get the conversation
-        conversation = self.conversation_manager.get_conversation(conversation_id)
+        # Get the conversation metadata without loading its messages
+        conversation = self.conversation_manager.get_conversation_info(conversation_id)
         if not conversation:
             return f"Conversation with ID '{conversation_id}' not found."
         
-        # Format the conversation
-        messages = conversation.get("messages", [])
-        if not messages:
+        total = conversation["message_count"]
+        if not total:
             return f"Conversation '{conversation['title']}' exists but has no messages."
         
+        # Pages are counted back from the newest message
+        total_pages = (total + page_size - 1) // page_size
+        if page > total_pages:
+            return f"Conversation '{conversation['title']}' only has {total_pages} page(s) of {page_size} messages."
+        
+        messages = self.conversation_manager.get_conversation_messages(
+            conversation_id,
+            limit=page_size,
+            offset=(page - 1) * page_size
+        )
+        
         # Format date
         date_str = datetime.datetime.fromtimestamp(conversation["created_at"]).strftime("%Y-%m-%d %H:%M")
         
-        # Get participant names
-        participant_names = []
-        for p_id in conversation["participants"]:
-            user = self.user_data_manager.get_user_by_id(p_id)
-            if user:
-                participant_names.append(user.get("name", "Unknown"))
+        # Resolve participant and sender names in one batch
+        names = self.user_data_manager.get_user_names(
+            list(conversation["participants"]) + [msg.get("sender_id", "unknown") for msg in messages]
+        )
+        names["jupiter"] = "Jupiter"
+        participant_names = [names[p_id] for p_id in conversation["participants"] if p_id in names]
         
         # Format output
+        first_shown = total - (page - 1) * page_size - len(messages) + 1
+        last_shown = first_shown + len(messages) - 1
+        
         result = f"# {conversation['title']}\n"
         result += f"Date: {date_str}\n"
-        result += f"Participants: {', '.join(participant_names)}\n\n"
+        result += f"Participants: {', '.join(participant_names)}\n"
+        result += f"Page {page} of {total_pages} (messages {first_shown}-{last_shown} of {total})\n\n"
         
         # Add messages
         for msg in messages:
-            sender_id = msg.get("sender_id", "unknown")
+            sender_name = names.get(msg.get("sender_id", "unknown"), "Unknown")
             content = msg.get("content", "")
             
-            if sender_id == "jupiter":
-                sender_name = "Jupiter"
-            else:
-                user = self.user_data_manager.get_user_by_id(sender_id)
-                sender_name = user.get("name", "Unknown") if user else "Unknown"
-            
             result += f"**{sender_name}**: {content}\n\n"
         
+        if page < total_pages:
+            result += f"Use `/conversation {conversation_id} {page + 1}` to view older messages."
+        
         return result
 
     def _handle_search_command(self, args):
@@ -598,6 +646,12 @@ class ChatEngine:
         if not results:
             return f"No results found for '{args}'."
         
+        # Resolve the names of every sender shown in one batch
+        names = self.user_data_manager.get_user_names(
+            [message.get("sender_id", "unknown") for result in results for message in result['matches'][:3]]
+        )
+        names["jupiter"] = "Jupiter"
+        
         # Format output
         output = f"# Search Results for '{args}'\n\n"
         
@@ -610,13 +664,7 @@ class ChatEngine:
             # Show sample matches (limited to first 3)
             output += "**Sample matches:**\n"
             for j, message in enumerate(result['matches'][:3], 1):
-                sender_id = message.get("sender_id", "unknown")
-                if sender_id == "jupiter":
-                    sender_name = "Jupiter"
-                else:
-                    user = self.user_data_manager.get_user_by_id(sender_id)
-                    sender_name = user.get("name", "Unknown") if user else "Unknown"
-                    
+                sender_name = names.get(message.get("sender_id", "unknown"), "Unknown")
                 content = message.get("content", "")
                 
                 # Truncate very long messages
@@ -693,22 +741,26 @@ class ChatEngine:
                     self.exchange_logger.end_session(user_id, delete_logs=False)
                 break
                 
-            # Log user input
-            self.logger.log_message(user_prefix, user_input)
-            
-            # Check for intent triggers
-            if self._process_intent(user_input):
-                continue
-            
-            # Check for commands
-            command_response = self.handle_user_commands(user_input)
-            if command_response:
-                self.ui.print_jupiter_message(command_response)
-                self.logger.log_message("Jupiter:", command_response)
-                continue
+            with self.tracer.turn(self.current_platform):
+                # Log user input
+                with self.tracer.span("persist"):
+                    self.logger.log_message(user_prefix, user_input)
                 
-            # Process normal input
-            self._process_and_respond(user_input, user_prefix)
+                # Check for intent triggers
+                with self.tracer.span("intent"):
+                    handled = self._process_intent(user_input)
+                if handled:
+                    continue
+                
+                # Check for commands
+                command_response = self.handle_user_commands(user_input)
+                if command_response:
+                    self.ui.print_jupiter_message(command_response)
+                    self.logger.log_message("Jupiter:", command_response)
+                    continue
+                    
+                # Process normal input
+                self._process_and_respond(user_input, user_prefix)
     
     def handle_initial_greeting(self):
         """Handle initial greeting and user identification"""
@@ -795,58 +847,68 @@ class ChatEngine:
     
     def _process_and_respond(self, user_input, user_prefix):
         """Process user input and generate response using conversation manager"""
-        # Get current user ID
-        user_id = self.user_data_manager.current_user.get('user_id', 'unknown')
-        
-        # Add to conversation context
-        self.conversation_manager.add_to_context(user_id, user_input, "user")
-        
-        # Generate response
-        llm_message = self.prepare_message_for_llm(user_input)
-        response = self.llm_client.generate_chat_response(
-            llm_message, 
-            temperature=self.config['llm']['chat_temperature']
-        )
-        
-        # Validate and clean the response
-        response = self._validate_response(response)
-        
-        # If response is empty after validation, retry with modified prompt
-        retry_count = 0
-        max_retries = 2
-        
-        while not response.strip() and retry_count < max_retries:
-            self.logger.warning(f"Empty response detected, retrying ({retry_count+1}/{max_retries})")
+        with self.tracer.turn(self.current_platform):
+            # Get current user ID
+            user_id = self.user_data_manager.current_user.get('user_id', 'unknown')
             
-            # Modify the prompt to instruct LLM to avoid user names
-            retry_message = llm_message + "\n\nIMPORTANT: Your previous response was filtered. A response MUST be provided without mentioning yours or the user's names."
+            # Add to conversation context
+            with self.tracer.span("persist"):
+                self.conversation_manager.add_to_context(user_id, user_input, "user")
             
-            # Try again with modified prompt
-            response = self.llm_client.generate_chat_response(
-                retry_message,
-                temperature=self.config['llm']['chat_temperature'] * 0.9  # Slightly reduce temperature
-            )
+            # Generate response
+            prompt_blocks = self.get_prompt_blocks()
+            llm_message = self.prepare_message_for_llm(user_input, prompt_blocks)
+            with self.tracer.span("llm"):
+                response = self.llm_client.generate_chat_response(
+                    llm_message, 
+                    temperature=self.config['llm']['chat_temperature']
+                )
             
-            # Validate again
-            response = self._validate_response(response)
-            retry_count += 1
-        
-        # If still empty, provide a fallback message
-        if not response.strip():
-            response = "I apologize, but I'm having trouble generating an appropriate response. Could you please rephrase your question or ask something else?"
-        
-        # Log the complete exchange
-        self.exchange_logger.log_exchange(user_id, llm_message, user_input, response)
-        
-        # Output response
-        self.ui.print_jupiter_message(response)
-        self.logger.log_message("Jupiter:", response)
-        self._speak_response(response)
-        
-        # Add to conversation context
-        self.conversation_manager.add_to_context(self.ai_name.lower(), response, "assistant")
-        
-        return response
+            # Validate and clean the response
+            with self.tracer.span("validate"):
+                response = self._validate_response(response)
+            
+            # If response is empty after validation, retry with modified prompt
+            retry_count = 0
+            max_retries = 2
+            
+            while not response.strip() and retry_count < max_retries:
+                self.logger.warning(f"Empty response detected, retrying ({retry_count+1}/{max_retries})")
+                
+                # Modify the prompt to instruct LLM to avoid user names
+                retry_message = llm_message + "\n\nIMPORTANT: Your previous response was filtered. A response MUST be provided without mentioning yours or the user's names."
+                
+                # Try again with modified prompt
+                with self.tracer.span("retry"):
+                    response = self.llm_client.generate_chat_response(
+                        retry_message,
+                        temperature=self.config['llm']['chat_temperature'] * 0.9  # Slightly reduce temperature
+                    )
+                    
+                    # Validate again
+                    response = self._validate_response(response)
+                retry_count += 1
+            
+            # If still empty, provide a fallback message
+            if not response.strip():
+                response = "I apologize, but I'm having trouble generating an appropriate response. Could you please rephrase your question or ask something else?"
+            
+            # Log the complete exchange
+            with self.tracer.span("persist"):
+                self.exchange_logger.log_exchange(user_id, llm_message, user_input, response, prompt_blocks)
+            
+            # Output response
+            self.ui.print_jupiter_message(response)
+            with self.tracer.span("persist"):
+                self.logger.log_message("Jupiter:", response)
+            with self.tracer.span("tts"):
+                self._speak_response(response)
+            
+            # Add to conversation context
+            with self.tracer.span("persist"):
+                self.conversation_manager.add_to_context(self.ai_name.lower(), response, "assistant")
+            
+            return response
     
     def _process_intent(self, user_input):
         """Process input for intent recognition, returns True if handled"""
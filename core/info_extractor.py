@@ -1,29 +1,98 @@
 import os
 import json
 import re
+import time
 import datetime
+import threading
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import tiktoken  # For token counting
+
+from utils.log_retention import open_log
+
+# Categories that hold a list of values rather than a single value
+LIST_CATEGORIES = ['likes', 'dislikes', 'interests', 'hobbies']
 
 class InfoExtractor:
-    """Analyzes chat logs to extract important user information"""
+    """Analyzes stored conversations and chat logs to extract important user information"""
     
-    def __init__(self, llm_client, user_data_manager, logs_folder, prompt_folder, ui=None, test_mode=False):
-        """Initialize the info extractor"""
+    def __init__(self, llm_client, user_data_manager, logs_folder, prompt_folder, ui=None, test_mode=False,
+                 max_workers=2, chat_logger=None, interval_minutes=10, min_new_messages=3,
+                 conversation_manager=None, sources=None, token_limit=8192, response_tokens=1024):
+        """Initialize the info extractor
+        
+        sources selects where messages come from: "conversations" reads new
+        messages from the conversation store (every platform, attributed by
+        sender_id), "logs" parses the terminal's text logs. Defaults to
+        conversations when a conversation_manager is given.
+        
+        chat_logger is the session's Logger; its current log file is treated
+        as active and read incrementally every interval_minutes, once it has
+        at least min_new_messages new user messages.
+        
+        Message text that doesn't fit in token_limit (less the extraction
+        prompt and response_tokens) is split into chunks extracted in
+        parallel, and the results are merged before the profile is updated.
+        """
         self.llm_client = llm_client
         self.user_data_manager = user_data_manager
         self.logs_folder = logs_folder
         self.prompt_folder = prompt_folder
         self.ui = ui
         self.test_mode = test_mode
+        self.max_workers = max(1, max_workers)
+        self.chat_logger = chat_logger
+        self.interval = max(0, interval_minutes) * 60
+        self.min_new_messages = max(1, min_new_messages)
+        self.conversation_manager = conversation_manager
+        if sources is None:
+            sources = ["conversations"] if conversation_manager else ["logs"]
+        self.sources = set(sources)
+        if "conversations" in self.sources and not conversation_manager:
+            print("InfoExtractor Error: No conversation manager, conversation extraction disabled")
+            self.sources.discard("conversations")
+        
+        # Guards processed-log bookkeeping, which worker threads share
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        
+        # At most max_workers extraction calls are in flight at once; chunks of
+        # one oversized extraction run on their own pool, so tasks waiting on
+        # their chunks never starve them
+        self.llm_slots = threading.BoundedSemaphore(self.max_workers)
+        self.chunk_executor = None
         
         # Load extraction prompt
         self.extraction_prompt = self.load_extraction_prompt()
         
+        # Token budget for the conversation text of one extraction call
+        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        prompt_tokens = len(self.tokenizer.encode(self.extraction_prompt)) + 50  # Framing around the text
+        self.chunk_tokens = max(256, token_limit - prompt_tokens - response_tokens)
+        
         # File to track processed logs
         self.processed_logs_file = os.path.join(logs_folder, "processed_logs.json")
         
-        # Initialize processed logs tracking
+        # Initialize processed logs tracking: finished logs in a set, partly
+        # read logs as {path: {"offset", "mtime", "user"}} checkpoints, and
+        # stored conversations as {conversation_id: messages processed}
         self.processed_logs = self.load_processed_logs()
+        upgrading = "conversations" not in self.processed_logs
+        self.processed_logs.setdefault("processed", [])
+        self.processed_logs.setdefault("checkpoints", {})
+        self.processed_logs.setdefault("conversations", {})
+        self.processed = set(self.processed_logs["processed"])
+        
+        # On the first start after an upgrade there are no conversation
+        # checkpoints yet, but the stored history is what the chat logs hold:
+        # every conversation is checkpointed as it stands (before this
+        # session adds anything) and the finished logs are extracted once
+        # instead, so nothing is extracted twice or skipped
+        if upgrading and "conversations" in self.sources:
+            if "logs" not in self.sources:
+                self.processed_logs["catch_up_logs"] = True
+            self.seed_conversation_checkpoints()
         
         if self.test_mode:
             print(f"🧪 InfoExtractor initialized in TEST MODE - No log processing will occur")
@@ -75,7 +144,7 @@ DO NOT include any explanations outside the JSON. ONLY return valid JSON.
                     return {"processed": []}
         else:
             # Create new processed logs file if it doesn't exist
-            processed_logs = {"processed": []}
+            processed_logs = {"processed": [], "conversations": {}}
             with open(self.processed_logs_file, 'w', encoding='utf-8') as f:
                 json.dump(processed_logs, f, indent=4)
             return processed_logs
@@ -85,33 +154,85 @@ DO NOT include any explanations outside the JSON. ONLY return valid JSON.
         with open(self.processed_logs_file, 'w', encoding='utf-8') as f:
             json.dump(self.processed_logs, f, indent=4)
     
+    @staticmethod
+    def _log_key(log_file):
+        """Bookkeeping key for a log, the same before and after it is compressed"""
+        return log_file[:-len(".gz")] if log_file.endswith(".gz") else log_file
+    
     def mark_log_as_processed(self, log_file):
         """Add log file to list of processed logs"""
-        if log_file not in self.processed_logs["processed"]:
-            self.processed_logs["processed"].append(log_file)
+        log_file = self._log_key(log_file)
+        with self.lock:
+            self.processed_logs["checkpoints"].pop(log_file, None)
+            if log_file not in self.processed:
+                self.processed.add(log_file)
+                self.processed_logs["processed"].append(log_file)
+            self.save_processed_logs()
+    
+    def save_checkpoint(self, log_file, offset, mtime, user_prefix):
+        """Record how far into a still-active log extraction has read"""
+        log_file = self._log_key(log_file)
+        with self.lock:
+            self.processed_logs["checkpoints"][log_file] = {"offset": offset, "mtime": mtime, "user": user_prefix}
+            self.save_processed_logs()
+    
+    def save_conversation_checkpoint(self, conversation_id, message_count):
+        """Record how many of a conversation's messages have been processed"""
+        with self.lock:
+            self.processed_logs["conversations"][conversation_id] = message_count
             self.save_processed_logs()
     
+    def get_active_log(self):
+        """Get the log file the current chat session is writing to, if any"""
+        if self.chat_logger:
+            return self.chat_logger.get_current_log_file()
+        return None
+    
     def get_unprocessed_logs(self):
-        """Get list of log files that haven't been processed yet"""
-        # Get all log files (only .log format)
-        all_logs = []
-        for file in os.listdir(self.logs_folder):
-            if file.startswith("jupiter_chat_") and file.endswith(".log"):
-                all_logs.append(os.path.join(self.logs_folder, file))
+        """Get list of log files that have content not yet processed"""
+        # Buffered lines must reach the active log before its size and mtime are checked
+        if self.chat_logger:
+            self.chat_logger.flush()
+        active_log = self.get_active_log()
+        unprocessed_logs = {}
         
-        # Filter out already processed logs
-        unprocessed_logs = [log for log in all_logs if log not in self.processed_logs["processed"]]
+        with os.scandir(self.logs_folder) as entries:
+            for entry in entries:
+                # Only .log format, compressed by log retention or not
+                if not (entry.name.startswith("jupiter_chat_") and entry.name.endswith((".log", ".log.gz"))):
+                    continue
+                key = self._log_key(entry.path)
+                if key in self.processed:
+                    continue
+                
+                # An active log untouched since its last checkpoint has nothing new
+                checkpoint = self.processed_logs["checkpoints"].get(key)
+                if entry.path == active_log and checkpoint and entry.stat().st_mtime <= checkpoint["mtime"]:
+                    continue
+                
+                # While a log is being compressed both copies exist; either holds all of it
+                unprocessed_logs[key] = entry.path
         
-        return unprocessed_logs
+        return sorted(unprocessed_logs.values())
     
-    def read_log_file(self, log_file):
-        """Read and parse a log file into a list of messages"""
+    def read_log_file(self, log_file, offset=0, user_prefix=None):
+        """Read and parse a log file from a byte offset into a list of messages
+        
+        Only complete lines are consumed. Returns the messages, the user
+        prefix and the offset just past the last line read.
+        """
         messages = []
-        user_prefix = None
+        end_offset = offset
         
         try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            with open_log(log_file, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+                
+                # Leave a partly written last line for the next read
+                data = data[:data.rfind(b"\n") + 1]
+                end_offset = offset + len(data)
+                lines = data.decode('utf-8', errors='replace').splitlines()
                 
                 for line in lines:
                     # Skip empty lines and the header
@@ -132,7 +253,7 @@ DO NOT include any explanations outside the JSON. ONLY return valid JSON.
                             role_with_colon = role
                         
                         # Identify user_prefix (any non-system role)
-                        system_roles = ["Jupiter:", "InfoExtractor:", "InfoExtractor Error:"]
+                        system_roles = ["Jupiter:", "System:", "System Error:", "InfoExtractor:", "InfoExtractor Error:"]
                         if role_with_colon not in system_roles:
                             if not user_prefix:  # Only set if not already set
                                 user_prefix = role_with_colon
@@ -143,7 +264,7 @@ DO NOT include any explanations outside the JSON. ONLY return valid JSON.
         except Exception as e:
             print(f"InfoExtractor Error: Failed to read log file {log_file}: {str(e)}")
         
-        return messages, user_prefix
+        return messages, user_prefix, end_offset
     
     def parse_llm_response(self, response):
         """Parse the JSON response from the LLM"""
@@ -170,7 +291,7 @@ DO NOT include any explanations outside the JSON. ONLY return valid JSON.
     def identify_username_from_log(self, log_file):
         """Try to extract the username from a log file"""
         try:
-            with open(log_file, 'r', encoding='utf-8') as f:
+            with open_log(log_file) as f:
                 content = f.read()
                 
                 # Look for user prefix pattern
@@ -198,86 +319,361 @@ DO NOT include any explanations outside the JSON. ONLY return valid JSON.
             print(f"InfoExtractor Error: Failed to identify username from log: {str(e)}")
             return "User"
     
-    def process_log_file(self, log_file):
-        """Process a single log file and extract information"""
+    def process_log_file(self, log_file, final=True):
+        """Process the unread part of a log file and extract information
+        
+        A final pass marks the log as processed. Otherwise (the active
+        session's log) the read position is checkpointed, and nothing is
+        consumed until at least min_new_messages user messages are waiting.
+        """
         if self.test_mode:
             print(f"TEST MODE: Skipping log processing for {os.path.basename(log_file)}")
             self.mark_log_as_processed(log_file)
             return
-            
-        print(f"InfoExtractor: Processing log file {os.path.basename(log_file)}")
         
-        # Read messages from log
-        messages, user_prefix = self.read_log_file(log_file)
-        if not messages:
-            print(f"InfoExtractor: No messages found in log file {os.path.basename(log_file)}")
-            self.mark_log_as_processed(log_file)
+        checkpoint = self.processed_logs["checkpoints"].get(self._log_key(log_file), {})
+        
+        try:
+            # Taken before reading, so a write racing the read shows up next time
+            mtime = os.stat(log_file).st_mtime
+        except OSError as e:
+            print(f"InfoExtractor Error: Failed to read log file {log_file}: {str(e)}")
             return
         
+        if final:
+            print(f"InfoExtractor: Processing log file {os.path.basename(log_file)}")
+        
+        # Read messages from log
+        messages, user_prefix, end_offset = self.read_log_file(log_file, checkpoint.get("offset", 0),
+                                                               checkpoint.get("user"))
+        
         # Filter to only include user messages
         user_messages = []
         for msg in messages:
             if msg["role"] != "Jupiter:":
                 user_messages.append(f"{msg['role']} {msg['message']}")
         
-        if not user_messages:
-            print(f"InfoExtractor: No user messages found in log file {os.path.basename(log_file)}")
-            self.mark_log_as_processed(log_file)
+        if not final:
+            if len(user_messages) >= self.min_new_messages:
+                self.extract_from_messages(user_messages, user_prefix, log_file, verbose=False)
+                self.save_checkpoint(log_file, end_offset, mtime, user_prefix)
             return
         
+        if not user_messages:
+            print(f"InfoExtractor: No new user messages found in log file {os.path.basename(log_file)}")
+        else:
+            self.extract_from_messages(user_messages, user_prefix, log_file)
+        
+        # Mark log as processed
+        self.mark_log_as_processed(log_file)
+    
+    def extract_from_messages(self, user_messages, user_prefix, log_file, verbose=True):
+        """Run extraction over a log's formatted user messages and update that user's profile"""
         # Identify username from the log
         username = user_prefix.rstrip(':') if user_prefix else self.identify_username_from_log(log_file)
         
-        # Send user messages to LLM for analysis
-        formatted_content = "\n".join(user_messages)
-        llm_response = self.llm_client.extract_information(self.extraction_prompt, formatted_content)
-        
-        # Parse LLM response
-        extracted_info = self.parse_llm_response(llm_response)
-        
         # Get user data - now with name history support
         user_data = self.user_data_manager.get_user(username)
-        if not user_data:
+        if user_data:
+            user_id = user_data['user_id']
+        else:
             # Create new user if not found
-            user_data = {'name': username}
-            user_id = self.user_data_manager.create_user(user_data)
-            user_data['user_id'] = user_id
+            user_id = self.user_data_manager.create_user({'name': username})
         
-        # Set as current user
-        self.user_data_manager.set_current_user(user_data)
+        updates = self.extract_for_user(user_id, user_messages)
         
-        # Update user data with extracted information
-        updates = self.user_data_manager.update_user_info(extracted_info)
-        
-        if updates:
+        if updates and verbose:
             print(f"InfoExtractor: Updated user data for {username}: {', '.join(updates)}")
+    
+    def extract_for_user(self, user_id, user_messages):
+        """Extract information from one user's formatted messages and apply it to their profile
         
-        # Mark log as processed
-        self.mark_log_as_processed(log_file)
+        Messages are split into token-budgeted chunks (map), each chunk is
+        extracted in parallel, and the results are merged with duplicates
+        removed (reduce) before a single profile update.
+        """
+        chunks = self.chunk_messages(user_messages)
+        
+        if len(chunks) == 1:
+            results = [self.extract_chunk(chunks[0])]
+        else:
+            executor = self._get_chunk_executor()
+            results = [future.result() for future in [executor.submit(self.extract_chunk, chunk) for chunk in chunks]]
+        
+        extracted_info = self.merge_extracted_info(results)
+        
+        # Update the stored profile directly; the current user belongs to the chat session
+        return self.user_data_manager.update_user_info(extracted_info, user_id=user_id)
+    
+    def extract_chunk(self, conversation_text):
+        """Run the extraction prompt over one chunk of conversation text"""
+        with self.llm_slots:
+            llm_response = self.llm_client.extract_information(self.extraction_prompt, conversation_text)
+        
+        # Parse LLM response
+        return self.parse_llm_response(llm_response)
+    
+    def chunk_messages(self, user_messages):
+        """Pack messages, in order, into chunks of at most chunk_tokens tokens
+        
+        A single message longer than the budget is cut to fit.
+        """
+        chunks = []
+        current = []
+        current_tokens = 0
+        
+        for message in user_messages:
+            tokens = self.tokenizer.encode(message)
+            if len(tokens) > self.chunk_tokens:
+                tokens = tokens[:self.chunk_tokens]
+                message = self.tokenizer.decode(tokens)
+            
+            # +1 for the joining newline
+            if current and current_tokens + len(tokens) + 1 > self.chunk_tokens:
+                chunks.append("\n".join(current))
+                current = []
+                current_tokens = 0
+            
+            current.append(message)
+            current_tokens += len(tokens) + 1
+        
+        if current:
+            chunks.append("\n".join(current))
+        
+        return chunks or [""]
+    
+    @staticmethod
+    def merge_extracted_info(results):
+        """Merge extraction results from several chunks, dropping duplicates
+        
+        List categories keep every distinct value (compared case-insensitively);
+        single-value categories keep the value from the latest chunk.
+        """
+        merged = []
+        positions = {}
+        
+        for extracted_info in results:
+            for item in extracted_info:
+                if not isinstance(item, dict) or 'category' not in item or 'value' not in item:
+                    continue
+                
+                category = item['category']
+                value = item['value']
+                if not isinstance(value, str) or not value.strip():
+                    continue
+                
+                if category in LIST_CATEGORIES:
+                    key = (category, value.strip().lower())
+                else:
+                    key = (category, None)
+                
+                if key in positions:
+                    if category not in LIST_CATEGORIES:
+                        merged[positions[key]] = item
+                else:
+                    positions[key] = len(merged)
+                    merged.append(item)
+        
+        return merged
+    
+    def _get_chunk_executor(self):
+        with self.lock:
+            if self.chunk_executor is None:
+                self.chunk_executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                         thread_name_prefix="InfoExtractorChunk")
+            return self.chunk_executor
+    
+    def get_pending_conversations(self):
+        """Get (conversation_id, processed, total) for stored conversations with new messages"""
+        checkpoints = self.processed_logs["conversations"]
+        pending = []
+        
+        # Message counts come from the offset index (or archive index), so
+        # unchanged conversations are never read
+        for conversation_id in self.conversation_manager.iter_conversation_ids():
+            total = self.conversation_manager.get_message_count(conversation_id)
+            processed = checkpoints.get(conversation_id, 0)
+            if total > processed:
+                pending.append((conversation_id, processed, total))
+        
+        return pending
+    
+    def seed_conversation_checkpoints(self):
+        """Checkpoint every stored conversation at its current message count"""
+        with self.lock:
+            checkpoints = self.processed_logs["conversations"]
+            for conversation_id in self.conversation_manager.iter_conversation_ids():
+                checkpoints.setdefault(conversation_id, self.conversation_manager.get_message_count(conversation_id))
+            self.save_processed_logs()
+        print(f"InfoExtractor: Checkpointed {len(checkpoints)} existing conversations")
+    
+    def process_conversation(self, conversation_id, start, end, final=True):
+        """Extract information from a conversation's messages [start, end), per sender
+        
+        Unless final, a conversation with fewer than min_new_messages new
+        user messages is left for later while it is still active (its last
+        message is newer than the extraction interval).
+        """
+        messages = self.conversation_manager.get_conversation_messages(
+            conversation_id, limit=end - start, offset=start, from_end=False)
+        if not messages:
+            return
+        
+        # Group user messages by sender, so attribution is exact
+        by_sender = {}
+        for msg in messages:
+            sender_id = msg.get("sender_id")
+            if msg.get("type") == "user" and sender_id and sender_id != "jupiter" and msg.get("content"):
+                by_sender.setdefault(sender_id, []).append(msg["content"])
+        
+        if not final:
+            new_messages = sum(len(contents) for contents in by_sender.values())
+            idle = time.time() - messages[-1].get("timestamp", 0) >= self.interval
+            if new_messages < self.min_new_messages and not idle:
+                return
+        
+        # A started conversation is finished even when stopping, so its
+        # checkpoint covers every sender extracted
+        names = self.user_data_manager.get_user_names(list(by_sender))
+        for sender_id, contents in by_sender.items():
+            name = names.get(sender_id)
+            if not name:
+                # Sender's profile no longer exists
+                continue
+            
+            updates = self.extract_for_user(sender_id, [f"{name}: {content}" for content in contents])
+            if updates and final:
+                print(f"InfoExtractor: Updated user data for {name}: {', '.join(updates)}")
+        
+        self.save_conversation_checkpoint(conversation_id, start + len(messages))
     
-    def process_all_unprocessed_logs(self):
-        """Process all unprocessed log files"""
+    def process_pending(self, report=True):
+        """Run one extraction pass over every enabled source"""
+        if self.test_mode:
+            print("TEST MODE: Skipping log processing")
+            return
+        
+        if self.processed_logs.get("catch_up_logs"):
+            # Logs from before the upgrade; this session's log is covered by
+            # its conversation
+            self.process_all_unprocessed_logs(report, include_active=False)
+            if not self.stop_event.is_set():
+                with self.lock:
+                    self.processed_logs.pop("catch_up_logs", None)
+                    self.save_processed_logs()
+        if "conversations" in self.sources and not self.stop_event.is_set():
+            self.process_conversations(report)
+        if "logs" in self.sources:
+            self.process_all_unprocessed_logs(report)
+    
+    def process_conversations(self, report=True):
+        """Process new messages in stored conversations on a bounded pool of worker threads
+        
+        The startup pass (report=True) processes everything pending and
+        reports progress; later passes wait for active conversations to
+        gather min_new_messages new user messages.
+        """
+        pending = self.get_pending_conversations()
+        
+        if not pending:
+            if report:
+                print("InfoExtractor: No new conversation messages to process")
+                self._set_status("Ready", False)
+            return
+        
+        if report:
+            print(f"InfoExtractor: Found {len(pending)} conversations with new messages")
+        
+        self._run_tasks([lambda item=item: self.process_conversation(*item, final=report) for item in pending],
+                        report)
+        
+        if report:
+            print(f"InfoExtractor: Finished processing {len(pending)} conversations")
+    
+    def process_all_unprocessed_logs(self, report=True, include_active=True):
+        """Process finished logs on a bounded pool of worker threads, then the active log's new lines"""
         if self.test_mode:
             print("TEST MODE: Skipping log processing")
             return
                 
-        # Get unprocessed logs
+        # Get unprocessed logs; the active log is looked up after the scan so a
+        # session log created meanwhile is never mistaken for a finished one
         unprocessed_logs = self.get_unprocessed_logs()
+        active_log = self.get_active_log()
+        finished_logs = [log_file for log_file in unprocessed_logs if log_file != active_log]
         
-        if not unprocessed_logs:
+        if finished_logs:
+            total = len(finished_logs)
+            print(f"InfoExtractor: Found {total} unprocessed log files")
+            self._run_tasks([lambda log_file=log_file: self.process_log_file(log_file) for log_file in finished_logs])
+            print(f"InfoExtractor: Finished processing {total} log files")
+        elif report:
             print("InfoExtractor: No new logs to process")
-            # Update status if UI is available
-            if self.ui and hasattr(self.ui, 'set_status'):
-                self.ui.set_status("Ready", False)
-            return
+            self._set_status("Ready", False)
         
-        print(f"InfoExtractor: Found {len(unprocessed_logs)} unprocessed log files")
+        if include_active and active_log in unprocessed_logs and not self.stop_event.is_set():
+            self.process_log_file(active_log, final=False)
+    
+    def _run_tasks(self, tasks, report=True):
+        """Run extraction tasks on the worker pool, reporting progress through the UI"""
+        total = len(tasks)
+        if report:
+            self._set_status(f"Learning from previous conversations (0/{total})", True)
         
-        # Process each log
-        for log_file in unprocessed_logs:
-            self.process_log_file(log_file)
-                
-        print(f"InfoExtractor: Finished processing {len(unprocessed_logs)} log files")
-        # Update status if UI is available
+        def run(task):
+            # Tasks not yet started are skipped once shutdown begins
+            if not self.stop_event.is_set():
+                task()
+        
+        # Each worker makes one extraction call at a time through the shared LLM client
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="InfoExtractorWorker") as executor:
+            futures = [executor.submit(run, task) for task in tasks]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"InfoExtractor Error: Extraction failed: {str(e)}")
+                done += 1
+                if report and not self.stop_event.is_set():
+                    self._set_status(f"Learning from previous conversations ({done}/{total})", done < total)
+        
+        if report:
+            self._set_status("Ready", False)
+    
+    def start_background_processing(self):
+        """Process unprocessed logs in a background thread so chat is usable immediately
+        
+        After the startup pass the thread keeps checking every interval for
+        new conversation messages, new lines in the active log and logs of
+        sessions that ended.
+        """
+        if self.test_mode or (self.thread and self.thread.is_alive()):
+            return
+        
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._background_loop, name="InfoExtractorThread", daemon=True)
+        self.thread.start()
+    
+    def _background_loop(self):
+        try:
+            self.process_pending()
+        except Exception as e:
+            print(f"InfoExtractor Error: Startup extraction failed: {str(e)}")
+            self._set_status("Ready", False)
+        while self.interval and not self.stop_event.wait(self.interval):
+            try:
+                self.process_pending(report=False)
+            except Exception as e:
+                print(f"InfoExtractor Error: Periodic extraction failed: {str(e)}")
+    
+    def stop(self, timeout=None):
+        """Stop starting new extractions and wait for the ones in progress to finish"""
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
+    
+    def _set_status(self, status_text, is_busy):
+        """Update status if UI is available"""
         if self.ui and hasattr(self.ui, 'set_status'):
-            self.ui.set_status("Ready", False)
\ No newline at end of file
+            self.ui.set_status(status_text, is_busy)
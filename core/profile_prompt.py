@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+
+from models import fact_store
+
+HEADER = "\n\n## What You Know About The User\n"
+
+# Profile fields that are bookkeeping rather than things to tell the model
+SYSTEM_FIELDS = {'user_id', 'name', 'created_at', 'last_seen', 'platforms', 'conversations', fact_store.META_FIELD}
+
+# Single-value fields in the order they are worth spending tokens on;
+# other single values follow in profile order
+PRIORITY_FIELDS = ['preferred_name', 'nickname', 'pronouns', 'age', 'location', 'profession',
+                   'occupation', 'family', 'goals', 'important_dates']
+
+class ProfilePrompt:
+    """Renders and caches the "What You Know About The User" system prompt block
+
+    Renderings are cached per (user ID, profile version, day), so a user's
+    block is rebuilt after their stored profile changes and at least daily,
+    as fact scores decay with time. One instance is shared by the terminal
+    and Discord, which render from different threads.
+    """
+
+    CACHE_SIZE = 256
+    DAY_SECONDS = 86400
+
+    def __init__(self, user_data_manager, tokenizer, token_budget=300, half_life_days=90):
+        self.user_data_manager = user_data_manager
+        self.tokenizer = tokenizer
+        self.token_budget = token_budget
+        self.half_life_days = half_life_days
+
+        self.cache = OrderedDict()  # (user ID, version, day) -> rendered block, least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, user_info):
+        """Get the profile block for a user, from the cache when the profile is unchanged today"""
+        if not user_info or len(user_info) <= 1:  # Only contains name
+            return ""
+
+        user_id = user_info.get('user_id')
+        if not user_id:
+            return self.build(user_info)
+
+        key = (user_id, self.user_data_manager.get_profile_version(user_id), int(time.time() // self.DAY_SECONDS))
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+
+        text = self.build(user_info)
+
+        with self.lock:
+            self.misses += 1
+            # Older versions and days of this user's block can never be hit again
+            for stale in [cached for cached in self.cache if cached[0] == user_id]:
+                del self.cache[stale]
+            self.cache[key] = text
+            while len(self.cache) > self.CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return text
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def _tokens(self, text):
+        return len(self.tokenizer.encode(text))
+
+    def build(self, user_info):
+        """Format a profile within token_budget tokens, header included
+
+        Identity and priority fields come first, then other single values,
+        then list facts ranked by score and picked a rank at a time across
+        categories, so every category keeps its strongest facts when the
+        budget is tight. Other lists (such as name history) come last.
+        """
+        formatted_info = HEADER + f"- Name: {user_info.get('name', 'Unknown')}\n"
+        used = self._tokens(formatted_info)
+        if used > self.token_budget:
+            return ""
+
+        fields = [(category, value) for category, value in user_info.items() if category not in SYSTEM_FIELDS]
+        priority = {category: i for i, category in enumerate(PRIORITY_FIELDS)}
+        scalars = sorted((item for item in fields if item[1] and not isinstance(item[1], (list, dict))),
+                         key=lambda item: priority.get(item[0], len(PRIORITY_FIELDS)))
+
+        lines = {}
+        for category, value in scalars:
+            line = f"- {category.capitalize()}: {value}\n"
+            cost = self._tokens(line)
+            if used + cost <= self.token_budget:
+                lines[category] = line
+                used += cost
+
+        lists = [(category, value) for category, value in fields if isinstance(value, list) and value]
+        ranked = {category: fact_store.rank_facts(user_info, category, half_life_days=self.half_life_days)
+                  for category, _ in lists if category in fact_store.FACT_CATEGORIES}
+        others = {category: [str(item) for item in value]
+                  for category, value in lists if category not in fact_store.FACT_CATEGORIES}
+
+        # Take each fact list's best remaining fact in turn, then fill from other lists
+        for group in (ranked, others):
+            for category in group:
+                lines[category] = []
+            depth = 0
+            while any(depth < len(values) for values in group.values()):
+                for category, values in group.items():
+                    if depth >= len(values):
+                        continue
+                    picked = lines[category]
+                    if picked:
+                        cost = self._tokens(f", {values[depth]}")
+                    else:
+                        cost = self._tokens(f"- {category.capitalize()}: {values[depth]}\n")
+                    if used + cost <= self.token_budget:
+                        picked.append(values[depth])
+                        used += cost
+                depth += 1
+
+        output = []
+        for category, line in lines.items():
+            if isinstance(line, list):
+                if line:
+                    output.append(f"- {category.capitalize()}: {', '.join(line)}\n")
+            else:
+                output.append(line)
+
+        # Tokens don't always add up across joins; drop the least relevant lines if over
+        while output and self._tokens(formatted_info + "".join(output)) > self.token_budget:
+            output.pop()
+
+        return formatted_info + "".join(output)
@@ -482,7 +482,7 @@ class WakeWordDetector:
         
         # Start processing thread
         self.is_running = True
-        self.processing_thread = threading.Thread(target=self._processing_loop)
+        self.processing_thread = threading.Thread(target=self._processing_loop, name="WakeWordThread")
         self.processing_thread.daemon = True
         self.processing_thread.start()
         
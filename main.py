@@ -7,8 +7,9 @@ import time
 import logging
 
 from models.llm_client import LLMClient
-from models.user_data_manager import UserDataManager
+from models.user_data_manager import create_user_data_manager
 from utils.logger import Logger
+from utils.log_retention import LogRetention
 from ui.terminal_interface import TerminalInterface
 from core.info_extractor import InfoExtractor
 from core.chat_engine import ChatEngine
@@ -31,7 +32,61 @@ def load_config():
             "token_limit": 8192
         },
         "chat": {
-            "max_history_messages": 100
+            "max_history_messages": 100,
+            "profile_token_budget": 300
+        },
+        "chat_log": {
+            "flush_interval_seconds": 1,
+            "buffer_bytes": 8192,
+            "crash_safe": False,
+            "fsync_interval_seconds": 5
+        },
+        "tracing": {
+            "enabled": True,
+            "samples_per_stage": 1000
+        },
+        "log_retention": {
+            "enabled": True,
+            "max_file_mb": 10,
+            "max_file_age_hours": 24,
+            "compress": True,
+            "compress_after_minutes": 5,
+            "max_total_mb": 500,
+            "max_age_days": 0,
+            "check_interval_minutes": 10
+        },
+        "memory": {
+            "enabled": True,
+            "backend": "hashed",
+            "embedding_model": "nomic-embed-text",
+            "dimensions": 1024,
+            "max_snippets": 3,
+            "token_budget": 256,
+            "min_score": 0.2
+        },
+        "archive": {
+            "enabled": True,
+            "idle_days": 30,
+            "check_interval_minutes": 60,
+            "segment_max_mb": 16
+        },
+        "extraction": {
+            "sources": ["conversations"],
+            "workers": 2,
+            "interval_minutes": 10,
+            "min_new_messages": 3,
+            "response_tokens": 1024
+        },
+        "user_data": {
+            "storage": "file",
+            "flush_interval_seconds": 2,
+            "presence_flush_seconds": 60,
+            "cleanup_enabled": False,
+            "cleanup_max_age_days": 180,
+            "cleanup_interval_minutes": 60,
+            "cleanup_slice_ms": 20,
+            "fact_cap": 25,
+            "fact_half_life_days": 90
         },
         "paths": {
             "prompt_folder": "prompts",
@@ -71,6 +126,10 @@ def main():
 
     parser = argparse.ArgumentParser(description="Jupiter Chat")
     parser.add_argument("--test", action="store_true", help="Run in offline test mode without LLM backend")
+    parser.add_argument("--profile-turns", type=int, help="Profile the first N turns into logs/profiles")
+    parser.add_argument("--profile-seconds", type=int, help="Profile the first N seconds into logs/profiles")
+    parser.add_argument("--profile-mode", choices=["cprofile", "sample"], default="cprofile",
+                        help="Deterministic per-turn profiling or sampling of every thread")
     args = parser.parse_args()
     
     # Load configuration
@@ -84,9 +143,19 @@ def main():
     )
     
     # Create unified user data manager
-    user_data_manager = UserDataManager(config['paths']['user_data_file'])
+    user_data_manager = create_user_data_manager(config['paths']['user_data_file'], config)
     
-    logger = Logger(config['paths']['logs_folder'])
+    chat_log_config = config.get('chat_log', {})
+    retention_config = config.get('log_retention', {})
+    logger = Logger(
+        config['paths']['logs_folder'],
+        flush_interval=chat_log_config.get('flush_interval_seconds', 1),
+        buffer_size=chat_log_config.get('buffer_bytes', 8192),
+        crash_safe=chat_log_config.get('crash_safe', False),
+        fsync_interval=chat_log_config.get('fsync_interval_seconds', 5),
+        max_bytes=retention_config.get('max_file_mb', 10) * 1024 * 1024,
+        max_age=retention_config.get('max_file_age_hours', 24) * 3600
+    )
     
     # Always use terminal interface
     ui = TerminalInterface(
@@ -101,32 +170,58 @@ def main():
     # Display startup message
     if args.test:
         print("⚠️ Running in TEST MODE - No LLM connection")
-    else:
-        print("Processing previous conversation logs...")
         
-    # Initialize info extractor
-    info_extractor = InfoExtractor(
+    # Initialize chat engine
+    chat_engine = ChatEngine(
         llm_client=llm_client,
         user_data_manager=user_data_manager,
-        logs_folder=config['paths']['logs_folder'],
-        prompt_folder=config['paths']['prompt_folder'],
+        logger=logger,
         ui=ui,
+        config=config,
         test_mode=args.test
     )
     
-    # Process any unprocessed logs (skip in test mode)
-    if not args.test:
-        info_extractor.process_all_unprocessed_logs()
+    if args.profile_turns or args.profile_seconds:
+        print(chat_engine.profiler.start(args.profile_mode, turns=args.profile_turns, seconds=args.profile_seconds))
     
-    # Initialize chat engine
-    chat_engine = ChatEngine(
+    # Initialize info extractor (reads the chat engine's conversation store)
+    extraction_config = config.get('extraction', {})
+    info_extractor = InfoExtractor(
         llm_client=llm_client,
         user_data_manager=user_data_manager,
-        logger=logger,
+        logs_folder=config['paths']['logs_folder'],
+        prompt_folder=config['paths']['prompt_folder'],
         ui=ui,
-        config=config,
-        test_mode=args.test
+        test_mode=args.test,
+        max_workers=extraction_config.get('workers', 2),
+        chat_logger=logger,
+        interval_minutes=extraction_config.get('interval_minutes', 10),
+        min_new_messages=extraction_config.get('min_new_messages', 3),
+        conversation_manager=chat_engine.conversation_manager,
+        sources=extraction_config.get('sources', ["conversations"]),
+        token_limit=config['llm'].get('token_limit', 8192),
+        response_tokens=extraction_config.get('response_tokens', 1024)
     )
+    
+    # Process anything not yet extracted in the background (skipped in test mode)
+    info_extractor.start_background_processing()
+    
+    # Compress finished logs and keep the logs folder within its disk budget
+    log_retention = None
+    if retention_config.get('enabled', True):
+        log_retention = LogRetention(
+            config['paths']['logs_folder'],
+            max_total_mb=retention_config.get('max_total_mb', 500),
+            max_age_days=retention_config.get('max_age_days', 0),
+            compress=retention_config.get('compress', True),
+            compress_after_minutes=retention_config.get('compress_after_minutes', 5),
+            check_interval_minutes=retention_config.get('check_interval_minutes', 10)
+        )
+        log_retention.add_active_source(logger.get_current_log_file)
+        log_retention.add_active_source(chat_engine.exchange_logger.get_active_files)
+        log_retention.add_active_source(chat_engine.tracer.get_trace_file)
+        log_retention.add_active_source(lambda: os.path.join(config['paths']['logs_folder'], "discord.log"))
+        log_retention.start()
 
     # Create wake word detector but don't start it yet
     detector = None
@@ -192,6 +287,21 @@ def main():
                 
         if detector:
             detector.stop()
+        
+        # Let extractions already in flight finish before the final user data flush
+        info_extractor.stop(timeout=30)
+        
+        # Write a profile still running
+        chat_engine.profiler.stop()
+        
+        if log_retention:
+            log_retention.stop(timeout=30)
+        
+        # Write buffered chat log lines
+        logger.close()
+        
+        # Write any pending user data changes
+        user_data_manager.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,155 @@
+import re
+import math
+import time
+from difflib import SequenceMatcher
+
+# Profile categories that hold a list of facts
+FACT_CATEGORIES = ('likes', 'dislikes', 'interests', 'hobbies')
+
+# Profile field holding {category: {normalized fact: {"count", "first_seen", "last_seen"}}}
+META_FIELD = "fact_meta"
+
+# Words that don't change what a fact is about ("drinking coffee" == "coffee")
+STOPWORDS = {
+    "a", "an", "the", "my", "his", "her", "their", "some", "of", "to", "very", "really",
+    "lot", "lots", "much", "good", "great", "all", "kind", "kinds", "type", "types"
+}
+FILLER_VERBS = {"like", "love", "enjoy", "drink", "eat", "play", "watch", "listen", "do", "go", "have"}
+
+# Normalized strings at least this similar are the same fact (catches typos)
+FUZZY_RATIO = 0.88
+
+def _stem(word):
+    """Crude suffix folding, applied the same way to both sides of a comparison"""
+    if len(word) > 4 and word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif len(word) > 4 and word.endswith(("sses", "ches", "shes", "xes")):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+
+    if len(word) > 5 and word.endswith("ing"):
+        word = word[:-3]
+        # "swimming" -> "swim"
+        if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+            word = word[:-1]
+
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+def normalize_fact(value):
+    """Fold a fact to a comparison key: lowercase, no punctuation, stemmed, filler dropped"""
+    words = [_stem(word) for word in re.findall(r"[a-z0-9]+", str(value).lower()) if word not in STOPWORDS]
+    content = [word for word in words if word not in FILLER_VERBS]
+    # A fact that is only a filler verb ("reading") keeps it
+    return " ".join(content or words)
+
+def same_fact(key_a, key_b):
+    """Whether two normalized facts are duplicates"""
+    if not key_a or not key_b:
+        return False
+    if key_a == key_b or set(key_a.split()) == set(key_b.split()):
+        return True
+    return min(len(key_a), len(key_b)) >= 4 and SequenceMatcher(None, key_a, key_b).ratio() >= FUZZY_RATIO
+
+def _meta_for(user_data, category):
+    return user_data.setdefault(META_FIELD, {}).setdefault(category, {})
+
+def _default_entry(user_data):
+    # Facts stored before metadata was kept count once, as of the profile's creation
+    seen = user_data.get("created_at", 0)
+    if not isinstance(seen, (int, float)):
+        seen = 0
+    return {"count": 1, "first_seen": seen, "last_seen": seen}
+
+def add_fact(user_data, category, value, now=None):
+    """Add a fact to a profile dict, or reinforce the existing fact it duplicates
+
+    Returns:
+        str: "added", "merged", or None if the value is empty
+    """
+    key = normalize_fact(value)
+    if not key:
+        return None
+
+    now = now or time.time()
+    values = user_data.setdefault(category, [])
+    meta = _meta_for(user_data, category)
+
+    for existing in values:
+        existing_key = normalize_fact(existing)
+        if same_fact(existing_key, key):
+            entry = meta.setdefault(existing_key, _default_entry(user_data))
+            entry["count"] += 1
+            entry["last_seen"] = now
+            return "merged"
+
+    values.append(value)
+    meta[key] = {"count": 1, "first_seen": now, "last_seen": now}
+    return "added"
+
+def fact_score(entry, now=None, half_life_days=90):
+    """Score a fact by how often it came up, decayed by how long ago it last did"""
+    now = now or time.time()
+    age_days = max(0.0, now - entry.get("last_seen", 0)) / 86400
+    return (1 + math.log(max(1, entry.get("count", 1)))) * 0.5 ** (age_days / half_life_days)
+
+def rank_facts(user_data, category, now=None, half_life_days=90):
+    """Get a category's facts, highest scoring first"""
+    values = user_data.get(category)
+    if not isinstance(values, list):
+        return []
+
+    now = now or time.time()
+    meta = user_data.get(META_FIELD, {}).get(category, {})
+    default = _default_entry(user_data)
+    scored = [(fact_score(meta.get(normalize_fact(value), default), now, half_life_days), i, value)
+              for i, value in enumerate(values)]
+    # Ties go to the more recently added fact
+    return [value for _, _, value in sorted(scored, reverse=True)]
+
+def compact_category(user_data, category, cap=None, now=None, half_life_days=90):
+    """Fold duplicate facts together and drop the lowest scoring ones beyond cap
+
+    Returns:
+        bool: Whether the profile changed
+    """
+    values = user_data.get(category)
+    if not isinstance(values, list):
+        return False
+
+    meta = _meta_for(user_data, category)
+    kept = []
+    kept_meta = {}
+    for value in values:
+        key = normalize_fact(value)
+        if not key:
+            continue
+        entry = meta.get(key) or _default_entry(user_data)
+
+        if key in kept_meta:
+            # Same key, so the same metadata entry; nothing to add
+            continue
+
+        match = next((existing_key for existing_key in kept_meta if same_fact(existing_key, key)), None)
+        if match:
+            merged = kept_meta[match]
+            merged["count"] += entry["count"]
+            merged["first_seen"] = min(merged["first_seen"], entry["first_seen"])
+            merged["last_seen"] = max(merged["last_seen"], entry["last_seen"])
+            continue
+
+        kept.append(value)
+        kept_meta[key] = dict(entry)
+
+    if cap is not None and len(kept) > cap:
+        ranked = rank_facts({category: kept, META_FIELD: {category: kept_meta}}, category, now, half_life_days)
+        survivors = set(ranked[:cap])
+        kept = [value for value in kept if value in survivors]
+        kept_meta = {normalize_fact(value): kept_meta[normalize_fact(value)] for value in kept}
+
+    changed = kept != values or kept_meta != meta
+    user_data[category] = kept
+    user_data[META_FIELD][category] = kept_meta
+    return changed
@@ -87,6 +87,38 @@ class LLMClient:
         # Combine elements for a semi-contextual response
         return f"{base_response}\n\nTimestamp: {timestamp}\nReceived: \"{last_user_message}\"\n\nThis is a simulated response for testing the UI and functionality without requiring an LLM connection."
     
+    def generate_embeddings(self, texts, model=None):
+        """Get embedding vectors for a batch of texts from the LLM backend
+
+        Returns a list of vectors (one per text), or None if embeddings are
+        unavailable (test mode or backend error).
+        """
+        if self.test_mode or not texts:
+            return None
+
+        try:
+            payload = {
+                "model": model or self.default_model,
+                "input": list(texts)
+            }
+
+            endpoint = f"{self.api_url}/api/embed"
+            response = requests.post(endpoint, json=payload, timeout=60)
+
+            if response.status_code == 200:
+                embeddings = response.json().get('embeddings')
+                if embeddings and len(embeddings) == len(texts):
+                    return embeddings
+                print(f"Error: Unexpected embedding response format from LLM API.")
+                return None
+            else:
+                print(f"Error: Could not get embeddings from LLM API (Status: {response.status_code}).")
+                return None
+
+        except Exception as e:
+            print(f"Error communicating with LLM: {str(e)}")
+            return None
+
     def extract_information(self, extraction_prompt, conversation_text, temperature=0.2):
         """Use the LLM to extract information from conversation text"""
         if self.test_mode:
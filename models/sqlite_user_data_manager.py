@@ -0,0 +1,718 @@
+import json
+import os
+import copy
+import uuid
+import time
+import sqlite3
+import logging
+import threading
+
+from models.user_data_manager import UserDataManager, synchronized
+
+logger = logging.getLogger("jupiter.user_data")
+
+# Profile fields that live in their own tables rather than the JSON profile column
+# (platform IDs stay in the profile too; the platform_ids table is an index over them)
+LIST_FACT_CATEGORIES = ('likes', 'dislikes', 'interests', 'hobbies')
+ROW_FIELDS = ('user_id', 'name', 'created_at', 'last_seen', 'name_history', 'conversations')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT,
+    created_at REAL,
+    last_seen REAL,
+    profile TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS users_last_seen ON users(last_seen);
+
+CREATE TABLE IF NOT EXISTS name_map (
+    name TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS name_map_user ON name_map(user_id);
+
+CREATE TABLE IF NOT EXISTS platform_map (
+    platform TEXT NOT NULL,
+    name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (platform, name)
+);
+CREATE INDEX IF NOT EXISTS platform_map_user ON platform_map(user_id);
+CREATE INDEX IF NOT EXISTS platform_map_name ON platform_map(name);
+
+CREATE TABLE IF NOT EXISTS platform_ids (
+    platform TEXT NOT NULL,
+    platform_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (platform, platform_id)
+);
+CREATE INDEX IF NOT EXISTS platform_ids_user ON platform_ids(user_id);
+
+CREATE TABLE IF NOT EXISTS name_history (
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    PRIMARY KEY (user_id, position)
+);
+CREATE INDEX IF NOT EXISTS name_history_name ON name_history(name_lower);
+
+CREATE TABLE IF NOT EXISTS user_facts (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (user_id, category, position)
+);
+CREATE INDEX IF NOT EXISTS user_facts_value ON user_facts(category, value);
+
+CREATE TABLE IF NOT EXISTS conversation_members (
+    user_id TEXT NOT NULL,
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (user_id, conversation_id)
+);
+CREATE INDEX IF NOT EXISTS conversation_members_conversation ON conversation_members(conversation_id);
+
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+CHILD_TABLES = ('platform_ids', 'name_history', 'user_facts', 'conversation_members')
+
+class SQLiteUserDataManager(UserDataManager):
+    """UserDataManager backed by an SQLite database
+
+    Profiles, name and platform mappings, name history, list-valued facts
+    and conversation membership are stored in indexed tables, so lookups
+    and changes touch only the rows involved. Each thread gets its own
+    connection and the database runs in WAL mode, so the terminal, Discord
+    and extraction threads can read concurrently while one writes.
+
+    Selected with user_data.storage = "sqlite". An existing user_data.json
+    is imported into an empty database on first start.
+    """
+
+    def __init__(self, user_data_file, config=None):
+        """Initialize with path to the user data file to import from"""
+        self.user_data_file = user_data_file
+        self.config = config or {}
+        self.current_user = {}
+
+        self.lock = threading.RLock()    # Serializes writers within the process
+        self._local = threading.local()  # One connection per thread
+        self._name_cache = {}            # user ID -> display name, dropped whenever the profile changes
+        self.profile_versions = {}       # user ID -> change counter, for caches of rendered profiles
+        self._profile_epoch = 0          # Bumped when every profile may have changed
+        self.link_listeners = []         # Called with (source ID, target ID) after a link merges profiles
+
+        user_data_config = self.config.get('user_data', {})
+        self.db_file = user_data_config.get(
+            'sqlite_file',
+            os.path.join(self.config.get('paths', {}).get('data_folder', 'data'), 'users.db')
+        )
+        dir_name = os.path.dirname(self.db_file)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+
+        # Presence updates waiting to be written: user ID -> (last_seen, {platforms})
+        self._presence_pending = {}
+        self._presence_ready = {}
+        self._configure_background(user_data_config)
+
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+        if not self._has_users() and os.path.exists(user_data_file):
+            logger.info(f"Importing {user_data_file} into {self.db_file}")
+            self.import_user_data_file(user_data_file)
+
+        self._start_writer()
+
+    # ===== Connections and rows =====
+
+    def _conn(self):
+        """Get this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _has_users(self):
+        return self._conn().execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None
+
+    def _read_user(self, conn, user_id):
+        """Assemble a profile dict from its rows (None if the user does not exist)"""
+        # Snapshot presence not yet written before reading the rows, under the
+        # lock the flush thread holds while it writes and swaps these maps
+        last_seen = None
+        platforms = set()
+        with self.lock:
+            for presence in (self._presence_ready, self._presence_pending):
+                if user_id in presence:
+                    last_seen, user_platforms = presence[user_id]
+                    platforms |= user_platforms
+
+        row = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+
+        user_data = json.loads(row["profile"])
+        user_data["user_id"] = user_id
+        for field in ("name", "created_at", "last_seen"):
+            if row[field] is not None:
+                user_data[field] = row[field]
+
+        history = conn.execute(
+            "SELECT name FROM name_history WHERE user_id = ? ORDER BY position", (user_id,)).fetchall()
+        if history:
+            user_data["name_history"] = [r["name"] for r in history]
+
+        for r in conn.execute(
+                "SELECT category, value FROM user_facts WHERE user_id = ? ORDER BY category, position", (user_id,)):
+            user_data.setdefault(r["category"], []).append(r["value"])
+
+        conversations = conn.execute(
+            "SELECT conversation_id FROM conversation_members WHERE user_id = ? ORDER BY position", (user_id,)).fetchall()
+        if conversations:
+            user_data["conversations"] = [r["conversation_id"] for r in conversations]
+
+        # Presence updates not yet written
+        if last_seen is not None:
+            user_data["last_seen"] = last_seen
+        for platform in platforms:
+            user_data.setdefault("platforms", {})[platform] = True
+
+        return user_data
+
+    def _write_user(self, conn, user_id, user_data):
+        """Replace a user's rows with the contents of a profile dict"""
+        self._profile_changed(user_id)
+        # Empty categories have no rows, so they stay in the profile column as []
+        list_facts = {category: values for category, values in user_data.items()
+                      if category in LIST_FACT_CATEGORIES and isinstance(values, list) and values}
+        profile = {key: value for key, value in user_data.items()
+                   if key not in ROW_FIELDS and key not in list_facts}
+
+        conn.execute(
+            "INSERT OR REPLACE INTO users (user_id, name, created_at, last_seen, profile) VALUES (?, ?, ?, ?, ?)",
+            (user_id, user_data.get("name"), user_data.get("created_at"), user_data.get("last_seen"),
+             json.dumps(profile))
+        )
+
+        for table in CHILD_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+
+        conn.executemany(
+            "INSERT INTO name_history (user_id, position, name, name_lower) VALUES (?, ?, ?, ?)",
+            [(user_id, i, name, name.lower()) for i, name in enumerate(user_data.get("name_history", []))]
+        )
+        conn.executemany(
+            "INSERT INTO user_facts (user_id, category, position, value) VALUES (?, ?, ?, ?)",
+            [(user_id, category, i, str(value))
+             for category, values in list_facts.items() for i, value in enumerate(values)]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO conversation_members (user_id, conversation_id, position) VALUES (?, ?, ?)",
+            [(user_id, conversation_id, i) for i, conversation_id in enumerate(user_data.get("conversations", []))]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO platform_ids (platform, platform_id, user_id) VALUES (?, ?, ?)",
+            [(platform, str(platform_id), user_id) for platform, platform_id in self._platform_ids(user_data).items()]
+        )
+
+    def _delete_user(self, conn, user_id):
+        """Remove a user and all of its rows, including name mappings"""
+        self._profile_changed(user_id)
+        conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+        for table in CHILD_TABLES + ('name_map', 'platform_map'):
+            conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+
+    def _lookup_name(self, conn, username, platform):
+        """Resolve a name on a platform, falling back to the global name map"""
+        username_lower = username.lower()
+        row = conn.execute(
+            "SELECT user_id FROM platform_map WHERE platform = ? AND name = ?", (platform, username_lower)).fetchone()
+        if not row:
+            row = conn.execute("SELECT user_id FROM name_map WHERE name = ?", (username_lower,)).fetchone()
+        return row["user_id"] if row else None
+
+    # ===== Compatibility with the document API =====
+
+    def load_user_data(self):
+        """Assemble the full user data structure (expensive; prefer the specific methods)"""
+        conn = self._conn()
+        platform_map = {}
+        for r in conn.execute("SELECT platform, name, user_id FROM platform_map"):
+            platform_map.setdefault(r["platform"], {})[r["name"]] = r["user_id"]
+
+        return {
+            "users": dict(self.iter_users()),
+            "name_map": {r["name"]: r["user_id"] for r in conn.execute("SELECT name, user_id FROM name_map")},
+            "platform_map": platform_map,
+            "metadata": {r["key"]: json.loads(r["value"]) for r in conn.execute("SELECT key, value FROM metadata")}
+        }
+
+    @synchronized
+    def save_user_data(self, data, user_ids=None):
+        """Write a full user data structure (or just the listed users from it)"""
+        conn = self._conn()
+        with conn:
+            if user_ids is None:
+                self._profile_changed()
+                for table in ('users', 'name_map', 'platform_map') + CHILD_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+                user_ids = list(data["users"])
+                conn.executemany("INSERT INTO name_map (name, user_id) VALUES (?, ?)", list(data["name_map"].items()))
+                conn.executemany(
+                    "INSERT INTO platform_map (platform, name, user_id) VALUES (?, ?, ?)",
+                    [(platform, name, user_id) for platform, names in data["platform_map"].items()
+                     for name, user_id in names.items()]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                    [(key, json.dumps(value)) for key, value in data.get("metadata", {}).items()]
+                )
+
+            for user_id in user_ids:
+                if user_id in data["users"]:
+                    self._write_user(conn, user_id, data["users"][user_id])
+                else:
+                    self._delete_user(conn, user_id)
+
+    def import_user_data_file(self, user_data_file):
+        """Import a user_data.json document (legacy or v2), replacing the database contents"""
+        with open(user_data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        if "known_users" in data:
+            data = self._migrate_legacy_data(data)
+
+        for user_id, user_data in data["users"].items():
+            user_data.setdefault("user_id", user_id)
+
+        self.save_user_data(data)
+        return len(data["users"])
+
+    # ===== Presence and write-behind =====
+
+    @synchronized
+    def record_presence(self, user_id, platform=None):
+        """Note that a user was just seen (optionally on a platform) without forcing a write"""
+        _, platforms = self._presence_pending.get(user_id, (0, set()))
+        if platform:
+            platforms.add(platform)
+        self._presence_pending[user_id] = (time.time(), platforms)
+
+    def _queue_presence(self):
+        """Schedule pending presence updates to be written with the next flush"""
+        with self.lock:
+            for user_id, (last_seen, platforms) in self._presence_pending.items():
+                _, ready_platforms = self._presence_ready.get(user_id, (0, set()))
+                self._presence_ready[user_id] = (last_seen, ready_platforms | platforms)
+            self._presence_pending = {}
+            self._last_presence_flush = time.time()
+
+    def _write_pending(self):
+        """Write queued presence updates in one transaction"""
+        with self.lock:
+            if not self._presence_ready:
+                return
+            conn = self._conn()
+            with conn:
+                for user_id, (last_seen, platforms) in self._presence_ready.items():
+                    row = conn.execute("SELECT profile FROM users WHERE user_id = ?", (user_id,)).fetchone()
+                    if not row:
+                        continue
+                    profile = json.loads(row["profile"])
+                    for platform in platforms:
+                        profile.setdefault("platforms", {})[platform] = True
+                    conn.execute("UPDATE users SET last_seen = ?, profile = ? WHERE user_id = ?",
+                                 (last_seen, json.dumps(profile), user_id))
+            self._presence_ready = {}
+
+    # ===== Lookups =====
+
+    def get_user_by_id(self, user_id):
+        """Get user data by ID"""
+        return self._read_user(self._conn(), user_id)
+
+    def get_users_by_ids(self, user_ids):
+        """Get several users at once as a dict of user ID -> user data (unknown IDs are left out)"""
+        conn = self._conn()
+        users = {}
+        for user_id in set(user_ids):
+            user_data = self._read_user(conn, user_id)
+            if user_data:
+                users[user_id] = user_data
+        return users
+
+    def get_user_names(self, user_ids):
+        """Resolve several user IDs to display names in one query (unknown IDs are left out)"""
+        names = {}
+        missing = []
+        for user_id in set(user_ids):
+            if user_id in self._name_cache:
+                names[user_id] = self._name_cache[user_id]
+            else:
+                missing.append(user_id)
+
+        # Held so a concurrent rename cannot leave a stale name in the cache
+        with self.lock:
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn().execute(
+                    f"SELECT user_id, name FROM users WHERE user_id IN ({placeholders})", chunk).fetchall()
+                for row in rows:
+                    names[row["user_id"]] = self._name_cache[row["user_id"]] = row["name"] or "Unknown"
+
+        return names
+
+    def get_user_by_name(self, username, platform="gui"):
+        """Get a user by name (case-insensitive)"""
+        conn = self._conn()
+        user_id = self._lookup_name(conn, username, platform)
+        if not user_id:
+            return None, None
+        return self._read_user(conn, user_id), user_id
+
+    def get_user_by_platform_id(self, platform, platform_id):
+        """Get a user by a stable platform-specific ID (e.g. a Discord user ID)"""
+        conn = self._conn()
+        row = conn.execute("SELECT user_id FROM platform_ids WHERE platform = ? AND platform_id = ?",
+                           (platform, str(platform_id))).fetchone()
+        if not row:
+            return None, None
+        return self._read_user(conn, row["user_id"]), row["user_id"]
+
+    def get_user_by_name_extended(self, username, platform="all"):
+        """Get user by username, checking across all platforms and name history"""
+        user, user_id = self.get_user_by_name(username, platform if platform != "all" else "gui")
+        if user:
+            return user, user_id
+
+        conn = self._conn()
+        row = conn.execute("SELECT user_id FROM platform_map WHERE name = ? LIMIT 1", (username.lower(),)).fetchone()
+        if not row:
+            row = conn.execute("SELECT user_id FROM name_history WHERE name_lower = ? LIMIT 1",
+                               (username.lower(),)).fetchone()
+        if row:
+            user = self._read_user(conn, row["user_id"])
+            if user:
+                return user, row["user_id"]
+        return None, None
+
+    def get_user_id_info(self, username, platform="gui"):
+        """Get user ID and platform information for display"""
+        conn = self._conn()
+        row = conn.execute("SELECT user_id FROM platform_map WHERE platform = ? AND name = ?",
+                           (platform, username.lower())).fetchone()
+        user_data = self._read_user(conn, row["user_id"]) if row else None
+        if not user_data:
+            return None
+
+        platforms = user_data.get("platforms", {})
+        return {
+            "user_id": row["user_id"],
+            "name": user_data.get("name", username),
+            "platforms": [p for p, enabled in platforms.items() if enabled],
+            "created_at": user_data.get("created_at", 0),
+            "last_seen": user_data.get("last_seen", 0)
+        }
+
+    def iter_users(self):
+        """Get a snapshot list of (user_id, user_data) for every stored user"""
+        conn = self._conn()
+        user_ids = [r["user_id"] for r in conn.execute("SELECT user_id FROM users")]
+        return [(user_id, self._read_user(conn, user_id)) for user_id in user_ids]
+
+    def get_identity_maps(self):
+        """Get the name and platform maps used to resolve users"""
+        data = self.load_user_data()
+        return {"name_map": data["name_map"], "platform_map": data["platform_map"]}
+
+    # ===== Changes =====
+
+    @synchronized
+    def set_platform_id(self, user_id, platform, platform_id):
+        """Record a user's stable platform-specific ID"""
+        conn = self._conn()
+        user_data = self._read_user(conn, user_id)
+        if not user_data:
+            logger.warning(f"Attempted to set platform ID for non-existent user ID: {user_id}")
+            return False
+
+        user_data.setdefault("platform_ids", {})[platform] = str(platform_id)
+        if platform == "discord":
+            user_data["discord_id"] = str(platform_id)
+        with conn:
+            self._write_user(conn, user_id, user_data)
+        return True
+
+    @synchronized
+    def identify_user(self, username, platform="gui"):
+        """Identify a user by username, create if doesn't exist"""
+        conn = self._conn()
+        username_lower = username.lower()
+
+        user_id = self._lookup_name(conn, username, platform)
+        user_data = self._read_user(conn, user_id) if user_id else None
+
+        if user_data:
+            self.record_presence(user_id, platform)
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO platform_map (platform, name, user_id) VALUES (?, ?, ?)",
+                             (platform, username_lower, user_id))
+            return self._read_user(conn, user_id), user_data.get("name", username)
+
+        # Create new user with UUID
+        user_id = str(uuid.uuid4())
+        user_data = {
+            "name": username,
+            "user_id": user_id,
+            "created_at": time.time(),
+            "last_seen": time.time(),
+            "platforms": {
+                platform: True
+            }
+        }
+
+        with conn:
+            self._write_user(conn, user_id, user_data)
+            conn.execute("INSERT OR REPLACE INTO name_map (name, user_id) VALUES (?, ?)", (username_lower, user_id))
+            conn.execute("INSERT OR REPLACE INTO platform_map (platform, name, user_id) VALUES (?, ?, ?)",
+                         (platform, username_lower, user_id))
+        return copy.deepcopy(user_data), username
+
+    @synchronized
+    def save_current_user(self):
+        """Save the current user data"""
+        if not self.current_user or 'user_id' not in self.current_user:
+            logger.warning("Attempted to save user without ID")
+            return
+
+        conn = self._conn()
+        user_id = self.current_user['user_id']
+
+        with conn:
+            self._write_user(conn, user_id, self.current_user)
+
+            # Update name mapping if name changed
+            if 'name' in self.current_user:
+                name_lower = self.current_user['name'].lower()
+
+                conn.execute("DELETE FROM name_map WHERE user_id = ? AND name != ?", (user_id, name_lower))
+                conn.execute("INSERT OR REPLACE INTO name_map (name, user_id) VALUES (?, ?)", (name_lower, user_id))
+
+                for platform in self.current_user.get("platforms", {}):
+                    conn.execute("DELETE FROM platform_map WHERE user_id = ? AND platform = ? AND name != ?",
+                                 (user_id, platform, name_lower))
+                    conn.execute("INSERT OR REPLACE INTO platform_map (platform, name, user_id) VALUES (?, ?, ?)",
+                                 (platform, name_lower, user_id))
+
+    @synchronized
+    def link_platform_identities(self, source_platform, source_name, target_platform, target_name):
+        """Link user identities across platforms (in a single transaction)"""
+        conn = self._conn()
+
+        source_row = conn.execute("SELECT user_id FROM platform_map WHERE platform = ? AND name = ?",
+                                  (source_platform, source_name.lower())).fetchone()
+        if not source_row:
+            return False, "Source user not found"
+
+        target_row = conn.execute("SELECT user_id FROM platform_map WHERE platform = ? AND name = ?",
+                                  (target_platform, target_name.lower())).fetchone()
+        if not target_row:
+            return False, "Target user not found"
+
+        source_id = source_row["user_id"]
+        target_id = target_row["user_id"]
+
+        # If same ID, already linked
+        if source_id == target_id:
+            return True, "Identities already linked"
+
+        source_data = self._read_user(conn, source_id)
+        target_data = self._read_user(conn, target_id)
+        self._merge_profiles(source_data, target_data)
+
+        with conn:
+            self._write_user(conn, target_id, target_data)
+            conn.execute("UPDATE OR REPLACE name_map SET user_id = ? WHERE user_id = ?", (target_id, source_id))
+            conn.execute("UPDATE OR REPLACE platform_map SET user_id = ? WHERE user_id = ?", (target_id, source_id))
+            self._delete_user(conn, source_id)
+        self._notify_linked(source_id, target_id)
+
+        return True, f"Successfully linked {source_platform}/{source_name} to {target_platform}/{target_name}"
+
+    @synchronized
+    def cleanup_old_users(self, max_age_days=180, time_budget=None):
+        """Clean up unused user profiles
+
+        Expired users are found through the last_seen index and removed in
+        small transactions. With a time_budget (seconds) the pass stops early
+        and cleanup_complete is False until a later call finishes it.
+
+        Returns:
+            int: Number of profiles removed by this call
+        """
+        # Recent presence must be on disk before deciding who is inactive
+        self.flush()
+
+        conn = self._conn()
+        now = time.time()
+        cutoff = now - (max_age_days * 24 * 60 * 60)
+        deadline = now + time_budget if time_budget is not None else None
+
+        removed_count = 0
+        self.cleanup_complete = False
+
+        while deadline is None or time.time() < deadline:
+            user_ids = [r["user_id"] for r in conn.execute(
+                "SELECT user_id FROM users WHERE COALESCE(last_seen, 0) < ? ORDER BY last_seen LIMIT 100", (cutoff,))]
+            if not user_ids:
+                self.cleanup_complete = True
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('last_cleanup', ?)",
+                                 (json.dumps(now),))
+                break
+
+            with conn:
+                for user_id in user_ids:
+                    self._delete_user(conn, user_id)
+            removed_count += len(user_ids)
+
+        if removed_count:
+            logger.info(f"Cleaned up {removed_count} old user profiles")
+        return removed_count
+
+    @synchronized
+    def update_user(self, user_id, updated_user_data):
+        """Update a user by ID with new data with name history tracking"""
+        conn = self._conn()
+        user_data = self._read_user(conn, user_id)
+
+        if not user_data:
+            logger.warning(f"Attempted to update non-existent user ID: {user_id}")
+            return False
+
+        # If name is changing, store the old name in history
+        old_name = user_data.get("name")
+        new_name = updated_user_data.get("name")
+        if new_name and old_name and old_name != new_name:
+            if old_name not in user_data.setdefault("name_history", []):
+                user_data["name_history"].append(old_name)
+
+        user_data.update(copy.deepcopy(updated_user_data))
+        with conn:
+            self._write_user(conn, user_id, user_data)
+        return True
+
+    @synchronized
+    def create_user(self, user_data, map_names=True):
+        """Create a new user with the provided data
+
+        Args:
+            user_data (dict): User data including at least a name
+            map_names (bool): Point the name (globally and per platform) at the new user;
+                without it the user is only found by ID or platform ID
+
+        Returns:
+            str: The created user ID
+        """
+        if 'name' not in user_data:
+            logger.warning("Attempted to create user without name")
+            return None
+
+        user_id = str(uuid.uuid4())
+        user_data['user_id'] = user_id
+        user_data['created_at'] = time.time()
+        user_data['last_seen'] = time.time()
+        if 'platforms' not in user_data:
+            user_data['platforms'] = {'gui': True}
+
+        conn = self._conn()
+        name_lower = user_data['name'].lower()
+        with conn:
+            self._write_user(conn, user_id, user_data)
+            if map_names:
+                conn.execute("INSERT OR REPLACE INTO name_map (name, user_id) VALUES (?, ?)", (name_lower, user_id))
+                conn.executemany("INSERT OR REPLACE INTO platform_map (platform, name, user_id) VALUES (?, ?, ?)",
+                                 [(platform, name_lower, user_id) for platform in user_data['platforms']])
+
+        return user_id
+
+    @synchronized
+    def import_users(self, users, name_map=None, platform_map=None):
+        """Insert or replace many users in a single transaction
+
+        Args:
+            users (iterable): User dicts, each including its user_id
+            name_map (dict): Optional name -> user ID entries to merge
+            platform_map (dict): Optional platform -> name -> user ID entries to merge
+
+        Returns:
+            int: Number of users imported
+        """
+        conn = self._conn()
+        count = 0
+
+        with conn:
+            for user_data in users:
+                user_id = user_data.get('user_id')
+                if not user_id:
+                    logger.warning("Skipping imported user without ID")
+                    continue
+
+                self._write_user(conn, user_id, user_data)
+
+                # Without explicit maps, index the user under their current name
+                if name_map is None and 'name' in user_data:
+                    name_lower = user_data['name'].lower()
+                    conn.execute("INSERT OR REPLACE INTO name_map (name, user_id) VALUES (?, ?)",
+                                 (name_lower, user_id))
+                    conn.executemany("INSERT OR REPLACE INTO platform_map (platform, name, user_id) VALUES (?, ?, ?)",
+                                     [(platform, name_lower, user_id) for platform in user_data.get('platforms', {})])
+                count += 1
+
+            conn.executemany("INSERT OR REPLACE INTO name_map (name, user_id) VALUES (?, ?)",
+                             list((name_map or {}).items()))
+            conn.executemany("INSERT OR REPLACE INTO platform_map (platform, name, user_id) VALUES (?, ?, ?)",
+                             [(platform, name, user_id) for platform, names in (platform_map or {}).items()
+                              for name, user_id in names.items()])
+
+        return count
+
+    @synchronized
+    def set_conversation_links(self, links):
+        """Replace users' conversation lists in a single transaction
+
+        Args:
+            links (dict): user ID -> list of conversation IDs
+
+        Returns:
+            int: Number of users updated
+        """
+        conn = self._conn()
+        count = 0
+
+        with conn:
+            for user_id, conversation_ids in links.items():
+                if not conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone():
+                    continue
+                conn.execute("DELETE FROM conversation_members WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO conversation_members (user_id, conversation_id, position) VALUES (?, ?, ?)",
+                    [(user_id, conversation_id, i) for i, conversation_id in enumerate(conversation_ids)]
+                )
+                count += 1
+
+        return count
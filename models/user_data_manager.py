@@ -1,30 +1,112 @@
 import json
 import os
+import copy
 import uuid
 import time
+import atexit
 import logging
 import datetime
+import heapq
+import functools
+import threading
+
+from models.user_store import JsonUserStore, ShardedUserStore
+from models import fact_store
 
 # Set up logging
 logger = logging.getLogger("jupiter.user_data")
 
+def synchronized(method):
+    """Run a UserDataManager method while holding its lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class UserDataManager:
-    """Unified manager for user data storage and operations with cross-platform ID support"""
+    """Unified manager for user data storage and operations with cross-platform ID support
+    
+    User data is read from disk once and kept in memory as the authoritative
+    copy. Changes mark the affected users (or the mappings) dirty and are
+    written back by a background thread (atomically, via a temp file and
+    rename), so callers never wait on file I/O. Call flush() before shutting
+    down.
+    
+    With user_data.storage set to "sharded", profiles are stored one file
+    per user (see ShardedUserStore) and an existing user_data.json is
+    migrated on first start.
+    """
     
     def __init__(self, user_data_file, config=None):
         """Initialize with path to user data file"""
         self.user_data_file = user_data_file
-        self.config = config
+        self.config = config or {}
         self.current_user = {}
         
-        # Create empty user data file if it doesn't exist
-        if not os.path.exists(user_data_file):
-            # Create directory if needed
-            dir_name = os.path.dirname(user_data_file)
-            if dir_name:
-                os.makedirs(dir_name, exist_ok=True)
-            # Initialize with new data structure
-            self._initialize_data_file()
+        self.lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty_all = False       # Everything must be written
+        self._dirty_users = set()     # Profiles changed since the last flush
+        self._dirty_index = False     # name_map, platform_map or metadata changed
+        self._presence_pending = set()
+        
+        user_data_config = self.config.get('user_data', {})
+        self._configure_background(user_data_config)
+        
+        if user_data_config.get('storage', 'file') == 'sharded':
+            shard_folder = user_data_config.get(
+                'shard_folder',
+                os.path.join(self.config.get('paths', {}).get('data_folder', 'data'), 'users')
+            )
+            self.store = ShardedUserStore(shard_folder)
+        else:
+            self.store = JsonUserStore(user_data_file)
+        
+        # Secondary indexes, derived from the profiles on load
+        self.history_index = {}       # historical name (lowercase) -> user ID
+        self.platform_id_index = {}   # platform -> platform-specific ID -> user ID
+        self.user_names = {}          # user ID -> {(platform or None, name)} entries in name_map/platform_map
+        self.last_seen_heap = []      # (last_seen, user ID) min-heap; stale entries are skipped on pop
+        self._name_cache = {}         # user ID -> display name, dropped whenever the profile changes
+        self.profile_versions = {}    # user ID -> change counter, for caches of rendered profiles
+        self._profile_epoch = 0       # Bumped when every profile may have changed
+        self.link_listeners = []      # Called with (source ID, target ID) after a link merges profiles
+        
+        self.data = self._read_data_file()
+        self._build_indexes()
+        self.flush()
+        
+        self._start_writer()
+    
+    def _configure_background(self, user_data_config):
+        """Read the write-behind, presence and cleanup settings"""
+        self.flush_interval = user_data_config.get('flush_interval_seconds', 2)
+        
+        # last_seen/platform presence updates are applied in memory at once but
+        # only persisted in batches, at most presence_interval seconds late
+        self.presence_interval = user_data_config.get('presence_flush_seconds', 60)
+        self._last_presence_flush = time.time()
+        
+        # Old profiles are removed incrementally, in short slices from the writer thread
+        self.cleanup_enabled = user_data_config.get('cleanup_enabled', False)
+        self.cleanup_max_age_days = user_data_config.get('cleanup_max_age_days', 180)
+        self.cleanup_interval = user_data_config.get('cleanup_interval_minutes', 60) * 60
+        self.cleanup_slice = user_data_config.get('cleanup_slice_ms', 20) / 1000
+        self._next_cleanup = time.time()
+        self.cleanup_complete = True
+        
+        # Extracted list facts are capped per category, lowest scoring dropped first
+        self.fact_cap = user_data_config.get('fact_cap', 25)
+        self.fact_caps = user_data_config.get('fact_caps', {})
+        self.fact_half_life_days = user_data_config.get('fact_half_life_days', 90)
+    
+    def _start_writer(self):
+        """Start the write-behind thread and make sure pending changes are written at exit"""
+        self._writer_stop = threading.Event()
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True, name="UserDataWriterThread")
+        self._writer_thread.start()
+        atexit.register(self.close)
     
     def _initialize_data_file(self):
         """Initialize the user data file with the new structure"""
@@ -82,37 +164,243 @@ class UserDataManager:
             return new_data
         return legacy_data
     
+    def _read_data_file(self):
+        """Read user data from disk with migration if needed"""
+        source = self.store
+        
+        # First start with sharded storage: migrate from user_data.json (legacy or v2)
+        if not self.store.exists() and isinstance(self.store, ShardedUserStore) and os.path.exists(self.user_data_file):
+            logger.info("Migrating user data to per-user profile files")
+            source = JsonUserStore(self.user_data_file)
+            self._dirty_all = True
+        
+        if source.exists():
+            try:
+                data = source.read()
+                
+                # Check if migration is needed
+                if "known_users" in data:
+                    logger.info("Migrating legacy user data to new ID-based format")
+                    data = self._migrate_legacy_data(data)
+                    self._dirty_all = True
+                
+                return data
+            except json.JSONDecodeError:
+                logger.error("Error decoding user data JSON, initializing new structure")
+        
+        return self._initialize_data_file()
+    
     def load_user_data(self):
-        """Load all user data from file with migration if needed"""
-        if os.path.exists(self.user_data_file):
-            with open(self.user_data_file, 'r', encoding='utf-8') as f:
-                try:
-                    data = json.load(f)
-                    
-                    # Check if migration is needed
-                    if "known_users" in data:
-                        logger.info("Migrating legacy user data to new ID-based format")
-                        data = self._migrate_legacy_data(data)
-                        # Save migrated data
-                        self.save_user_data(data)
-                    
-                    return data
-                except json.JSONDecodeError:
-                    logger.error("Error decoding user data JSON, initializing new structure")
-                    return self._initialize_data_file()
+        """Get the authoritative in-memory user data (call save_user_data after changing it)"""
+        return self.data
+    
+    @synchronized
+    def save_user_data(self, data, user_ids=None):
+        """Schedule user data to be written to file
+        
+        Args:
+            data (dict): The user data (replaces the in-memory copy if it is a different object)
+            user_ids (iterable): Users whose profiles changed, or None if anything may have changed
+        """
+        if data is not getattr(self, 'data', None):
+            self.data = data
+            self._build_indexes()
+            user_ids = None
+        
+        if user_ids is None:
+            self._dirty_all = True
         else:
-            return self._initialize_data_file()
+            self._dirty_users.update(user_ids)
+    
+    @staticmethod
+    def _platform_ids(user_data):
+        """Get a profile's platform-specific IDs, including the older discord_id field"""
+        platform_ids = dict(user_data.get("platform_ids", {}))
+        if "discord_id" in user_data:
+            platform_ids.setdefault("discord", user_data["discord_id"])
+        return platform_ids
+    
+    def _build_indexes(self):
+        """Rebuild the secondary indexes from every profile and name mapping"""
+        self.history_index = {}
+        self.platform_id_index = {}
+        self.user_names = {}
+        self.last_seen_heap = []
+        self._profile_changed()
+        for user_id, user_data in self.data["users"].items():
+            self._index_user(user_id, user_data)
+        
+        for name, user_id in self.data["name_map"].items():
+            self.user_names.setdefault(user_id, set()).add((None, name))
+        for platform, names in self.data["platform_map"].items():
+            for name, user_id in names.items():
+                self.user_names.setdefault(user_id, set()).add((platform, name))
     
-    def save_user_data(self, data):
-        """Save all user data to file"""
-        with open(self.user_data_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+    def _map_name(self, data, user_id, name, platform=None):
+        """Point a name at a user in name_map (or in one platform's map)"""
+        mapping = data["name_map"] if platform is None else data["platform_map"].setdefault(platform, {})
+        previous_id = mapping.get(name)
+        if previous_id is not None and previous_id != user_id:
+            self.user_names.get(previous_id, set()).discard((platform, name))
+        mapping[name] = user_id
+        self.user_names.setdefault(user_id, set()).add((platform, name))
+        self._dirty_index = True
     
+    def _unmap_name(self, data, user_id, name, platform=None):
+        """Remove a user's name from name_map (or from one platform's map)"""
+        mapping = data["name_map"] if platform is None else data["platform_map"].get(platform, {})
+        if mapping.get(name) == user_id:
+            del mapping[name]
+            self._dirty_index = True
+        self.user_names.get(user_id, set()).discard((platform, name))
+    
+    def _index_user(self, user_id, user_data):
+        """Add a profile's historical names and platform IDs to the secondary indexes"""
+        for name in user_data.get("name_history", []):
+            self.history_index.setdefault(name.lower(), user_id)
+        
+        for platform, platform_id in self._platform_ids(user_data).items():
+            self.platform_id_index.setdefault(platform, {})[str(platform_id)] = user_id
+        
+        self._push_last_seen(user_id, user_data)
+    
+    def _push_last_seen(self, user_id, user_data):
+        """Add a user's current last_seen to the heap, compacting it once mostly stale"""
+        heapq.heappush(self.last_seen_heap, (user_data.get("last_seen", 0), user_id))
+        
+        if len(self.last_seen_heap) > 2 * len(self.data["users"]) + 64:
+            users = self.data["users"]
+            self.last_seen_heap = [(users[uid].get("last_seen", 0), uid) for uid in users]
+            heapq.heapify(self.last_seen_heap)
+    
+    def _unindex_user(self, user_id, user_data):
+        """Remove a profile's entries from the secondary indexes"""
+        self._profile_changed(user_id)
+        
+        for name in user_data.get("name_history", []):
+            if self.history_index.get(name.lower()) == user_id:
+                del self.history_index[name.lower()]
+        
+        for platform, platform_id in self._platform_ids(user_data).items():
+            platform_ids = self.platform_id_index.get(platform, {})
+            if platform_ids.get(str(platform_id)) == user_id:
+                del platform_ids[str(platform_id)]
+    
+    @synchronized
+    def record_presence(self, user_id, platform=None):
+        """Note that a user was just seen (optionally on a platform) without forcing a write"""
+        user_data = self.data["users"].get(user_id)
+        if not user_data:
+            return
+        
+        user_data["last_seen"] = time.time()
+        if platform:
+            user_data.setdefault("platforms", {})[platform] = True
+        self._presence_pending.add(user_id)
+        self._push_last_seen(user_id, user_data)
+    
+    def _queue_presence(self):
+        """Schedule pending presence updates to be written with the next flush"""
+        with self.lock:
+            self._dirty_users.update(self._presence_pending)
+            self._presence_pending = set()
+            self._last_presence_flush = time.time()
+    
+    def flush(self):
+        """Write pending changes (including presence updates) to file now"""
+        self._queue_presence()
+        self._write_pending()
+    
+    def _write_pending(self):
+        """Write dirty profiles and mappings"""
+        with self._write_lock:
+            with self.lock:
+                if not (self._dirty_all or self._dirty_users or self._dirty_index):
+                    return
+                writes = self.store.serialize(
+                    self.data,
+                    None if self._dirty_all else self._dirty_users,
+                    self._dirty_all or self._dirty_index
+                )
+                self._dirty_all = False
+                self._dirty_users = set()
+                self._dirty_index = False
+            
+            try:
+                self.store.write(writes)
+            except OSError as e:
+                logger.error(f"Error writing user data: {e}")
+                with self.lock:
+                    self._dirty_all = True
+    
+    def close(self):
+        """Stop the write-behind thread and write pending changes"""
+        self._writer_stop.set()
+        self.flush()
+    
+    def _writer_loop(self):
+        """Background loop that writes dirty data at a fixed interval"""
+        while not self._writer_stop.wait(self.flush_interval):
+            if time.time() - self._last_presence_flush >= self.presence_interval:
+                self._queue_presence()
+            
+            if self.cleanup_enabled and time.time() >= self._next_cleanup:
+                self.cleanup_old_users(self.cleanup_max_age_days, time_budget=self.cleanup_slice)
+                # Keep going on the next tick until the expired users are gone
+                self._next_cleanup = time.time() + (self.cleanup_interval if self.cleanup_complete else 0)
+            
+            self._write_pending()
+    
+    @synchronized
     def get_user_by_id(self, user_id):
         """Get user data by ID"""
         data = self.load_user_data()
-        return data["users"].get(user_id)
+        return copy.deepcopy(data["users"].get(user_id))
+    
+    @synchronized
+    def get_users_by_ids(self, user_ids):
+        """Get several users at once as a dict of user ID -> user data (unknown IDs are left out)"""
+        users = self.data["users"]
+        return {user_id: copy.deepcopy(users[user_id]) for user_id in set(user_ids) if user_id in users}
+    
+    def _profile_changed(self, user_id=None):
+        """Invalidate cached data derived from a profile (or from every profile)"""
+        if user_id is None:
+            self._name_cache = {}
+            self._profile_epoch += 1
+        else:
+            self._name_cache.pop(user_id, None)
+            self.profile_versions[user_id] = self.profile_versions.get(user_id, 0) + 1
+    
+    def get_profile_version(self, user_id):
+        """Get a token that changes whenever the user's stored profile changes
+        
+        Presence updates (last_seen, platforms) don't count as changes.
+        """
+        return self._profile_epoch, self.profile_versions.get(user_id, 0)
     
+    def get_user_names(self, user_ids):
+        """Resolve several user IDs to display names (unknown IDs are left out)
+        
+        Names are cached until the user's profile next changes, so rendering
+        a long conversation costs one lookup per distinct sender.
+        """
+        names = {}
+        missing = []
+        for user_id in set(user_ids):
+            if user_id in self._name_cache:
+                names[user_id] = self._name_cache[user_id]
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            with self.lock:
+                for user_id, user_data in self.get_users_by_ids(missing).items():
+                    names[user_id] = self._name_cache[user_id] = user_data.get("name", "Unknown")
+        
+        return names
+    
+    @synchronized
     def get_user_by_name(self, username, platform="gui"):
         """Get a user by name (case-insensitive)"""
         data = self.load_user_data()
@@ -121,20 +409,47 @@ class UserDataManager:
         # Check platform-specific map first
         if platform in data["platform_map"] and username_lower in data["platform_map"][platform]:
             user_id = data["platform_map"][platform][username_lower]
-            return data["users"].get(user_id), user_id
+            return copy.deepcopy(data["users"].get(user_id)), user_id
         
         # Fall back to global name map
         if username_lower in data["name_map"]:
             user_id = data["name_map"][username_lower]
-            return data["users"].get(user_id), user_id
+            return copy.deepcopy(data["users"].get(user_id)), user_id
             
         return None, None
     
+    @synchronized
+    def get_user_by_platform_id(self, platform, platform_id):
+        """Get a user by a stable platform-specific ID (e.g. a Discord user ID)"""
+        user_id = self.platform_id_index.get(platform, {}).get(str(platform_id))
+        if user_id in self.data["users"]:
+            return copy.deepcopy(self.data["users"][user_id]), user_id
+        return None, None
+    
+    @synchronized
+    def set_platform_id(self, user_id, platform, platform_id):
+        """Record a user's stable platform-specific ID"""
+        data = self.load_user_data()
+        user_data = data["users"].get(user_id)
+        if not user_data:
+            logger.warning(f"Attempted to set platform ID for non-existent user ID: {user_id}")
+            return False
+        
+        self._unindex_user(user_id, user_data)
+        user_data.setdefault("platform_ids", {})[platform] = str(platform_id)
+        if platform == "discord":
+            user_data["discord_id"] = str(platform_id)
+        self._index_user(user_id, user_data)
+        
+        self.save_user_data(data, [user_id])
+        return True
+    
     def get_user(self, username, platform="gui"):
         """Get user data - backward compatibility method"""
         user, _ = self.get_user_by_name(username, platform)
         return user
     
+    @synchronized
     def identify_user(self, username, platform="gui"):
         """Identify a user by username, create if doesn't exist"""
         data = self.load_user_data()
@@ -147,11 +462,8 @@ class UserDataManager:
             
             # Update last_seen timestamp
             if user_data:
-                user_data["last_seen"] = time.time()
-                user_data["platforms"][platform] = True
-                data["users"][user_id] = user_data
-                self.save_user_data(data)
-                return user_data, user_data.get("name", username)
+                self.record_presence(user_id, platform)
+                return copy.deepcopy(user_data), user_data.get("name", username)
         
         # Check global name map as fallback
         if username_lower in data["name_map"]:
@@ -160,18 +472,13 @@ class UserDataManager:
             
             # Update platform info and last_seen
             if user_data:
-                user_data["last_seen"] = time.time()
-                if "platforms" not in user_data:
-                    user_data["platforms"] = {}
-                user_data["platforms"][platform] = True
+                self.record_presence(user_id, platform)
                 
                 # Update platform map
                 if platform in data["platform_map"]:
-                    data["platform_map"][platform][username_lower] = user_id
+                    self._map_name(data, user_id, username_lower, platform)
                 
-                data["users"][user_id] = user_data
-                self.save_user_data(data)
-                return user_data, user_data.get("name", username)
+                return copy.deepcopy(user_data), user_data.get("name", username)
         
         # Create new user with UUID
         user_id = str(uuid.uuid4())
@@ -187,18 +494,19 @@ class UserDataManager:
         
         # Update data structures
         data["users"][user_id] = user_data
-        data["name_map"][username_lower] = user_id
+        self._map_name(data, user_id, username_lower)
         
         if platform in data["platform_map"]:
-            data["platform_map"][platform][username_lower] = user_id
+            self._map_name(data, user_id, username_lower, platform)
         
-        self.save_user_data(data)
-        return user_data, username
+        self.save_user_data(data, [user_id])
+        return copy.deepcopy(user_data), username
     
     def set_current_user(self, user_data):
         """Set the current user data"""
         self.current_user = user_data
     
+    @synchronized
     def save_current_user(self):
         """Save the current user data to file"""
         if not self.current_user or 'user_id' not in self.current_user:
@@ -208,43 +516,88 @@ class UserDataManager:
         data = self.load_user_data()
         user_id = self.current_user['user_id']
         
-        # Update user data
-        data["users"][user_id] = self.current_user
+        if user_id in data["users"]:
+            self._unindex_user(user_id, data["users"][user_id])
+        
+        # Update user data (stored as a copy so later edits need another save)
+        data["users"][user_id] = copy.deepcopy(self.current_user)
+        self._index_user(user_id, data["users"][user_id])
         
         # Update name mapping if name changed
         if 'name' in self.current_user:
             name_lower = self.current_user['name'].lower()
             
-            # Check if we need to update name_map
-            for old_name, mapped_id in list(data["name_map"].items()):
-                if mapped_id == user_id and old_name != name_lower:
-                    # Remove old name mapping
-                    del data["name_map"][old_name]
+            platforms = [platform for platform in self.current_user.get("platforms", {})
+                         if platform in data["platform_map"]]
+            
+            # Remove old name mappings (global, and on the user's platforms)
+            for platform, old_name in list(self.user_names.get(user_id, ())):
+                if old_name != name_lower and (platform is None or platform in platforms):
+                    self._unmap_name(data, user_id, old_name, platform)
             
             # Add current name mapping
-            data["name_map"][name_lower] = user_id
+            self._map_name(data, user_id, name_lower)
             
             # Update platform maps
-            if "platforms" in self.current_user:
-                for platform in self.current_user["platforms"]:
-                    if platform in data["platform_map"]:
-                        # Remove old mappings
-                        for old_name, mapped_id in list(data["platform_map"][platform].items()):
-                            if mapped_id == user_id and old_name != name_lower:
-                                del data["platform_map"][platform][old_name]
-                        
-                        # Add current mapping
-                        data["platform_map"][platform][name_lower] = user_id
-        
-        self.save_user_data(data)
-    
-    def update_user_info(self, extracted_info):
-        """Update current user with extracted information"""
-        if not self.current_user or 'user_id' not in self.current_user:
+            for platform in platforms:
+                self._map_name(data, user_id, name_lower, platform)
+        
+        self.save_user_data(data, [user_id])
+    
+    @synchronized
+    def update_user_info(self, extracted_info, user_id=None):
+        """Update a user with extracted information
+        
+        Args:
+            extracted_info (list): Items of the form {"category": ..., "value": ...}
+            user_id (str): User to update; defaults to the current user
+            
+        Returns:
+            list: Descriptions of the updates made
+        """
+        if user_id is None:
+            if not self.current_user or 'user_id' not in self.current_user:
+                return []
+            
+            updates, changed = self._apply_extracted_info(self.current_user, extracted_info)
+            
+            # Save updates if any were made (a repeated fact only raises its count)
+            if changed:
+                self.save_current_user()
+            return updates
+        
+        user_data = self.get_user_by_id(user_id)
+        if not user_data:
+            logger.warning(f"Attempted to update info for non-existent user ID: {user_id}")
             return []
         
+        updates, changed = self._apply_extracted_info(user_data, extracted_info)
+        if changed:
+            # Keep the active session's copy in step, so a later
+            # save_current_user does not overwrite the new facts (done before
+            # the stored update, which invalidates renderings of the profile)
+            if self.current_user and self.current_user.get('user_id') == user_id:
+                for category in {item.get('category') for item in extracted_info} | {fact_store.META_FIELD}:
+                    if category in user_data:
+                        self.current_user[category] = copy.deepcopy(user_data[category])
+            
+            self.update_user(user_id, user_data)
+        
+        return updates
+    
+    def _apply_extracted_info(self, user_data, extracted_info):
+        """Apply extracted information to a profile dict in place
+        
+        List facts are folded into near-duplicates already on file (raising
+        their count) and each touched category is compacted to its cap.
+        
+        Returns:
+            tuple: (descriptions of the updates made, whether the profile changed)
+        """
         # Keep track of updates made
         updates = []
+        touched = set()
+        now = time.time()
         
         for item in extracted_info:
             if 'category' in item and 'value' in item:
@@ -252,31 +605,88 @@ class UserDataManager:
                 value = item['value']
                 
                 # Skip empty values
-                if not value or value.strip() == "":
+                if not isinstance(value, str) or value.strip() == "":
                     continue
                 
                 # For lists (likes, dislikes, interests, hobbies):
-                if category in ['likes', 'dislikes', 'interests', 'hobbies']:
-                    if category not in self.current_user:
-                        self.current_user[category] = []
-                    
-                    # Only add if not already present
-                    if value not in self.current_user[category]:
-                        self.current_user[category].append(value)
+                if category in fact_store.FACT_CATEGORIES:
+                    result = fact_store.add_fact(user_data, category, value.strip(), now)
+                    if result:
+                        touched.add(category)
+                    if result == "added":
                         updates.append(f"{category}: {value}")
                 else:
                     # For simple key-value pairs
                     # Only update if different from current value
-                    if category not in self.current_user or self.current_user[category] != value:
-                        self.current_user[category] = value
+                    if category not in user_data or user_data[category] != value:
+                        user_data[category] = value
                         updates.append(f"{category}: {value}")
         
-        # Save updates if any were made
-        if updates:
-            self.save_current_user()
-            
-        return updates
+        for category in touched:
+            fact_store.compact_category(user_data, category, self.fact_caps.get(category, self.fact_cap),
+                                        now, self.fact_half_life_days)
+        
+        return updates, bool(updates or touched)
     
+    @staticmethod
+    def _merge_profiles(source_data, target_data):
+        """Merge a source profile into a target profile (used when linking identities)"""
+        # Combine platforms
+        if "platforms" not in target_data:
+            target_data["platforms"] = {}
+        
+        for platform, enabled in source_data.get("platforms", {}).items():
+            target_data["platforms"][platform] = enabled
+        
+        # Keep the source's platform IDs resolving, for every platform the target has none for
+        target_platform_ids = UserDataManager._platform_ids(target_data)
+        for platform, platform_id in UserDataManager._platform_ids(source_data).items():
+            if platform not in target_platform_ids:
+                target_data.setdefault("platform_ids", {})[platform] = str(platform_id)
+                if platform == "discord":
+                    target_data["discord_id"] = str(platform_id)
+        
+        # Combine other data (non-system fields)
+        for key, value in source_data.items():
+            if key not in ["user_id", "name", "platforms", "created_at", "platform_ids", "discord_id",
+                           fact_store.META_FIELD]:
+                # For lists, combine
+                if isinstance(value, list) and key in target_data and isinstance(target_data[key], list):
+                    # Add items not already in target
+                    for item in value:
+                        if item not in target_data[key]:
+                            target_data[key].append(item)
+                # For other fields, only copy if not in target
+                elif key not in target_data:
+                    target_data[key] = value
+        
+        # Combine fact history, then fold facts that are near-duplicates across the two profiles
+        for category, entries in source_data.get(fact_store.META_FIELD, {}).items():
+            target_entries = target_data.setdefault(fact_store.META_FIELD, {}).setdefault(category, {})
+            for key, entry in entries.items():
+                if key in target_entries:
+                    merged = target_entries[key]
+                    merged["count"] = merged.get("count", 1) + entry.get("count", 1)
+                    merged["first_seen"] = min(merged.get("first_seen", 0), entry.get("first_seen", 0))
+                    merged["last_seen"] = max(merged.get("last_seen", 0), entry.get("last_seen", 0))
+                else:
+                    target_entries[key] = dict(entry)
+        
+        for category in fact_store.FACT_CATEGORIES:
+            fact_store.compact_category(target_data, category)
+    
+    def add_link_listener(self, listener):
+        """Register a callable run with (source_id, target_id) when linking merges one user into another"""
+        self.link_listeners.append(listener)
+    
+    def _notify_linked(self, source_id, target_id):
+        for listener in self.link_listeners:
+            try:
+                listener(source_id, target_id)
+            except Exception as e:
+                print(f"Error in link listener: {e}")
+    
+    @synchronized
     def link_platform_identities(self, source_platform, source_name, target_platform, target_name):
         """Link user identities across platforms"""
         data = self.load_user_data()
@@ -304,49 +714,28 @@ class UserDataManager:
         # Merge user data (source into target)
         source_data = data["users"][source_id]
         target_data = data["users"][target_id]
-        
-        # Combine platforms
-        if "platforms" not in target_data:
-            target_data["platforms"] = {}
-        
-        for platform, enabled in source_data.get("platforms", {}).items():
-            target_data["platforms"][platform] = enabled
-        
-        # Combine other data (non-system fields)
-        for key, value in source_data.items():
-            if key not in ["user_id", "name", "platforms", "created_at"]:
-                # For lists, combine
-                if isinstance(value, list) and key in target_data and isinstance(target_data[key], list):
-                    # Add items not already in target
-                    for item in value:
-                        if item not in target_data[key]:
-                            target_data[key].append(item)
-                # For other fields, only copy if not in target
-                elif key not in target_data:
-                    target_data[key] = value
+        self._unindex_user(source_id, source_data)
+        self._unindex_user(target_id, target_data)
+        self._merge_profiles(source_data, target_data)
         
         # Update target data
         data["users"][target_id] = target_data
+        self._index_user(target_id, target_data)
         
-        # Update platform mappings
-        for platform, names in data["platform_map"].items():
-            for name, user_id in list(names.items()):
-                if user_id == source_id:
-                    data["platform_map"][platform][name] = target_id
-        
-        # Update name mappings
-        for name, user_id in list(data["name_map"].items()):
-            if user_id == source_id:
-                data["name_map"][name] = target_id
+        # Move the source's name and platform mappings to the target
+        for platform, name in self.user_names.pop(source_id, set()):
+            self._map_name(data, target_id, name, platform)
         
         # Remove source user
         del data["users"][source_id]
         
         # Save updated data
-        self.save_user_data(data)
+        self.save_user_data(data, [source_id, target_id])
+        self._notify_linked(source_id, target_id)
         
         return True, f"Successfully linked {source_platform}/{source_name} to {target_platform}/{target_name}"
     
+    @synchronized
     def get_user_id_info(self, username, platform="gui"):
         """Get user ID and platform information for display"""
         data = self.load_user_data()
@@ -371,53 +760,71 @@ class UserDataManager:
         
         return None
     
-    def cleanup_old_users(self, max_age_days=180):
-        """Clean up unused user profiles"""
+    @synchronized
+    def cleanup_old_users(self, max_age_days=180, time_budget=None):
+        """Clean up unused user profiles
+        
+        Expired users are popped from the last_seen heap, so only they are
+        visited. With a time_budget (seconds) the pass stops early and
+        cleanup_complete is False until a later call finishes it.
+        
+        Returns:
+            int: Number of profiles removed by this call
+        """
         data = self.load_user_data()
         
         # Calculate cutoff time
         now = time.time()
         cutoff = now - (max_age_days * 24 * 60 * 60)
+        deadline = now + time_budget if time_budget is not None else None
         
         # Track removed users
-        removed_count = 0
+        removed_ids = []
+        self.cleanup_complete = False
         
-        # Find old users
-        for user_id, user_data in list(data["users"].items()):
-            last_seen = user_data.get("last_seen", 0)
+        while self.last_seen_heap and self.last_seen_heap[0][0] < cutoff:
+            if deadline is not None and time.time() >= deadline:
+                break
             
-            if last_seen < cutoff:
-                # Remove from users
-                del data["users"][user_id]
-                
-                # Remove from name map
-                for name, mapped_id in list(data["name_map"].items()):
-                    if mapped_id == user_id:
-                        del data["name_map"][name]
-                
-                # Remove from platform maps
-                for platform, platform_map in data["platform_map"].items():
-                    for name, mapped_id in list(platform_map.items()):
-                        if mapped_id == user_id:
-                            del platform_map[name]
-                
-                removed_count += 1
-        
-        # Update metadata
-        data["metadata"]["last_cleanup"] = now
+            last_seen, user_id = heapq.heappop(self.last_seen_heap)
+            user_data = data["users"].get(user_id)
+            
+            # Skip stale entries (user removed, or seen again since)
+            if not user_data or user_data.get("last_seen", 0) != last_seen:
+                continue
+            
+            # Remove from users
+            del data["users"][user_id]
+            self._unindex_user(user_id, user_data)
+            
+            # Remove from name and platform maps
+            for platform, name in list(self.user_names.get(user_id, ())):
+                self._unmap_name(data, user_id, name, platform)
+            self.user_names.pop(user_id, None)
+            
+            removed_ids.append(user_id)
+        else:
+            self.cleanup_complete = True
+            
+            # Update metadata
+            data["metadata"]["last_cleanup"] = now
+            self._dirty_index = True
         
         # Save updated data
-        if removed_count > 0:
-            self.save_user_data(data)
-            logger.info(f"Cleaned up {removed_count} old user profiles")
+        if removed_ids:
+            self.save_user_data(data, removed_ids)
+            logger.info(f"Cleaned up {len(removed_ids)} old user profiles")
         
-        return removed_count
+        return len(removed_ids)
     
+    @synchronized
     def update_user(self, user_id, updated_user_data):
         """Update a user by ID with new data with name history tracking"""
         data = self.load_user_data()
         
         if user_id in data["users"]:
+            self._unindex_user(user_id, data["users"][user_id])
+            
             # If name is changing, store the old name in history
             if "name" in updated_user_data:
                 old_name = data["users"][user_id].get("name")
@@ -433,13 +840,15 @@ class UserDataManager:
                         data["users"][user_id]["name_history"].append(old_name)
             
             # Update user data
-            data["users"][user_id].update(updated_user_data)
-            self.save_user_data(data)
+            data["users"][user_id].update(copy.deepcopy(updated_user_data))
+            self._index_user(user_id, data["users"][user_id])
+            self.save_user_data(data, [user_id])
             return True
         else:
             logger.warning(f"Attempted to update non-existent user ID: {user_id}")
             return False
     
+    @synchronized
     def get_user_by_name_extended(self, username, platform="all"):
         """Get user by username, checking across all platforms and name history"""
         data = self.load_user_data()
@@ -458,22 +867,23 @@ class UserDataManager:
             if p in data["platform_map"] and username_lower in data["platform_map"][p]:
                 user_id = data["platform_map"][p][username_lower]
                 if user_id in data["users"]:
-                    return data["users"][user_id], user_id
+                    return copy.deepcopy(data["users"][user_id]), user_id
         
-        # Check name history in all users
-        for user_id, user_data in data["users"].items():
-            if "name_history" in user_data:
-                for historical_name in user_data["name_history"]:
-                    if historical_name.lower() == username_lower:
-                        return user_data, user_id
+        # Check name history
+        user_id = self.history_index.get(username_lower)
+        if user_id in data["users"]:
+            return copy.deepcopy(data["users"][user_id]), user_id
         
         return None, None
     
-    def create_user(self, user_data):
+    @synchronized
+    def create_user(self, user_data, map_names=True):
         """Create a new user with the provided data
         
         Args:
             user_data (dict): User data including at least a name
+            map_names (bool): Point the name (globally and per platform) at the new user;
+                without it the user is only found by ID or platform ID
             
         Returns:
             str: The created user ID
@@ -498,18 +908,105 @@ class UserDataManager:
         data = self.load_user_data()
         
         # Add user to data structure
-        data['users'][user_id] = user_data
-        
-        # Update name mapping
-        name_lower = user_data['name'].lower()
-        data['name_map'][name_lower] = user_id
+        data['users'][user_id] = copy.deepcopy(user_data)
+        self._index_user(user_id, data['users'][user_id])
         
-        # Update platform mappings
-        for platform in user_data.get('platforms', {}):
-            if platform in data['platform_map']:
-                data['platform_map'][platform][name_lower] = user_id
+        if map_names:
+            # Update name mapping
+            name_lower = user_data['name'].lower()
+            self._map_name(data, user_id, name_lower)
+            
+            # Update platform mappings
+            for platform in user_data.get('platforms', {}):
+                if platform in data['platform_map']:
+                    self._map_name(data, user_id, name_lower, platform)
         
         # Save the updated data
-        self.save_user_data(data)
+        self.save_user_data(data, [user_id])
+        
+        return user_id
+    
+    @synchronized
+    def iter_users(self):
+        """Get a snapshot list of (user_id, user_data) for every stored user"""
+        data = self.load_user_data()
+        return [(user_id, copy.deepcopy(user_data)) for user_id, user_data in data["users"].items()]
+    
+    @synchronized
+    def get_identity_maps(self):
+        """Get the name and platform maps used to resolve users"""
+        data = self.load_user_data()
+        return copy.deepcopy({"name_map": data["name_map"], "platform_map": data["platform_map"]})
+    
+    @synchronized
+    def import_users(self, users, name_map=None, platform_map=None):
+        """Insert or replace many users with a single load and save
+        
+        Args:
+            users (iterable): User dicts, each including its user_id
+            name_map (dict): Optional name -> user ID entries to merge
+            platform_map (dict): Optional platform -> name -> user ID entries to merge
+            
+        Returns:
+            int: Number of users imported
+        """
+        data = self.load_user_data()
+        imported_ids = []
+        
+        for user_data in users:
+            user_id = user_data.get('user_id')
+            if not user_id:
+                logger.warning("Skipping imported user without ID")
+                continue
+            
+            if user_id in data["users"]:
+                self._unindex_user(user_id, data["users"][user_id])
+            data["users"][user_id] = user_data
+            self._index_user(user_id, user_data)
+            
+            # Without explicit maps, index the user under their current name
+            if name_map is None and 'name' in user_data:
+                name_lower = user_data['name'].lower()
+                self._map_name(data, user_id, name_lower)
+                for platform in user_data.get('platforms', {}):
+                    self._map_name(data, user_id, name_lower, platform)
+            
+            imported_ids.append(user_id)
+        
+        for name, user_id in (name_map or {}).items():
+            self._map_name(data, user_id, name)
+        
+        for platform, names in (platform_map or {}).items():
+            for name, user_id in names.items():
+                self._map_name(data, user_id, name, platform)
         
-        return user_id  # Add this line to return the created user ID
\ No newline at end of file
+        self.save_user_data(data, imported_ids)
+        return len(imported_ids)
+    
+    @synchronized
+    def set_conversation_links(self, links):
+        """Replace users' conversation lists with a single load and save
+        
+        Args:
+            links (dict): user ID -> list of conversation IDs
+            
+        Returns:
+            int: Number of users updated
+        """
+        data = self.load_user_data()
+        updated_ids = []
+        
+        for user_id, conversation_ids in links.items():
+            if user_id in data["users"]:
+                data["users"][user_id]["conversations"] = list(conversation_ids)
+                updated_ids.append(user_id)
+        
+        self.save_user_data(data, updated_ids)
+        return len(updated_ids)
+
+def create_user_data_manager(user_data_file, config=None):
+    """Create the user data manager for the configured storage backend"""
+    if (config or {}).get('user_data', {}).get('storage') == 'sqlite':
+        from models.sqlite_user_data_manager import SQLiteUserDataManager
+        return SQLiteUserDataManager(user_data_file, config)
+    return UserDataManager(user_data_file, config)
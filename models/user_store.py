@@ -0,0 +1,139 @@
+import json
+import os
+import logging
+
+logger = logging.getLogger("jupiter.user_data")
+
+def write_atomic(path, text):
+    """Write a file through a temp file and rename, so readers never see a partial write"""
+    temp_file = path + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+
+class JsonUserStore:
+    """Original layout: every profile and mapping in one user_data.json document"""
+
+    def __init__(self, user_data_file):
+        self.user_data_file = user_data_file
+
+        dir_name = os.path.dirname(user_data_file)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+
+    def exists(self):
+        return os.path.exists(self.user_data_file)
+
+    def read(self):
+        """Read the whole document (raises json.JSONDecodeError if it is corrupt)"""
+        with open(self.user_data_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def serialize(self, data, user_ids=None, index_dirty=True):
+        """Get the (path, text) writes for a change; any change rewrites the whole document"""
+        return [(self.user_data_file, json.dumps(data, indent=4))]
+
+    def write(self, writes):
+        for path, text in writes:
+            write_atomic(path, text)
+
+class ShardedUserStore:
+    """Per-user layout: one small file per profile plus a compact index file
+
+    <user_id>.json in the folder holds each profile; index.json beside them
+    holds name_map, platform_map and metadata. A profile change rewrites only that user's
+    file, and the index is only rewritten when a mapping changes.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_file = os.path.join(folder, self.INDEX_FILE)
+        os.makedirs(folder, exist_ok=True)
+        self._move_nested_profiles()
+
+    def _move_nested_profiles(self):
+        """Move profiles from the earlier <folder>/users/ layout up into the folder"""
+        nested = os.path.join(self.folder, "users")
+        if not os.path.isdir(nested):
+            return
+        for name in os.listdir(nested):
+            if name.endswith(".json"):
+                os.replace(os.path.join(nested, name), os.path.join(self.folder, name))
+        try:
+            os.rmdir(nested)
+        except OSError:
+            pass  # Not empty
+
+    def _user_path(self, user_id):
+        return os.path.join(self.folder, f"{user_id}.json")
+
+    def _profile_entries(self):
+        """Yield (user_id, entry) for every profile file"""
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.name != self.INDEX_FILE and entry.is_file():
+                    yield entry.name[:-len(".json")], entry
+
+    def exists(self):
+        return os.path.exists(self.index_file)
+
+    def read(self):
+        """Assemble the full user data structure from the index and profile files"""
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+
+        users = {}
+        for user_id, entry in self._profile_entries():
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    users[user_id] = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Error loading user profile {entry.name}: {e}")
+
+        return {
+            "users": users,
+            "name_map": index.get("name_map", {}),
+            "platform_map": index.get("platform_map", {}),
+            "metadata": index.get("metadata", {})
+        }
+
+    def serialize(self, data, user_ids=None, index_dirty=True):
+        """Get the (path, text) writes for a change; text is None for deleted profiles
+
+        Args:
+            data (dict): Full user data structure
+            user_ids (iterable): Changed users, or None to write every profile
+            index_dirty (bool): Whether the mappings or metadata changed
+        """
+        writes = []
+
+        if user_ids is None:
+            user_ids = set(data["users"])
+            # A full write also removes profiles that no longer exist
+            for user_id, entry in self._profile_entries():
+                if user_id not in user_ids:
+                    writes.append((entry.path, None))
+
+        for user_id in user_ids:
+            user_data = data["users"].get(user_id)
+            writes.append((self._user_path(user_id), None if user_data is None else json.dumps(user_data, indent=4)))
+
+        # Profiles are written before the index that refers to them
+        if index_dirty:
+            metadata = dict(data.get("metadata", {}), version=3, storage="sharded")
+            index = {"name_map": data["name_map"], "platform_map": data["platform_map"], "metadata": metadata}
+            writes.append((self.index_file, json.dumps(index, separators=(',', ':'))))
+
+        return writes
+
+    def write(self, writes):
+        for path, text in writes:
+            if text is None:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                write_atomic(path, text)
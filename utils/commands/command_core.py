@@ -469,6 +469,81 @@ def prompt_command(ctx, args=None):
     
     return response
 
+def perf_command(ctx, args=None):
+    """Show per-stage response latency from the tracing spans"""
+    tracer = ctx.get("tracer")
+    
+    if not tracer or not tracer.enabled:
+        return "Tracing is disabled."
+    
+    summary = tracer.summary()
+    if not summary:
+        return "No turns have been traced yet."
+    
+    lines = ["**Response latency by stage** (ms, recent turns)", "```",
+             f"{'Stage':<16}{'Count':>7}{'p50':>10}{'p95':>10}"]
+    for stage, stats in summary.items():
+        lines.append(f"{stage:<16}{stats['count']:>7}{stats['p50']:>10.1f}{stats['p95']:>10.1f}")
+    lines.append("```")
+    
+    # Discord's generation queue, when asked from Discord
+    work_queue = getattr(ctx.get("client"), "work_queue", None)
+    if work_queue:
+        queue = work_queue.metrics()
+        lines.append(f"**Discord queue**: {queue['pending']}/{queue['max_pending']} pending "
+                     f"({queue['running']} running on {queue['workers']} workers, {queue['queued']} waiting), "
+                     f"peak {queue['peak_pending']}, deepest channel {queue['busiest_channel_depth']}, "
+                     f"shed {queue['shed']} of {queue['submitted'] + queue['shed']}, "
+                     f"wait p50 {queue['wait_p50']:.0f}ms / p95 {queue['wait_p95']:.0f}ms")
+    
+    lines.append(f"Trace file: {tracer.trace_file}")
+    
+    return "\n".join(lines)
+
+def profile_command(ctx, args=None):
+    """Profile the next turns or a time window"""
+    profiler = ctx.get("profiler")
+    
+    if not profiler:
+        return "Profiling is not available here."
+    
+    usage = "Usage: `/profile [turns N | seconds S] [cprofile|sample]`, `/profile stop` or `/profile status`"
+    words = (args or "").lower().split()
+    
+    if not words or words[0] == "status":
+        return profiler.status()
+    
+    if words[0] == "stop":
+        path = profiler.stop()
+        return f"Profile written to {path}" if path else "Nothing was profiled."
+    
+    if words[0] not in ("turns", "seconds") or len(words) < 2 or not words[1].isdigit():
+        return usage
+    
+    mode = words[2] if len(words) > 2 else "cprofile"
+    count = int(words[1])
+    if words[0] == "turns":
+        return profiler.start(mode, turns=count)
+    return profiler.start(mode, seconds=count)
+
+# Register the profile command
+registry.register(Command(
+    name="profile",
+    handler=profile_command,
+    description="Profile the next turns or seconds (cProfile or stack sampling) into logs/profiles",
+    usage="/profile [turns N | seconds S] [cprofile|sample]",
+    platforms=["terminal", "gui"]  # Local only
+))
+
+# Register the perf command
+registry.register(Command(
+    name="perf",
+    handler=perf_command,
+    description="Show p50/p95 response latency per pipeline stage",
+    usage="/perf",
+    platforms=["discord", "terminal", "gui"]
+))
+
 # Register the prompt command
 registry.register(Command(
     name="prompt",
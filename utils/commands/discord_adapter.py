@@ -1,6 +1,6 @@
 from .registry import registry
 import logging
-import asyncio
+from utils.discord.work_queue import BUSY_MESSAGE, QueueFullError
 
 # Add logger
 logger = logging.getLogger("jupiter.commands")
@@ -27,12 +27,17 @@ async def handle_discord_command(client, message):
             "user_manager": client.user_data_manager,
             "message": message,
             "client": client,
+            "tracer": client.chat_engine.tracer,
             "ui": None  # Discord has no UI object
         }
         
-        # Execute command in a thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, command.handler, ctx, args)
+        # Execute command on the client's work queue to avoid blocking,
+        # in order with other work for the channel
+        try:
+            response = await client.run_queued(message.channel.id, command.handler, ctx, args)
+        except QueueFullError:
+            logger.warning(f"Shedding command {command_name}, queue full")
+            response = client.config.get("busy_message", BUSY_MESSAGE)
         
         # Send response using client's method that handles long messages
         if response:
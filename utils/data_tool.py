@@ -0,0 +1,273 @@
+"""
+Offline maintenance tool for Jupiter's data folder.
+
+Usage (run from the project root with Jupiter stopped):
+
+    python -m utils.data_tool export backup.jsonl
+    python -m utils.data_tool import backup.jsonl
+    python -m utils.data_tool reindex [--only archive participants users search]
+
+Exports are streamed as JSON Lines: a "meta" record, the identity maps, one
+"user" record per profile and one "conversation" record (header plus
+messages) per conversation. Conversations are read and written by a small
+worker pool with a bounded number in flight, so memory use does not grow
+with the size of the store.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from models.llm_client import LLMClient
+from models.user_data_manager import create_user_data_manager
+from utils.memory.conversation_manager import ConversationManager
+
+EXPORT_FORMAT = "jupiter-export"
+EXPORT_VERSION = 1
+
+INDEX_TARGETS = ["archive", "participants", "users", "search"]
+
+# Paths filled in when the configuration file leaves them out (as main.load_config does)
+DEFAULT_PATHS = {"data_folder": "data", "user_data_file": "user_data.json"}
+
+USER_BATCH_SIZE = 500
+
+class Progress:
+    """Single-line progress report on stderr"""
+
+    def __init__(self, label, total=None, interval=0.5):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.count = 0
+        self.start = time.time()
+        self.last_report = 0
+
+    def update(self, count=1):
+        self.count += count
+        now = time.time()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self._report()
+
+    def finish(self):
+        self._report()
+        sys.stderr.write("\n")
+        sys.stderr.flush()
+
+    def _report(self):
+        elapsed = time.time() - self.start
+        rate = self.count / elapsed if elapsed > 0 else 0
+        done = f"{self.count}/{self.total}" if self.total is not None else str(self.count)
+        sys.stderr.write(f"\r{self.label}: {done} ({rate:.0f}/s)")
+        sys.stderr.flush()
+
+def bounded_map(executor, fn, items, max_pending):
+    """Like executor.map, but never submits more than max_pending items ahead of the consumer"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def load_config(config_path):
+    """Load the configuration file, falling back to default paths
+
+    main.load_config is not reused because importing main pulls in the
+    voice and UI stack, which this tool has no use for.
+    """
+    config = {}
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except Exception as e:
+            print(f"Error loading configuration: {e}")
+
+    paths = config.setdefault('paths', {})
+    for key, value in DEFAULT_PATHS.items():
+        paths.setdefault(key, value)
+
+    # The background archiver must not move conversations while we work, and
+    # the search index is rebuilt here rather than backfilled in the background
+    config['archive'] = dict(config.get('archive', {}), enabled=False)
+    config['memory'] = dict(config.get('memory', {}), backfill=False)
+    return config
+
+def create_managers(config):
+    """Create the user and conversation managers for the configured data folder"""
+    llm_config = config.get('llm', {})
+    llm_client = LLMClient(
+        api_url=llm_config.get('api_url', "http://localhost:11434"),
+        default_model=llm_config.get('default_model', "llama3")
+    )
+    user_data_manager = create_user_data_manager(config['paths']['user_data_file'], config)
+    conversation_manager = ConversationManager(config, user_data_manager, llm_client)
+    return user_data_manager, conversation_manager
+
+def _write_record(f, record_type, data):
+    f.write(json.dumps({"type": record_type, "data": data}, ensure_ascii=False, separators=(',', ':')))
+    f.write("\n")
+
+def export_data(user_data_manager, conversation_manager, output_file, workers):
+    """Stream every user profile and conversation to a JSONL file"""
+    conversation_ids = list(conversation_manager.iter_conversation_ids())
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        _write_record(f, "meta", {
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "exported_at": time.time(),
+            "conversation_count": len(conversation_ids)
+        })
+        _write_record(f, "identity_maps", user_data_manager.get_identity_maps())
+
+        progress = Progress("Users")
+        for _, user_data in user_data_manager.iter_users():
+            _write_record(f, "user", user_data)
+            progress.update()
+        progress.finish()
+
+        progress = Progress("Conversations", total=len(conversation_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for conversation in bounded_map(executor, conversation_manager.get_conversation,
+                                            conversation_ids, workers * 4):
+                if conversation:
+                    _write_record(f, "conversation", conversation)
+                progress.update()
+        progress.finish()
+
+def _read_records(input_file):
+    """Yield (type, data) for each record of an export file"""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping unreadable record on line {line_number}: {e}")
+                continue
+            yield record.get("type"), record.get("data")
+
+def import_data(user_data_manager, conversation_manager, input_file, workers):
+    """Bulk-load an export file, replacing records that already exist
+
+    Users are imported in batches of USER_BATCH_SIZE as they are read, and
+    the identity maps once at the end, so memory use stays bounded.
+    """
+    maps = {}
+    users = []
+    user_count = 0
+
+    def import_users():
+        nonlocal users, user_count
+        if users:
+            # With identity maps in the file, names are mapped from them at the end
+            empty_map = {} if maps else None
+            user_count += user_data_manager.import_users(users, empty_map, empty_map)
+            users = []
+
+    def conversations():
+        for record_type, data in _read_records(input_file):
+            if record_type == "meta":
+                if data.get("format") != EXPORT_FORMAT or data.get("version", 0) > EXPORT_VERSION:
+                    raise ValueError(f"Unsupported export file: {data}")
+            elif record_type == "identity_maps":
+                maps.update(data)
+            elif record_type == "user":
+                users.append(data)
+                if len(users) >= USER_BATCH_SIZE:
+                    import_users()
+            elif record_type == "conversation":
+                yield data
+
+    def store(conversation):
+        conversation_manager.import_conversation(conversation, save_index=False)
+
+    progress = Progress("Conversations")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in bounded_map(executor, store, conversations(), workers * 4):
+            progress.update()
+    conversation_manager.participant_index.save()
+    progress.finish()
+
+    import_users()
+    if maps:
+        user_data_manager.import_users([], maps.get("name_map"), maps.get("platform_map"))
+    print(f"Imported {user_count} users and {progress.count} conversations")
+
+def rebuild_indexes(user_data_manager, conversation_manager, targets, workers):
+    """Rebuild the selected derived indexes from the raw conversation store"""
+    if "archive" in targets:
+        count = conversation_manager.rebuild_archive_index()
+        print(f"Archive index: {count} archived conversations")
+
+    if "participants" in targets:
+        count = conversation_manager.rebuild_participant_index()
+        print(f"Participant index: {count} conversations")
+
+    if "users" in targets:
+        index = conversation_manager.participant_index
+        links = {user_id: index.conversations_for(user_id) for user_id, _ in user_data_manager.iter_users()}
+        count = user_data_manager.set_conversation_links(links)
+        print(f"User conversation links: {count} users")
+
+    if "search" in targets:
+        if not conversation_manager.semantic_memory:
+            print("Search index: semantic memory is disabled, skipping")
+            return
+
+        conversation_ids = list(conversation_manager.iter_conversation_ids())
+        progress = Progress("Search index", total=len(conversation_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            conversations = (conversation for conversation in bounded_map(
+                executor, conversation_manager.get_conversation, conversation_ids, workers * 4)
+                if conversation)
+            count = conversation_manager.rebuild_search_index(conversations, progress=progress.update)
+        progress.finish()
+        print(f"Search index: {count} messages")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, import and reindex Jupiter's stored data")
+    parser.add_argument("--config", default="config/default_config.json", help="Configuration file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Worker threads")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Stream all users and conversations to a JSONL file")
+    export_parser.add_argument("output", help="Output file")
+
+    import_parser = subparsers.add_parser("import", help="Load an export file (then rebuild indexes)")
+    import_parser.add_argument("input", help="Export file")
+    import_parser.add_argument("--no-reindex", action="store_true", help="Skip rebuilding indexes after import")
+
+    reindex_parser = subparsers.add_parser("reindex", help="Rebuild derived indexes from the raw store")
+    reindex_parser.add_argument("--only", nargs="+", choices=INDEX_TARGETS, default=INDEX_TARGETS,
+                                help="Indexes to rebuild")
+
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    user_data_manager, conversation_manager = create_managers(load_config(args.config))
+
+    if args.command == "export":
+        export_data(user_data_manager, conversation_manager, args.output, workers)
+    elif args.command == "import":
+        import_data(user_data_manager, conversation_manager, args.input, workers)
+        if not args.no_reindex:
+            rebuild_indexes(user_data_manager, conversation_manager, ["users", "search"], workers)
+    elif args.command == "reindex":
+        rebuild_indexes(user_data_manager, conversation_manager, args.only, workers)
+
+    if conversation_manager.semantic_memory:
+        conversation_manager.semantic_memory.flush()
+    user_data_manager.close()
+
+if __name__ == "__main__":
+    main()
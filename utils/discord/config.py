@@ -1,6 +1,8 @@
 import os
 import logging
 
+from utils.discord.work_queue import BUSY_MESSAGE
+
 class DiscordConfig:
     """Configuration for Jupiter's Discord integration"""
     
@@ -10,6 +12,9 @@ class DiscordConfig:
         "allowed_channels": [],         # Empty list = all channels
         "observation_timeout": 300,     # How long Jupiter observes a channel (seconds)
         "name_variations": ["jupiter", "jup"],  # Names that trigger attention
+        "generation_workers": 2,        # Concurrent generations; match the LLM backend's parallel capacity
+        "max_queued_requests": 20,      # Queued + running requests before new ones get the busy reply
+        "busy_message": BUSY_MESSAGE,
     }
     
     def __init__(self, config_dict=None):
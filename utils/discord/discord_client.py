@@ -4,8 +4,11 @@ import logging
 import time
 import json
 import os
+import threading
 from typing import Dict, Any, List, Optional
 from utils.commands.discord_adapter import handle_discord_command
+from utils.log_retention import RotatingLogHandler
+from utils.discord.work_queue import BUSY_MESSAGE, ChannelWorkQueue, QueueFullError
 import utils.commands.command_core
 from discord import app_commands
 
@@ -25,7 +28,13 @@ class JupiterDiscordClient:
         # Setup logger
         self.logger = logging.getLogger("jupiter.discord")
         if not self.logger.handlers:
-            handler = logging.FileHandler('logs/discord.log')
+            # Rotated by size and age; LogRetention compresses and evicts the old files
+            retention_config = chat_engine.config.get('log_retention', {})
+            handler = RotatingLogHandler(
+                'logs/discord.log',
+                max_bytes=retention_config.get('max_file_mb', 10) * 1024 * 1024,
+                max_age=retention_config.get('max_file_age_hours', 24) * 3600
+            )
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
@@ -40,6 +49,19 @@ class JupiterDiscordClient:
         # Channel monitoring state - {channel_id: expiry_timestamp}
         self.active_channels = {}
         
+        # Stored conversation for each channel - {channel_id: conversation_id}
+        self.channel_conversations_file = 'data/discord/channel_conversations.json'
+        self.channel_conversations = self._load_channel_conversations()
+        self.channel_conversations_lock = threading.Lock()
+        
+        # Generation and commands run on a pool sized to the LLM backend's
+        # capacity, in per-channel order; past the queue limit requests are
+        # answered with busy_message instead of waiting
+        self.work_queue = ChannelWorkQueue(
+            max_workers=self.config.get("generation_workers", 2),
+            max_pending=self.config.get("max_queued_requests", 20)
+        )
+        
         # Setup event handlers
         self.setup_event_handlers()
         
@@ -254,7 +276,11 @@ class JupiterDiscordClient:
             # Set typing indicator for better UX
             async with message.channel.typing():
                 # Use the async version instead
-                response = await self._generate_response_async(jupiter_user, message.content)
+                try:
+                    response = await self._generate_response_async(jupiter_user, message.content, message.channel)
+                except QueueFullError:
+                    self.logger.warning(f"Shedding message from {message.author.name}, queue full: {self.work_queue.metrics()}")
+                    response = self.config.get("busy_message", BUSY_MESSAGE)
                 
                 # Log Jupiter's response
                 self.logger.info(f"[{channel_type}] Jupiter: {response[:100]}... ({channel_info})")
@@ -346,87 +372,159 @@ class JupiterDiscordClient:
         username = discord_user.name
         discord_id = str(discord_user.id)
         
-        # Try to find existing user by platform-specific identifier
+        # Look up by the stable Discord ID first (survives username changes)
+        user, user_id = self.user_data_manager.get_user_by_platform_id("discord", discord_id)
+        if user:
+            self.user_data_manager.record_presence(user_id, "discord")
+            return user
+        
+        # Fall back to the username for profiles created before IDs were recorded
         user, user_id = self.user_data_manager.get_user_by_name(username, "discord")
         
-        if not user:
+        if user and (user.get("platform_ids", {}).get("discord") or user.get("discord_id")):
+            # The name belongs to a profile bound to another Discord account;
+            # give this account its own profile, found only by its Discord ID
+            self.logger.info(f"Discord name {username} is taken by another account, creating a separate profile")
+            user_id = self.user_data_manager.create_user({"name": username, "platforms": {"discord": True}},
+                                                         map_names=False)
+        elif not user:
             # Create new user through Jupiter's system
             user, _ = self.user_data_manager.identify_user(username, "discord")
-            
-            # Add Discord metadata
-            if user:
-                user["discord_id"] = discord_id
-                self.user_data_manager.set_current_user(user)
-                self.user_data_manager.save_current_user()
+            user_id = user.get("user_id") if user else None
+        
+        # Add Discord metadata
+        if user_id and self.user_data_manager.set_platform_id(user_id, "discord", discord_id):
+            user, _ = self.user_data_manager.get_user_by_platform_id("discord", discord_id)
         
         return user
     
-    def _generate_response(self, jupiter_user, message_text) -> str:
-        """Generate a response from Jupiter's chat engine"""
-        # Save current user state
-        original_user = self.chat_engine.user_data_manager.current_user
+    def _generate_response(self, jupiter_user, message_text, channel=None) -> str:
+        """Generate a response from Jupiter's chat engine
         
-        try:
-            # Set Jupiter's current user to the Discord user
-            self.chat_engine.user_data_manager.set_current_user(jupiter_user)
-            
-            # Prepare message for LLM (reusing Jupiter's own method)
-            llm_message = self.chat_engine.prepare_message_for_llm(message_text)
-            
-            # Generate response
-            response = self.chat_engine.llm_client.generate_chat_response(
-                llm_message, 
-                temperature=self.chat_engine.config['llm']['chat_temperature']
-            )
-            
-            # Validate and clean the response
-            response = response.strip()
-            
-            # If response is empty after validation, retry with modified prompt
-            retry_count = 0
-            max_retries = 2
-            
-            while not response and retry_count < max_retries:
-                self.logger.warning(f"Empty Discord response detected, retrying ({retry_count+1}/{max_retries})")
+        When a channel is given, the message and response are saved to that
+        channel's stored conversation.
+        """
+        tracer = self.chat_engine.tracer
+        with tracer.turn("discord"):
+            try:
+                # Prepare message for LLM (reusing Jupiter's own method); the
+                # Discord user is passed through rather than made the current
+                # user, which the terminal and other workers share
+                llm_message = self.chat_engine.prepare_message_for_llm(message_text, user=jupiter_user)
                 
-                # Modify the prompt to instruct LLM to avoid certain terms
-                retry_message = llm_message + "\n\nIMPORTANT: Your previous response was filtered. A response MUST be provided without mentioning yours or the user's names."
+                # Generate response
+                with tracer.span("llm"):
+                    response = self.chat_engine.llm_client.generate_chat_response(
+                        llm_message, 
+                        temperature=self.chat_engine.config['llm']['chat_temperature']
+                    )
                 
-                # Try again with modified prompt
-                response = self.chat_engine.llm_client.generate_chat_response(
-                    retry_message,
-                    temperature=self.chat_engine.config['llm']['chat_temperature'] * 0.9  # Slightly reduce temperature
-                )
+                # Validate and clean the response
+                with tracer.span("validate"):
+                    response = response.strip()
                 
-                # Validate again
-                response = response.strip()
-                retry_count += 1
-            
-            # If still empty, provide a fallback message
-            if not response:
-                preferred_name = jupiter_user.get('name', 'there')
-                response = f"Hello {preferred_name}! I'm back online and ready to chat. How have you been?"
+                # If response is empty after validation, retry with modified prompt
+                retry_count = 0
+                max_retries = 2
+                
+                while not response and retry_count < max_retries:
+                    self.logger.warning(f"Empty Discord response detected, retrying ({retry_count+1}/{max_retries})")
+                    
+                    # Modify the prompt to instruct LLM to avoid certain terms
+                    retry_message = llm_message + "\n\nIMPORTANT: Your previous response was filtered. A response MUST be provided without mentioning yours or the user's names."
+                    
+                    # Try again with modified prompt
+                    with tracer.span("retry"):
+                        response = self.chat_engine.llm_client.generate_chat_response(
+                            retry_message,
+                            temperature=self.chat_engine.config['llm']['chat_temperature'] * 0.9  # Slightly reduce temperature
+                        )
+                        
+                        # Validate again
+                        response = response.strip()
+                    retry_count += 1
+                
+                # If still empty, provide a fallback message
+                if not response:
+                    preferred_name = jupiter_user.get('name', 'there')
+                    response = f"Hello {preferred_name}! I'm back online and ready to chat. How have you been?"
+                
+                if channel is not None:
+                    with tracer.span("persist"):
+                        self._save_exchange(channel, jupiter_user, message_text, response)
+                
+                return response
+                
+            except Exception as e:
+                self.logger.error(f"Error generating response: {str(e)}", exc_info=True)
+                return "I'm having trouble responding right now. Please try again later."
+    
+    async def _generate_response_async(self, jupiter_user, message_text, channel=None) -> str:
+        """Generate a response from Jupiter's chat engine asynchronously
+        
+        Raises QueueFullError when the work queue sheds the request.
+        """
+        channel_key = channel.id if channel is not None else f"user:{jupiter_user.get('user_id')}"
+        return await self.run_queued(channel_key, self._generate_response, jupiter_user, message_text, channel)
+    
+    async def run_queued(self, channel_key, fn, *args):
+        """Run fn(*args) on the work queue, after earlier work for the same channel
+        
+        Raises QueueFullError when the queue is at its limit.
+        """
+        return await asyncio.wrap_future(self.work_queue.submit(channel_key, fn, *args))
+    
+    def _load_channel_conversations(self) -> Dict[str, str]:
+        """Load the channel -> conversation mapping from persistent storage"""
+        if os.path.exists(self.channel_conversations_file):
+            try:
+                with open(self.channel_conversations_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                self.logger.warning("Could not parse channel conversations file, starting a new one")
+        return {}
+    
+    def _save_channel_conversations(self):
+        """Save the channel -> conversation mapping to persistent storage"""
+        os.makedirs(os.path.dirname(self.channel_conversations_file), exist_ok=True)
+        with open(self.channel_conversations_file, 'w', encoding='utf-8') as f:
+            json.dump(self.channel_conversations, f, indent=2)
+    
+    def _get_channel_conversation(self, channel, user_id) -> str:
+        """Get (or create) the stored conversation for a channel, with user_id as a participant"""
+        conv_manager = self.chat_engine.conversation_manager
+        channel_id = str(channel.id)
+        
+        with self.channel_conversations_lock:
+            conversation_id = self.channel_conversations.get(channel_id)
             
-            return response
+            if conversation_id and conv_manager.get_conversation_info(conversation_id):
+                conv_manager.add_participant(conversation_id, user_id)
+                return conversation_id
             
-        except Exception as e:
-            self.logger.error(f"Error generating response: {str(e)}", exc_info=True)
-            return "I'm having trouble responding right now. Please try again later."
+            if isinstance(channel, discord.DMChannel):
+                title = f"Discord DM with {channel.recipient.name if channel.recipient else 'user'}"
+            else:
+                title = f"Discord #{channel.name} ({channel.guild.name})"
             
-        finally:
-            # Restore original user
-            self.chat_engine.user_data_manager.set_current_user(original_user)
+            conversation_id = conv_manager.create_conversation([user_id], title=title)
+            self.channel_conversations[channel_id] = conversation_id
+            self._save_channel_conversations()
+            return conversation_id
     
-    async def _generate_response_async(self, jupiter_user, message_text) -> str:
-        """Generate a response from Jupiter's chat engine asynchronously"""
-        loop = asyncio.get_event_loop()
-        
-        # Run the synchronous function in a thread pool
-        return await loop.run_in_executor(
-            None,  # Use default executor
-            self._generate_response,  # The function to run
-            jupiter_user, message_text  # Arguments to the function
-        )
+    def _save_exchange(self, channel, jupiter_user, message_text, response):
+        """Save a message and Jupiter's response to the channel's stored conversation"""
+        user_id = jupiter_user.get('user_id') if jupiter_user else None
+        if not user_id:
+            return
+        
+        try:
+            conversation_id = self._get_channel_conversation(channel, user_id)
+            conv_manager = self.chat_engine.conversation_manager
+            conv_manager.append_message(conversation_id, user_id, message_text, "user")
+            conv_manager.append_message(conversation_id, "jupiter", response, "assistant")
+        except Exception as e:
+            self.logger.error(f"Error saving Discord exchange: {str(e)}", exc_info=True)
 
     async def _send_response(self, channel, response):
         """Send response, handling multiple chunks if needed"""
@@ -532,6 +630,7 @@ class JupiterDiscordClient:
     def stop(self):
         """Stop the Discord client"""
         self.is_running = False
+        self.work_queue.shutdown()
         
         # Set status to invisible before closing
         if self.client.loop and self.client.is_ready():
@@ -736,7 +835,7 @@ class JupiterDiscordClient:
             # Format into readable context
             history = ""
             for msg in messages:
-                sender = "You" if msg['role'] == 'assistant' else preferred_name
+                sender = "You" if msg.get('type') == 'assistant' else preferred_name
                 content = msg['content']
                 # Truncate very long messages
                 if len(content) > 100:
@@ -0,0 +1,141 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from utils.tracing import percentile
+
+# Reply when a request is shed (config: discord.busy_message)
+BUSY_MESSAGE = "I'm juggling a lot of conversations right now. Please try again in a moment!"
+
+class QueueFullError(Exception):
+    """Raised when the work queue is at its limit and sheds a request"""
+
+class ChannelWorkQueue:
+    """Bounded worker pool that runs Discord work in per-channel FIFO order
+
+    Each channel has its own FIFO queue and at most one of its items runs at
+    a time, so replies in a channel stay in order; up to max_workers
+    channels are served at once. At most max_pending items may be queued or
+    running in total, and submit() refuses more, so a burst is shed instead
+    of piling up behind the LLM backend.
+    """
+
+    def __init__(self, max_workers=2, max_pending=20, wait_samples=500):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="DiscordWorker")
+        self.lock = threading.Lock()
+        self.closed = False
+
+        # Channel key -> items waiting behind the one running; present while the channel has work
+        self.channels = {}
+        self.pending = 0
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.shed = 0
+        self.peak_pending = 0
+        self.waits = deque(maxlen=wait_samples)  # Seconds from submit to start
+
+    def submit(self, channel_key, fn, *args):
+        """Queue fn(*args) behind the channel's earlier work
+
+        Returns:
+            Future: The call's result
+
+        Raises:
+            QueueFullError: If max_pending items are already queued or running
+        """
+        future = Future()
+        item = (fn, args, future, time.time())
+
+        with self.lock:
+            if self.closed:
+                raise QueueFullError("Shutting down")
+            if self.pending >= self.max_pending:
+                self.shed += 1
+                raise QueueFullError(f"{self.pending} requests already queued")
+
+            if channel_key in self.channels:
+                self.channels[channel_key].append(item)
+            else:
+                # Submitted under the lock, so shutdown() can't close the
+                # executor between the closed check and this call
+                try:
+                    self.executor.submit(self._run, channel_key, item)
+                except RuntimeError as e:
+                    raise QueueFullError(f"Executor unavailable: {e}")
+                self.channels[channel_key] = deque()
+
+            self.pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        return future
+
+    def _run(self, channel_key, item):
+        fn, args, future, queued_at = item
+
+        if self.closed:
+            future.cancel()
+        elif future.set_running_or_notify_cancel():
+            with self.lock:
+                self.waits.append(time.time() - queued_at)
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        # Hand the worker on to the channel's next item
+        with self.lock:
+            self.pending -= 1
+            self.completed += 1
+            waiting = self.channels.get(channel_key)
+            if waiting:
+                next_item = waiting.popleft()
+            else:
+                self.channels.pop(channel_key, None)
+                next_item = None
+
+        if next_item:
+            try:
+                self.executor.submit(self._run, channel_key, next_item)
+            except RuntimeError:
+                # Shut down meanwhile; drop the rest of the channel's queue
+                self._cancel_channel(channel_key, next_item)
+
+    def _cancel_channel(self, channel_key, first_item):
+        with self.lock:
+            items = [first_item] + list(self.channels.pop(channel_key, []))
+            self.pending -= len(items)
+        for _, _, future, _ in items:
+            future.cancel()
+
+    def metrics(self):
+        """Get queue depth and throughput counters, with queue wait p50/p95 in milliseconds"""
+        with self.lock:
+            waits = sorted(self.waits)
+            depths = {key: len(waiting) + 1 for key, waiting in self.channels.items()}
+            running = min(len(depths), self.max_workers)
+            return {
+                "pending": self.pending,
+                "running": running,
+                "queued": self.pending - running,
+                "busiest_channel_depth": max(depths.values(), default=0),
+                "peak_pending": self.peak_pending,
+                "max_pending": self.max_pending,
+                "workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "shed": self.shed,
+                "wait_p50": percentile(waits, 0.5) * 1000,
+                "wait_p95": percentile(waits, 0.95) * 1000
+            }
+
+    def shutdown(self, wait=False):
+        """Stop taking work; work not yet started is cancelled"""
+        with self.lock:
+            self.closed = True
+        self.executor.shutdown(wait=wait)
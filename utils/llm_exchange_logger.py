@@ -1,20 +1,42 @@
 import os
+import time
 import json
 import datetime
+import hashlib
 import shutil
 import threading
+from difflib import SequenceMatcher
+
+from utils.log_retention import open_log, unique_path
+
+def _block_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
 
 class LLMExchangeLogger:
     """
     Logs complete exchanges between users and LLM including full prompts and responses.
     Creates separate logs for each user that are deleted when the session ends.
+    
+    Prompts are stored deduplicated rather than verbatim. Fixed blocks at the
+    start of a prompt (system prompt, profile) are written once per session
+    as "block" records and referenced by hash; the rest of the prompt (the
+    history) is stored as a line delta against the previous exchange's.
+    read_session() reconstructs the full prompts.
+    
+    A session log that reaches max_bytes or max_age seconds is continued in
+    a new file (0 disables either limit); each file stands on its own.
     """
     
-    def __init__(self, logs_folder):
+    def __init__(self, logs_folder, max_bytes=0, max_age=0):
         """Initialize the LLM exchange logger"""
         self.logs_folder = logs_folder
         self.exchange_logs_dir = os.path.join(logs_folder, "llm_exchanges")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
         self.user_sessions = {}  # Maps user_id to log file path
+        self.session_parts = {}  # Maps user_id to every log file of its session, oldest first
+        self.session_info = {}   # Maps user_id to (username, time its current file was opened)
+        self.prompt_state = {}   # Maps user_id to the blocks written and last history lines of its session
         self.lock = threading.RLock()  # Thread-safe operations
         
         # Create exchange logs directory if it doesn't exist
@@ -26,57 +48,160 @@ class LLMExchangeLogger:
         Returns the path to the created log file
         """
         with self.lock:
-            # Create user directory if it doesn't exist
-            user_dir = os.path.join(self.exchange_logs_dir, user_id)
-            os.makedirs(user_dir, exist_ok=True)
-            
-            # Create timestamped log file
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_file = os.path.join(user_dir, f"session_{timestamp}.jsonl")
-            
-            # Initialize log file with session metadata
-            session_info = {
-                "type": "session_start",
-                "user_id": user_id,
-                "username": username,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "platform": "gui"  # Default, could be passed as parameter
-            }
-            
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write(json.dumps(session_info) + "\n")
-            
-            # Store session file path
-            self.user_sessions[user_id] = log_file
-            
-            return log_file
+            self.session_parts[user_id] = []
+            return self._open_session_file(user_id, username)
+    
+    def _open_session_file(self, user_id, username, continued_from=None):
+        """Create a session log file and make it the user's current one"""
+        # Create user directory if it doesn't exist
+        user_dir = os.path.join(self.exchange_logs_dir, user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        
+        # Create timestamped log file
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        log_file = unique_path(os.path.join(user_dir, f"session_{timestamp}"), ".jsonl")
+        
+        # Initialize log file with session metadata
+        session_info = {
+            "type": "session_start",
+            "user_id": user_id,
+            "username": username,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "platform": "gui"  # Default, could be passed as parameter
+        }
+        if continued_from:
+            session_info["continued_from"] = os.path.basename(continued_from)
+        
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(session_info) + "\n")
+        
+        # Store session file path
+        self.user_sessions[user_id] = log_file
+        self.session_parts.setdefault(user_id, []).append(log_file)
+        self.session_info[user_id] = (username, time.time())
+        self.prompt_state[user_id] = {"blocks": set(), "lines": []}
+        
+        return log_file
+    
+    def _rotation_due(self, user_id):
+        _, opened_at = self.session_info.get(user_id, (None, time.time()))
+        if self.max_age and time.time() - opened_at >= self.max_age:
+            return True
+        try:
+            return bool(self.max_bytes) and os.path.getsize(self.user_sessions[user_id]) >= self.max_bytes
+        except OSError:
+            return False
     
-    def log_exchange(self, user_id, full_prompt, user_message, llm_response):
+    def get_active_files(self):
+        """Get the log files sessions are currently writing to"""
+        with self.lock:
+            return list(self.user_sessions.values())
+    
+    def log_exchange(self, user_id, full_prompt, user_message, llm_response, prompt_blocks=None):
         """
         Log a complete exchange between user and LLM
+        
+        prompt_blocks are the texts the prompt starts with (system prompt,
+        profile block), in order; they are stored once and referenced by hash.
         Returns True if successful, False otherwise
         """
         with self.lock:
             if user_id not in self.user_sessions:
                 return False
             
+            # Continue in a new file past the size or age limit
+            if self._rotation_due(user_id):
+                username, _ = self.session_info.get(user_id, (None, None))
+                try:
+                    self._open_session_file(user_id, username, continued_from=self.user_sessions[user_id])
+                except OSError as e:
+                    print(f"Error rotating LLM exchange log: {e}")
+            
+            state = self.prompt_state.setdefault(user_id, {"blocks": set(), "lines": []})
+            records = []
+            
+            # Split off the leading blocks the prompt really starts with
+            hashes = []
+            position = 0
+            for block in prompt_blocks or []:
+                if not block or not full_prompt.startswith(block, position):
+                    break
+                block_hash = _block_hash(block)
+                if block_hash not in state["blocks"]:
+                    records.append({"type": "block", "hash": block_hash, "text": block})
+                hashes.append(block_hash)
+                position += len(block)
+            
+            lines = full_prompt[position:].splitlines(keepends=True)
+            
             # Create exchange entry
             exchange = {
                 "type": "exchange",
                 "timestamp": datetime.datetime.now().isoformat(),
                 "user_message": user_message,
-                "full_prompt_to_llm": full_prompt,
+                "prompt": {"blocks": hashes, "delta": self._line_delta(state["lines"], lines)},
                 "llm_response": llm_response
             }
+            records.append(exchange)
             
             # Append to log file
             try:
                 with open(self.user_sessions[user_id], 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(exchange) + "\n")
-                return True
+                    f.write("".join(json.dumps(record) + "\n" for record in records))
             except Exception as e:
                 print(f"Error logging LLM exchange: {e}")
+                # Nothing was written, so the next delta must not build on this one
                 return False
+            
+            state["blocks"].update(hashes)
+            state["lines"] = lines
+            return True
+    
+    @staticmethod
+    def _line_delta(previous, lines):
+        """Describe lines as runs copied from previous ([start, end]) and literal text"""
+        delta = []
+        matcher = SequenceMatcher(None, previous, lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                delta.append([i1, i2])
+            elif j2 > j1:
+                delta.append("".join(lines[j1:j2]))
+        return delta
+    
+    @staticmethod
+    def read_session(log_file):
+        """
+        Read a session log, yielding its records with full prompts reconstructed
+        
+        Exchange records get their "full_prompt_to_llm" back in place of the
+        stored "prompt"; block records are consumed. Logs written before
+        prompts were deduplicated are returned as they are.
+        """
+        blocks = {}
+        previous = []
+        with open_log(log_file) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                
+                if record.get("type") == "block":
+                    blocks[record["hash"]] = record["text"]
+                    continue
+                
+                if record.get("type") == "exchange" and "prompt" in record:
+                    prompt = record.pop("prompt")
+                    lines = []
+                    for part in prompt["delta"]:
+                        if isinstance(part, str):
+                            lines.extend(part.splitlines(keepends=True))
+                        else:
+                            lines.extend(previous[part[0]:part[1]])
+                    previous = lines
+                    record["full_prompt_to_llm"] = "".join(blocks[h] for h in prompt["blocks"]) + "".join(lines)
+                
+                yield record
     
     def end_session(self, user_id, delete_logs=True):
         """
@@ -99,16 +224,22 @@ class LLMExchangeLogger:
             except Exception as e:
                 print(f"Error finalizing session log: {e}")
             
-            # Get log file path before removing from dict
+            # Get log file paths before removing from dict
             log_file = self.user_sessions[user_id]
+            log_files = self.session_parts.pop(user_id, [log_file])
             
             # Remove from active sessions
             del self.user_sessions[user_id]
+            self.session_info.pop(user_id, None)
+            self.prompt_state.pop(user_id, None)
             
-            # Delete logs if requested
-            if delete_logs and os.path.exists(log_file):
+            # Delete logs if requested (earlier parts may have been compressed meanwhile)
+            if delete_logs:
                 try:
-                    os.remove(log_file)
+                    for path in log_files:
+                        for candidate in (path, path + ".gz"):
+                            if os.path.exists(candidate):
+                                os.remove(candidate)
                     # Remove user directory if empty
                     user_dir = os.path.dirname(log_file)
                     if os.path.exists(user_dir) and not os.listdir(user_dir):
@@ -0,0 +1,215 @@
+import os
+import glob
+import gzip
+import time
+import shutil
+import logging
+import datetime
+import threading
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger("jupiter.logs")
+
+# Log files retention manages, relative to the logs folder (rotated and compressed names included)
+LOG_PATTERNS = [
+    "jupiter_chat_*.log*",
+    os.path.join("llm_exchanges", "*", "session_*.jsonl*"),
+    os.path.join("traces", "trace_*.jsonl*"),
+    "discord.log*"
+]
+
+def open_log(path, mode='r'):
+    """Open a log file for reading, whether or not it has been compressed"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode) if 'b' in mode else gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode) if 'b' in mode else open(path, mode, encoding='utf-8')
+
+def unique_path(base, extension=""):
+    """Get base + extension, with a -N suffix if that log (or its compressed copy) already exists"""
+    path = base + extension
+    count = 1
+    while os.path.exists(path) or os.path.exists(path + ".gz"):
+        path = f"{base}-{count}{extension}"
+        count += 1
+    return path
+
+def compress_file(path):
+    """Gzip a finished log beside itself, keeping its mtime, and remove the original"""
+    compressed = path + ".gz"
+    temp_file = compressed + ".tmp"
+    stat = os.stat(path)
+    with open(path, 'rb') as source, gzip.open(temp_file, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    os.utime(temp_file, (stat.st_atime, stat.st_mtime))
+    os.replace(temp_file, compressed)
+    os.remove(path)
+    return compressed
+
+class RotatingLogHandler(RotatingFileHandler):
+    """File handler that rotates by size or age to timestamped names, for LogRetention to compress
+
+    Age is counted from when the handler opened the file.
+    """
+
+    def __init__(self, filename, max_bytes=0, max_age=0):
+        super().__init__(filename, maxBytes=max_bytes, encoding='utf-8')
+        self.max_age = max_age
+        self.opened_at = time.time()
+
+    def shouldRollover(self, record):
+        if self.max_age and time.time() - self.opened_at >= self.max_age:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename):
+            timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+            os.rename(self.baseFilename, unique_path(f"{self.baseFilename}.{timestamp}"))
+
+        self.opened_at = time.time()
+        if not self.delay:
+            self.stream = self._open()
+
+class LogRetention:
+    """Compresses finished logs and keeps the logs folder within a disk budget
+
+    Rotation happens where logs are written (Logger, LLMExchangeLogger and
+    RotatingLogHandler all start a new file past a size or age limit). Here,
+    a background thread gzips rotated and finished logs once they have been
+    idle for compress_after_minutes, deletes logs older than max_age_days (if
+    set), then deletes the oldest logs until all of them fit in max_total_mb.
+    Files reported by an active source are never compressed or deleted.
+    """
+
+    def __init__(self, logs_folder, max_total_mb=500, max_age_days=0, compress=True,
+                 compress_after_minutes=5, check_interval_minutes=10):
+        self.logs_folder = logs_folder
+        self.max_total_bytes = max_total_mb * 1024 * 1024
+        self.max_age = max_age_days * 86400
+        self.compress = compress
+        self.compress_after = compress_after_minutes * 60
+        self.interval = max(1, check_interval_minutes * 60)
+
+        self.active_sources = []  # Callables returning the path(s) being written now
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def add_active_source(self, source):
+        """Register a callable that returns the log path (or paths, or None) currently being written"""
+        self.active_sources.append(source)
+
+    def _active_files(self):
+        active = set()
+        for source in self.active_sources:
+            try:
+                paths = source()
+            except Exception as e:
+                logger.error(f"Error getting active log files: {e}")
+                continue
+            if isinstance(paths, str):
+                paths = [paths]
+            active.update(os.path.abspath(path) for path in paths or [] if path)
+        return active
+
+    def _log_files(self):
+        """Get (path, stat) for every managed log file"""
+        files = {}
+        for pattern in LOG_PATTERNS:
+            for path in glob.glob(os.path.join(self.logs_folder, pattern)):
+                if path.endswith(".tmp"):
+                    continue
+                try:
+                    files[os.path.abspath(path)] = os.stat(path)
+                except OSError:
+                    continue  # Removed or renamed meanwhile
+        return files
+
+    def run_once(self):
+        """Compress, expire and evict logs once
+
+        Returns:
+            dict: Counts of files compressed and deleted
+        """
+        with self.lock:
+            counts = {"compressed": 0, "deleted": 0}
+            now = time.time()
+            active = self._active_files()
+            files = self._log_files()
+
+            for path, stat in list(files.items()):
+                if path in active:
+                    continue
+
+                if self.max_age and now - stat.st_mtime >= self.max_age:
+                    if self._delete(path):
+                        del files[path]
+                        counts["deleted"] += 1
+                    continue
+
+                if self.compress and not path.endswith(".gz") and now - stat.st_mtime >= self.compress_after:
+                    try:
+                        compressed = compress_file(path)
+                        del files[path]
+                        files[compressed] = os.stat(compressed)
+                        counts["compressed"] += 1
+                    except OSError as e:
+                        logger.error(f"Error compressing log {path}: {e}")
+
+            # Oldest first until everything fits; active logs count but stay
+            total = sum(stat.st_size for stat in files.values())
+            for path, stat in sorted(files.items(), key=lambda item: item[1].st_mtime):
+                if total <= self.max_total_bytes:
+                    break
+                if path in active:
+                    continue
+                if self._delete(path):
+                    total -= stat.st_size
+                    counts["deleted"] += 1
+
+            return counts
+
+    def _delete(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Error deleting log {path}: {e}")
+            return False
+
+        # Drop a user's exchange log folder once it is empty
+        folder = os.path.dirname(path)
+        if os.path.dirname(folder) == os.path.abspath(os.path.join(self.logs_folder, "llm_exchanges")):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass  # Not empty
+        return True
+
+    def start(self):
+        """Start the background retention thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._retention_loop, daemon=True, name="LogRetentionThread")
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the retention thread, letting a pass in progress finish"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _retention_loop(self):
+        while True:
+            try:
+                counts = self.run_once()
+                if counts["compressed"] or counts["deleted"]:
+                    logger.info(f"Log retention: compressed {counts['compressed']}, deleted {counts['deleted']}")
+            except Exception as e:
+                logger.error(f"Error applying log retention: {e}")
+            if self.stop_event.wait(self.interval):
+                break
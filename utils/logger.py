@@ -1,20 +1,57 @@
 import os
+import time
+import atexit
 import datetime
 import glob
+import threading
+
+from utils.log_retention import unique_path
 
 class Logger:
-    """Handles logging of chat sessions and messages"""
+    """Handles logging of chat sessions and messages
+    
+    The session log is kept open and messages are buffered, then written
+    every flush_interval seconds, once buffer_size bytes are waiting, and
+    on close. In crash_safe mode every message is written through to the
+    OS straight away and the file is fsynced in batches, at most
+    fsync_interval seconds apart, rather than once per line.
+    
+    A session log that reaches max_bytes or max_age seconds is continued in
+    a new log file (0 disables either limit).
+    """
     
-    def __init__(self, logs_folder="logs"):
+    def __init__(self, logs_folder="logs", flush_interval=1.0, buffer_size=8192, crash_safe=False, fsync_interval=5.0,
+                 max_bytes=0, max_age=0):
         """Initialize logger with logs folder"""
         self.logs_folder = logs_folder
         self.current_log_file = None
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.crash_safe = crash_safe
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        
+        # The voice, Discord and terminal threads all log through one instance
+        self.lock = threading.RLock()
+        self._file = None
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._unsynced = False
+        self._last_fsync = time.time()
+        self._log_bytes = 0
+        self._opened_at = time.time()
         
         # Create logs folder if it doesn't exist
         os.makedirs(logs_folder, exist_ok=True)
         
         # Clean up any duplicate .txt logs
         self._clean_duplicate_logs()
+        
+        self._stop_event = threading.Event()
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True, name="ChatLogFlushThread")
+        self._flush_thread.start()
+        atexit.register(self.close)
     
     def _clean_duplicate_logs(self):
         """Remove any .txt log files that have matching .log files"""
@@ -37,20 +74,117 @@ class Logger:
     def start_new_log(self):
         """Create new log file for session"""
         timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-        self.current_log_file = os.path.join(self.logs_folder, f"jupiter_chat_{timestamp}.log")
         
-        with open(self.current_log_file, 'w', encoding='utf-8') as f:
-            f.write(f"=== Jupiter Chat Session: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n\n")
+        with self.lock:
+            # Finish the previous session's log before switching
+            self._close_file()
+            self.current_log_file = unique_path(os.path.join(self.logs_folder, f"jupiter_chat_{timestamp}"), ".log")
+            
+            header = f"=== Jupiter Chat Session: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n\n"
+            self._file = open(self.current_log_file, 'w', encoding='utf-8')
+            self._file.write(header)
+            self._file.flush()
+            self._log_bytes = len(header)
+            self._opened_at = time.time()
         
         return self.current_log_file
     
     def log_message(self, role, message):
         """Log message to current log file"""
-        if self.current_log_file:
-            with open(self.current_log_file, 'a', encoding='utf-8') as f:
-                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"[{timestamp}] {role} {message}\n\n")
+        if not self.current_log_file:
+            return
+        
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        entry = f"[{timestamp}] {role} {message}\n\n"
+        
+        with self.lock:
+            if self._rotation_due():
+                self.start_new_log()
+            self._log_bytes += len(entry)
+            
+            if self.crash_safe:
+                self._write(entry)
+                self._unsynced = True
+                return
+            
+            self._buffer.append(entry)
+            self._buffered_bytes += len(entry)
+            # Nothing flushes on a timer once closed, so write straight through
+            if self._buffered_bytes >= self.buffer_size or self._stop_event.is_set():
+                self._write_buffer()
     
     def get_current_log_file(self):
         """Get the current log file path"""
-        return self.current_log_file
\ No newline at end of file
+        return self.current_log_file
+    
+    def _rotation_due(self):
+        if self.max_bytes and self._log_bytes >= self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self._opened_at >= self.max_age
+    
+    def flush(self, sync=False):
+        """Write buffered messages to the log file now
+        
+        Args:
+            sync (bool): Also fsync the file, as crash_safe mode does in batches
+        """
+        with self.lock:
+            self._write_buffer()
+            if sync or self.crash_safe:
+                self._sync()
+    
+    def close(self):
+        """Stop the flush thread and write and close the log file"""
+        self._stop_event.set()
+        with self.lock:
+            self._close_file()
+    
+    def _open(self):
+        """Get the handle for the current log, reopening it for append if it was closed"""
+        if self._file is None or self._file.closed:
+            self._file = open(self.current_log_file, 'a', encoding='utf-8')
+        return self._file
+    
+    def _write(self, text):
+        try:
+            f = self._open()
+            f.write(text)
+            f.flush()
+        except OSError as e:
+            print(f"Error writing to log file {self.current_log_file}: {e}")
+    
+    def _write_buffer(self):
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._write(text)
+        self._unsynced = True
+    
+    def _sync(self):
+        if not self._unsynced or self._file is None or self._file.closed:
+            return
+        try:
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            print(f"Error syncing log file {self.current_log_file}: {e}")
+        self._unsynced = False
+        self._last_fsync = time.time()
+    
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._write_buffer()
+        if self.crash_safe:
+            self._sync()
+        self._file.close()
+        self._file = None
+    
+    def _flush_loop(self):
+        """Background loop that writes buffered messages and batches fsyncs"""
+        while not self._stop_event.wait(self.flush_interval):
+            with self.lock:
+                self._write_buffer()
+                if self.crash_safe and time.time() - self._last_fsync >= self.fsync_interval:
+                    self._sync()
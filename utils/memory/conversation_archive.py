@@ -0,0 +1,296 @@
+import os
+import json
+import zlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+class ConversationArchive:
+    """
+    Compressed storage for cold conversations.
+
+    Each archived conversation (header and messages) is written as one
+    zlib-compressed JSON record appended to a segment file. "index.json" maps
+    conversation IDs to (segment, offset, length) along with the header and
+    message count, so metadata queries never touch the segments. Removed
+    records leave dead bytes behind; a segment is compacted once at least
+    half of it is dead.
+    """
+
+    INDEX_FILE = "index.json"
+    CACHE_SIZE = 8
+    SCAN_CHUNK = 64 * 1024
+
+    def __init__(self, archive_path: str, segment_max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize the ConversationArchive.
+
+        Args:
+            archive_path: Directory for segment files and the index
+            segment_max_bytes: Size at which a new segment is started
+        """
+        self.archive_path = archive_path
+        self.segment_max_bytes = segment_max_bytes
+        self.lock = threading.RLock()
+        os.makedirs(archive_path, exist_ok=True)
+
+        self.index_file = os.path.join(archive_path, self.INDEX_FILE)
+        self.index = self._load_index()
+
+        # Recently decompressed conversations
+        self.cache = OrderedDict()
+
+    # ===== Index =====
+
+    def _load_index(self) -> Dict[str, Any]:
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading archive index: {e}")
+        return {"segments": {}, "conversations": {}}
+
+    def _save_index(self) -> None:
+        """Write the index atomically."""
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_file, self.index_file)
+
+    def contains(self, conversation_id: str) -> bool:
+        return conversation_id in self.index["conversations"]
+
+    def conversation_ids(self) -> List[str]:
+        return list(self.index["conversations"].keys())
+
+    def get_header(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return an archived conversation's header without decompressing it."""
+        entry = self.index["conversations"].get(conversation_id)
+        return entry["header"] if entry else None
+
+    def count(self, conversation_id: str) -> int:
+        entry = self.index["conversations"].get(conversation_id)
+        return entry["message_count"] if entry else 0
+
+    # ===== Records =====
+
+    def _current_segment(self) -> str:
+        """Name of the segment new records are appended to."""
+        segments = self.index["segments"]
+        if segments:
+            last = max(segments)
+            if segments[last]["size"] < self.segment_max_bytes:
+                return last
+        return self._new_segment()
+
+    def _new_segment(self) -> str:
+        """Register a new, empty segment and return its name."""
+        segments = self.index["segments"]
+        number = int(max(segments)[len("segment_"):-len(".seg")]) + 1 if segments else 1
+        name = f"segment_{number:05d}.seg"
+        segments[name] = {"size": 0, "dead": 0}
+        return name
+
+    def add(self, conversation: Dict[str, Any], last_activity: float) -> None:
+        """
+        Archive a full conversation (header plus messages).
+
+        Args:
+            conversation: Conversation dict including its "messages"
+            last_activity: Timestamp of the conversation's last change
+        """
+        with self.lock:
+            conversation_id = conversation["conversation_id"]
+            if self.contains(conversation_id):
+                self._mark_dead(conversation_id)
+
+            record = zlib.compress(json.dumps(conversation, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            segment = self._current_segment()
+
+            with open(os.path.join(self.archive_path, segment), 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.index["segments"][segment]["size"] = offset + len(record)
+            self.index["conversations"][conversation_id] = {
+                "segment": segment,
+                "offset": offset,
+                "length": len(record),
+                "header": {key: value for key, value in conversation.items() if key != "messages"},
+                "message_count": len(conversation.get("messages", [])),
+                "last_activity": last_activity
+            }
+            self._save_index()
+            self.cache.pop(conversation_id, None)
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Decompress and return a full archived conversation."""
+        with self.lock:
+            if conversation_id in self.cache:
+                self.cache.move_to_end(conversation_id)
+                return self.cache[conversation_id]
+
+            entry = self.index["conversations"].get(conversation_id)
+            if not entry:
+                return None
+
+            try:
+                with open(os.path.join(self.archive_path, entry["segment"]), 'rb') as f:
+                    f.seek(entry["offset"])
+                    record = f.read(entry["length"])
+                conversation = json.loads(zlib.decompress(record))
+            except (OSError, zlib.error, json.JSONDecodeError) as e:
+                print(f"Error loading archived conversation {conversation_id}: {e}")
+                return None
+
+            self.cache[conversation_id] = conversation
+            if len(self.cache) > self.CACHE_SIZE:
+                self.cache.popitem(last=False)
+            return conversation
+
+    def remove(self, conversation_id: str) -> None:
+        """Drop a conversation from the archive (e.g. after it was restored)."""
+        with self.lock:
+            if not self.contains(conversation_id):
+                return
+            segment = self._mark_dead(conversation_id)
+            self.cache.pop(conversation_id, None)
+
+            stats = self.index["segments"][segment]
+            if stats["dead"] * 2 >= stats["size"]:
+                self._compact(segment)
+            else:
+                self._save_index()
+
+    def _mark_dead(self, conversation_id: str) -> str:
+        entry = self.index["conversations"].pop(conversation_id)
+        self.index["segments"][entry["segment"]]["dead"] += entry["length"]
+        return entry["segment"]
+
+    def _compact(self, segment: str) -> None:
+        """
+        Copy a segment's live records into a new segment and drop the old one.
+
+        The index is switched over before the old file is deleted, so an
+        interruption at any point leaves a readable archive.
+        """
+        live = sorted(
+            [(conv_id, entry) for conv_id, entry in self.index["conversations"].items()
+             if entry["segment"] == segment],
+            key=lambda item: item[1]["offset"]
+        )
+
+        if live:
+            target_segment = self._new_segment()
+            position = 0
+            new_offsets = []
+            with open(os.path.join(self.archive_path, segment), 'rb') as source, \
+                    open(os.path.join(self.archive_path, target_segment), 'wb') as target:
+                for conv_id, entry in live:
+                    source.seek(entry["offset"])
+                    target.write(source.read(entry["length"]))
+                    new_offsets.append((entry, position))
+                    position += entry["length"]
+                target.flush()
+                os.fsync(target.fileno())
+
+            for entry, offset in new_offsets:
+                entry["segment"] = target_segment
+                entry["offset"] = offset
+            self.index["segments"][target_segment]["size"] = position
+
+        del self.index["segments"][segment]
+        self._save_index()
+
+        path = os.path.join(self.archive_path, segment)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _scan_record(self, view: memoryview, position: int):
+        """
+        Decompress the record starting at position without knowing its length.
+
+        Input is fed in SCAN_CHUNK slices, so finding each record's end
+        copies at most one chunk of the data after it.
+
+        Returns:
+            Tuple of the decoded conversation and the record's compressed length
+        """
+        decompressor = zlib.decompressobj()
+        chunks = []
+        end = position
+        while not decompressor.eof:
+            if end >= len(view):
+                raise ValueError("truncated record")
+            chunk = view[end:end + self.SCAN_CHUNK]
+            end += len(chunk)
+            chunks.append(decompressor.decompress(chunk))
+
+        length = end - position - len(decompressor.unused_data)
+        return json.loads(b"".join(chunks)), length
+
+    def rebuild_index(self, exclude_ids=None) -> int:
+        """
+        Recover the index by scanning every segment file.
+
+        Records are read back to back; when a conversation appears more than
+        once the last record wins, and earlier copies are counted as dead.
+
+        Args:
+            exclude_ids: Conversation IDs to leave out (e.g. ones now in the hot store)
+
+        Returns:
+            Number of conversations indexed
+        """
+        exclude_ids = set(exclude_ids or ())
+
+        with self.lock:
+            index = {"segments": {}, "conversations": {}}
+            segment_names = sorted(name for name in os.listdir(self.archive_path)
+                                   if name.startswith("segment_") and name.endswith(".seg"))
+
+            for segment in segment_names:
+                with open(os.path.join(self.archive_path, segment), 'rb') as f:
+                    data = f.read()
+
+                stats = {"size": len(data), "dead": 0}
+                index["segments"][segment] = stats
+                view = memoryview(data)
+                position = 0
+
+                while position < len(data):
+                    try:
+                        conversation, length = self._scan_record(view, position)
+                    except (zlib.error, ValueError) as e:
+                        print(f"Stopping scan of {segment} at offset {position}: {e}")
+                        stats["dead"] += len(data) - position
+                        break
+
+                    conversation_id = conversation.get("conversation_id")
+
+                    previous = index["conversations"].get(conversation_id)
+                    if previous:
+                        index["segments"][previous["segment"]]["dead"] += previous["length"]
+
+                    if conversation_id and conversation_id not in exclude_ids:
+                        messages = conversation.get("messages", [])
+                        index["conversations"][conversation_id] = {
+                            "segment": segment,
+                            "offset": position,
+                            "length": length,
+                            "header": {key: value for key, value in conversation.items() if key != "messages"},
+                            "message_count": len(messages),
+                            "last_activity": messages[-1].get("timestamp", 0) if messages else conversation.get("created_at", 0)
+                        }
+                    else:
+                        stats["dead"] += length
+
+                    position += length
+
+            self.index = index
+            self.cache.clear()
+            self._save_index()
+            return len(index["conversations"])
@@ -2,10 +2,15 @@ import os
 import json
 import uuid
 import time
+import threading
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Union
 import tiktoken  # For token counting
 from models.user_data_manager import UserDataManager
+from utils.memory.message_store import MessageStore, page_bounds
+from utils.memory.conversation_archive import ConversationArchive
+from utils.memory.participant_index import ParticipantIndex
+from utils.memory.semantic_memory import SemanticMemory
 
 class ConversationManager:
     """
@@ -13,13 +18,14 @@ class ConversationManager:
     and long-term persistent storage of conversations with user tracking.
     """
     
-    def __init__(self, config, user_data_manager):
+    def __init__(self, config, user_data_manager, llm_client=None):
         """
         Initialize the ConversationManager.
         
         Args:
             config: Application configuration
             user_data_manager: Reference to the user data manager
+            llm_client: Optional LLM client, used for embedding-based memory
         """
         self.config = config
         self.user_data_manager = user_data_manager
@@ -28,6 +34,22 @@ class ConversationManager:
         self.storage_path = os.path.join(config['paths']['data_folder'], 'conversations')
         os.makedirs(self.storage_path, exist_ok=True)
         
+        # Message bodies live in an append-only store next to each conversation header
+        self.message_store = MessageStore(self.storage_path)
+        
+        # Cold conversations are moved into compressed archive segments
+        self.archive_config = config.get('archive', {})
+        self.archive = ConversationArchive(
+            os.path.join(self.storage_path, 'archive'),
+            segment_max_bytes=int(self.archive_config.get('segment_max_mb', 16) * 1024 * 1024)
+        )
+        
+        # Guards moves between the hot store and the archive
+        self.lock = threading.RLock()
+        
+        # Participant -> conversation bitmaps for membership queries
+        self.participant_index = ParticipantIndex(os.path.join(self.storage_path, 'participants.index'))
+        
         # Initialize current context
         self.context = []
         self.current_conversation_id = None
@@ -36,8 +58,33 @@ class ConversationManager:
         # Load tokenizer for counting context length
         self.tokenizer = tiktoken.get_encoding("cl100k_base")  # Used by modern models
         
-        # Cache for active conversations
+        # Cache for conversation headers (metadata without messages)
         self.conversation_cache = {}
+        
+        if not self.participant_index.loaded:
+            self.rebuild_participant_index()
+        
+        # A linked user's conversations belong to the user they were merged into
+        self.user_data_manager.add_link_listener(self.participant_index.merge)
+        
+        # Semantic memory over past messages (recalls what truncation drops)
+        self.memory_config = config.get('memory', {})
+        self.semantic_memory = None
+        if self.memory_config.get('enabled', True):
+            self.semantic_memory = SemanticMemory(
+                os.path.join(config['paths']['data_folder'], 'memory'),
+                self.memory_config,
+                llm_client
+            )
+            # Conversations stored before the index existed (or was reset) are indexed once
+            if not self.semantic_memory.backfilled and self.memory_config.get('backfill', True):
+                self.start_memory_backfill()
+        
+        # Background archiver for idle conversations
+        self._archiver_stop = threading.Event()
+        self._archiver_thread = None
+        if self.archive_config.get('enabled', True):
+            self.start_archiver()
     
     # ===== Context Management =====
     
@@ -56,25 +103,41 @@ class ConversationManager:
             current_user_id = self.user_data_manager.current_user.get('user_id')
             participants = [current_user_id] if current_user_id else []
         
+        conversation_id = self.create_conversation(participants)
+        
+        # Set as current conversation
+        self.current_conversation_id = conversation_id
+        self.context = []
+        
+        return conversation_id
+    
+    def create_conversation(self, participants: List[str], title: Optional[str] = None) -> str:
+        """
+        Create and store a new conversation without making it the current one.
+        
+        Args:
+            participants: List of user_ids participating in the conversation
+            title: Optional title (defaults to one based on the creation time)
+            
+        Returns:
+            conversation_id: The UUID of the new conversation
+        """
         conversation_id = str(uuid.uuid4())
         timestamp = int(time.time())
         
         conversation = {
             "conversation_id": conversation_id,
             "created_at": timestamp,
-            "title": f"Conversation on {datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')}",
-            "participants": participants,
+            "title": title or f"Conversation on {datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')}",
+            "participants": list(participants),
             "messages": []
         }
         
         # Save the new conversation
         self._save_conversation(conversation)
         
-        # Set as current conversation
-        self.current_conversation_id = conversation_id
-        self.context = []
-        
         # Add this conversation to each participant's history
+        self.participant_index.add(conversation_id, participants)
         for user_id in participants:
             self._add_conversation_to_user(user_id, conversation_id)
         
@@ -92,6 +155,30 @@ class ConversationManager:
         if not self.current_conversation_id:
             self.start_conversation()
         
+        # Save to permanent storage
+        message = self.append_message(self.current_conversation_id, sender_id, content, message_type)
+        
+        # Add to context
+        self.context.append(message)
+        
+        # Trim context if needed
+        if len(self.context) > self.max_context_messages:
+            self.context = self.context[-self.max_context_messages:]
+    
+    def append_message(self, conversation_id: str, sender_id: str, content: str,
+                       message_type: str) -> Dict[str, Any]:
+        """
+        Save a message to any stored conversation, leaving the current context alone.
+        
+        Args:
+            conversation_id: UUID of the conversation
+            sender_id: ID of the message sender (user_id or "jupiter")
+            content: The message content
+            message_type: "user" or "assistant"
+            
+        Returns:
+            The stored message
+        """
         message = {
             "message_id": str(uuid.uuid4()),
             "timestamp": int(time.time()),
@@ -100,15 +187,13 @@ class ConversationManager:
             "type": message_type
         }
         
-        # Add to context
-        self.context.append(message)
+        self._add_message_to_conversation(conversation_id, message)
         
-        # Trim context if needed
-        if len(self.context) > self.max_context_messages:
-            self.context = self.context[-self.max_context_messages:]
+        # Index for later semantic recall
+        if self.semantic_memory:
+            self.semantic_memory.add_message(conversation_id, message)
         
-        # Save to permanent storage
-        self._add_message_to_conversation(self.current_conversation_id, message)
+        return message
     
     def truncate_context(self, token_limit: int, system_prompt_size: int) -> List[Dict[str, Any]]:
         """
@@ -142,7 +227,8 @@ class ConversationManager:
         
         return included_messages
     
-    def prepare_for_llm(self, user_input: str, system_prompt: str, token_limit: int) -> str:
+    def prepare_for_llm(self, user_input: str, system_prompt: str, token_limit: int,
+                        user: Optional[Dict[str, Any]] = None) -> str:
         """
         Prepare the full message for the LLM including context.
         
@@ -150,52 +236,130 @@ class ConversationManager:
             user_input: Current user input
             system_prompt: System prompt text
             token_limit: Maximum tokens allowed for the model
+            user: User the input is from (default: the current user)
             
         Returns:
             Formatted message for LLM with history and user input
         """
+        user = user or self.user_data_manager.current_user
+        
         # Calculate system prompt size
         system_prompt_size = len(self.tokenizer.encode(system_prompt))
         
+        # Reserve a fixed budget for recalled memories so recall never grows the prompt
+        memory_budget = self.memory_config.get('token_budget', 256) if self.semantic_memory else 0
+        
         # Get truncated context
-        preserved_context = self.truncate_context(token_limit, system_prompt_size)
+        preserved_context = self.truncate_context(token_limit - memory_budget, system_prompt_size)
         
         # Build the full message
         full_message = system_prompt + "\n\n"
         
+        # Add memories of older messages that didn't survive truncation
+        full_message += self.recall_memories(user_input, preserved_context, memory_budget, user)
+        
+        # Resolve every sender name in one batch
+        current_user_id = user.get('user_id', 'User')
+        names = self._get_user_names([msg["sender_id"] for msg in preserved_context if msg["type"] == "user"]
+                                     + [current_user_id])
+        
         # Add preserved context
         for msg in preserved_context:
             if msg["type"] == "user":
-                sender = self._get_user_name(msg["sender_id"])
-                full_message += f"{sender}: {msg['content']}\n"
+                full_message += f"{names[msg['sender_id']]}: {msg['content']}\n"
             else:
                 full_message += f"Jupiter: {msg['content']}\n"
         
         # Add current input
-        user_name = self._get_user_name(self.user_data_manager.current_user.get('user_id', 'User'))
-        full_message += f"{user_name}: {user_input}\nJupiter (respond as Jupiter ONLY):"
+        full_message += f"{names[current_user_id]}: {user_input}\nJupiter (respond as Jupiter ONLY):"
         
         return full_message
     
+    def recall_memories(self, query: str, preserved_context: List[Dict[str, Any]], token_budget: int,
+                        user: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Find past messages relevant to the query and format them for the prompt.
+        
+        Only conversations the user took part in are searched, and
+        messages already in the preserved context are skipped.
+        
+        Args:
+            query: Text to match against (usually the current user input)
+            preserved_context: Messages already included in the prompt
+            token_budget: Maximum tokens the memory section may use
+            user: User whose conversations are searched (default: the current user)
+            
+        Returns:
+            A formatted memory section, or "" if nothing relevant was found
+        """
+        if not self.semantic_memory or token_budget <= 0:
+            return ""
+        
+        user_id = (user or self.user_data_manager.current_user).get('user_id')
+        if not user_id:
+            return ""
+        
+        # Conversations are only searched for their own participants
+        conversation_ids = set(self.participant_index.conversations_for(user_id))
+        
+        try:
+            results = self.semantic_memory.search(
+                query,
+                conversation_ids=conversation_ids,
+                exclude_message_ids=[msg["message_id"] for msg in preserved_context if "message_id" in msg],
+                top_k=self.memory_config.get('max_snippets', 3),
+                min_score=self.memory_config.get('min_score', 0.2)
+            )
+        except Exception as e:
+            print(f"Error searching memory: {e}")
+            return ""
+        
+        header = "## Relevant Memories From Past Conversations\n"
+        used_tokens = len(self.tokenizer.encode(header))
+        snippets = []
+        
+        names = self._get_user_names([entry["sender_id"] for entry in results if entry.get("type") == "user"])
+        
+        for entry in results:
+            sender = names[entry["sender_id"]] if entry.get("type") == "user" else "Jupiter"
+            snippet = SemanticMemory.format_snippet(entry, sender)
+            snippet_tokens = len(self.tokenizer.encode(snippet))
+            
+            if used_tokens + snippet_tokens > token_budget:
+                break
+            snippets.append(snippet)
+            used_tokens += snippet_tokens
+        
+        if not snippets:
+            return ""
+        
+        return header + "\n".join(snippets) + "\n\n"
+    
     # ===== Persistence Functions =====
     
+    def _header_path(self, conversation_id: str) -> str:
+        """Path of the JSON header file for a conversation."""
+        return os.path.join(self.storage_path, f"{conversation_id}.json")
+    
     def _save_conversation(self, conversation: Dict[str, Any]) -> None:
-        """Save a conversation to disk."""
-        file_path = os.path.join(self.storage_path, f"{conversation['conversation_id']}.json")
+        """Save a conversation header to disk, creating its message files if needed."""
+        conversation_id = conversation['conversation_id']
+        header = {key: value for key, value in conversation.items() if key != "messages"}
+        
+        with open(self._header_path(conversation_id), 'w', encoding='utf-8') as f:
+            json.dump(header, f, ensure_ascii=False, indent=2)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(conversation, f, ensure_ascii=False, indent=2)
+        if not self.message_store.exists(conversation_id):
+            self.message_store.create(conversation_id, conversation.get("messages", []))
         
         # Update cache
-        self.conversation_cache[conversation['conversation_id']] = conversation
+        self.conversation_cache[conversation_id] = header
     
     def _add_message_to_conversation(self, conversation_id: str, message: Dict[str, Any]) -> None:
-        """Add a message to a conversation and save."""
-        conversation = self.get_conversation(conversation_id)
-        
-        if conversation:
-            conversation["messages"].append(message)
-            self._save_conversation(conversation)
+        """Append a message to a conversation's message store."""
+        with self.lock:
+            if self._ensure_hot(conversation_id):
+                self.message_store.append(conversation_id, message)
     
     def _add_conversation_to_user(self, user_id: str, conversation_id: str) -> None:
         """Link a conversation to a user's history."""
@@ -211,9 +375,45 @@ class ConversationManager:
                 user["conversations"].append(conversation_id)
                 self.user_data_manager.update_user(user_id, user)
     
+    def _load_header(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a conversation header (metadata without messages).
+        
+        Conversations saved in the older single-file format, with messages
+        embedded in the JSON, are migrated to the message store on first load.
+        """
+        # Check cache first
+        if conversation_id in self.conversation_cache:
+            return self.conversation_cache[conversation_id]
+        
+        file_path = self._header_path(conversation_id)
+        if not os.path.exists(file_path):
+            # Fall back to the archive index (no decompression needed)
+            return self.archive.get_header(conversation_id)
+        
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading conversation {conversation_id}: {e}")
+            return None
+        
+        if "messages" in header:
+            # Legacy format - move the messages into the message store
+            self.message_store.create(conversation_id, header["messages"])
+            self._save_conversation(header)
+            return self.conversation_cache[conversation_id]
+        
+        # Update cache
+        self.conversation_cache[conversation_id] = header
+        return header
+    
     def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         """
-        Retrieve a conversation by ID.
+        Retrieve a conversation by ID, including all of its messages.
+        
+        Prefer get_conversation_messages() when only part of a large
+        conversation is needed.
         
         Args:
             conversation_id: UUID of the conversation
@@ -221,24 +421,225 @@ class ConversationManager:
         Returns:
             Conversation object or None if not found
         """
-        # Check cache first
-        if conversation_id in self.conversation_cache:
+        header = self._load_header(conversation_id)
+        if not header:
+            return None
+        
+        conversation = dict(header)
+        conversation["messages"] = self._read_messages(conversation_id)
+        return conversation
+    
+    def get_conversation_info(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a conversation's metadata without loading its messages.
+        
+        Args:
+            conversation_id: UUID of the conversation
+            
+        Returns:
+            Conversation metadata with a message_count, or None if not found
+        """
+        header = self._load_header(conversation_id)
+        if not header:
+            return None
+        
+        info = dict(header)
+        info["message_count"] = self._count_messages(conversation_id)
+        return info
+    
+    def get_message_count(self, conversation_id: str) -> int:
+        """
+        Get the number of messages in a conversation without reading them.
+        
+        Args:
+            conversation_id: UUID of the conversation
+            
+        Returns:
+            Number of stored messages (0 if the conversation doesn't exist)
+        """
+        if not self._load_header(conversation_id):
+            return 0
+        return self._count_messages(conversation_id)
+    
+    def get_conversation_messages(self, conversation_id: str, limit: Optional[int] = None,
+                                  offset: int = 0, from_end: bool = True) -> List[Dict[str, Any]]:
+        """
+        Read a page of messages from a conversation.
+        
+        By default pages are counted back from the newest message, so
+        limit=N returns the last N messages. Only the requested messages are
+        read from disk, regardless of the conversation's length.
+        
+        Args:
+            conversation_id: UUID of the conversation
+            limit: Maximum number of messages to return (None for all)
+            offset: Number of messages to skip (from the newest message when
+                    from_end is True, otherwise from the oldest)
+            from_end: Page backwards from the end of the conversation
+            
+        Returns:
+            List of messages in chronological order
+        """
+        if not self._load_header(conversation_id):
+            return []
+        
+        return self._read_messages(conversation_id, offset=offset, limit=limit, from_end=from_end)
+    
+    # ===== Archive Tier =====
+    
+    def _is_hot(self, conversation_id: str) -> bool:
+        """Check whether a conversation's messages are in the uncompressed store."""
+        return self.message_store.exists(conversation_id)
+    
+    def _read_messages(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None,
+                       from_end: bool = False) -> List[Dict[str, Any]]:
+        """Read a page of messages from whichever tier holds the conversation."""
+        if self._is_hot(conversation_id):
+            return self.message_store.read(conversation_id, offset=offset, limit=limit, from_end=from_end)
+        
+        conversation = self.archive.load(conversation_id)
+        if not conversation:
+            return []
+        
+        messages = conversation.get("messages", [])
+        start, end = page_bounds(len(messages), offset, limit, from_end)
+        return messages[start:end]
+    
+    def _count_messages(self, conversation_id: str) -> int:
+        """Count messages in whichever tier holds the conversation."""
+        if self._is_hot(conversation_id):
+            return self.message_store.count(conversation_id)
+        return self.archive.count(conversation_id)
+    
+    def _iter_messages(self, conversation_id: str):
+        """Stream messages from whichever tier holds the conversation."""
+        if self._is_hot(conversation_id):
+            return self.message_store.iter_messages(conversation_id)
+        return iter(self._read_messages(conversation_id))
+    
+    def _ensure_hot(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Make sure a conversation is in the hot store before modifying it,
+        restoring it from the archive if needed.
+        
+        Returns:
+            The conversation header, or None if the conversation doesn't exist
+        """
+        with self.lock:
+            header = self._load_header(conversation_id)
+            if not header or self._is_hot(conversation_id):
+                return header
+            
+            conversation = self.archive.load(conversation_id)
+            if not conversation:
+                return None
+            
+            # Write the hot copy before dropping the archived one
+            self.message_store.create(conversation_id, conversation.get("messages", []))
+            self._save_conversation(conversation)
+            self.archive.remove(conversation_id)
             return self.conversation_cache[conversation_id]
+    
+    def _last_activity(self, conversation_id: str) -> float:
+        """Most recent modification time of a hot conversation's files."""
+        try:
+            header_mtime = os.path.getmtime(self._header_path(conversation_id))
+        except OSError:
+            header_mtime = 0.0
+        return max(header_mtime, self.message_store.last_modified(conversation_id))
+    
+    def archive_conversation(self, conversation_id: str) -> bool:
+        """
+        Move a conversation from the hot store into the compressed archive.
+        
+        Args:
+            conversation_id: UUID of the conversation
+            
+        Returns:
+            True if the conversation was archived
+        """
+        with self.lock:
+            if conversation_id == self.current_conversation_id:
+                return False
+            
+            last_activity = self._last_activity(conversation_id)
+            conversation = self.get_conversation(conversation_id)
+            if not conversation or not self._is_hot(conversation_id):
+                return False
+            
+            self.archive.add(conversation, last_activity)
+            
+            # Remove the hot copy only once the archive record is durable
+            self.message_store.delete(conversation_id)
+            os.remove(self._header_path(conversation_id))
+            self.conversation_cache.pop(conversation_id, None)
+            return True
+    
+    def archive_idle_conversations(self, idle_days: Optional[float] = None) -> int:
+        """
+        Archive every hot conversation idle for longer than idle_days.
+        
+        Args:
+            idle_days: Idle period (defaults to the archive.idle_days setting)
+            
+        Returns:
+            Number of conversations archived
+        """
+        if idle_days is None:
+            idle_days = self.archive_config.get('idle_days', 30)
+        cutoff = time.time() - idle_days * 24 * 60 * 60
         
-        # Load from disk
-        file_path = os.path.join(self.storage_path, f"{conversation_id}.json")
-        if os.path.exists(file_path):
+        archived = 0
+        for conversation_id in list(self._iter_hot_conversation_ids()):
+            if self._last_activity(conversation_id) >= cutoff:
+                continue
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    conversation = json.load(f)
-                    
-                # Update cache
-                self.conversation_cache[conversation_id] = conversation
-                return conversation
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"Error loading conversation {conversation_id}: {e}")
+                if self.archive_conversation(conversation_id):
+                    archived += 1
+            except Exception as e:
+                print(f"Error archiving conversation {conversation_id}: {e}")
         
-        return None
+        return archived
+    
+    def start_archiver(self) -> None:
+        """Start the background thread that periodically archives idle conversations."""
+        if self._archiver_thread and self._archiver_thread.is_alive():
+            return
+        
+        def archiver_loop():
+            interval = self.archive_config.get('check_interval_minutes', 60) * 60
+            while not self._archiver_stop.is_set():
+                try:
+                    archived = self.archive_idle_conversations()
+                    if archived:
+                        print(f"Archived {archived} idle conversations")
+                except Exception as e:
+                    print(f"Error in conversation archiver: {e}")
+                self._archiver_stop.wait(interval)
+        
+        self._archiver_stop.clear()
+        self._archiver_thread = threading.Thread(target=archiver_loop, daemon=True, name="ConversationArchiverThread")
+        self._archiver_thread.start()
+    
+    def start_memory_backfill(self) -> None:
+        """Index every stored conversation for memory recall on a background thread."""
+        def backfill():
+            indexed = 0
+            try:
+                # Already indexed messages are skipped, so an interrupted backfill resumes cheaply
+                for conversation_id in list(self.iter_conversation_ids()):
+                    indexed += self.semantic_memory.add_messages(conversation_id, self._iter_messages(conversation_id))
+                self.semantic_memory.mark_backfilled()
+                if indexed:
+                    print(f"Indexed {indexed} past messages for memory recall")
+            except Exception as e:
+                print(f"Error indexing past conversations: {e}")
+        
+        threading.Thread(target=backfill, daemon=True, name="MemoryBackfillThread").start()
+    
+    def stop_archiver(self) -> None:
+        """Stop the background archiver thread."""
+        self._archiver_stop.set()
     
     def get_user_conversations(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -260,16 +661,17 @@ class ConversationManager:
         
         # Get most recent conversations first
         for conv_id in user["conversations"][-limit:]:
-            conv = self.get_conversation(conv_id)
+            conv = self._load_header(conv_id)
             if conv:
-                # Create a summary version with limited messages
+                # Create a summary from the header and the first message only
+                first_message = self._read_messages(conv_id, limit=1)
                 summary = {
                     "conversation_id": conv["conversation_id"],
                     "title": conv["title"],
                     "created_at": conv["created_at"],
                     "participants": conv["participants"],
-                    "preview": conv["messages"][0]["content"] if conv["messages"] else "",
-                    "message_count": len(conv["messages"])
+                    "preview": first_message[0]["content"] if first_message else "",
+                    "message_count": self._count_messages(conv_id)
                 }
                 conversations.append(summary)
         
@@ -295,15 +697,15 @@ class ConversationManager:
         query = query.lower()
         
         for conv_id in user["conversations"]:
-            conv = self.get_conversation(conv_id)
+            conv = self._load_header(conv_id)
             
             if not conv:
                 continue
                 
             matches = []
             
-            # Search through messages
-            for message in conv["messages"]:
+            # Stream through messages rather than loading the whole conversation
+            for message in self._iter_messages(conv_id):
                 if query in message["content"].lower():
                     matches.append(message)
             
@@ -320,15 +722,115 @@ class ConversationManager:
         
         return sorted(results, key=lambda x: x["match_count"], reverse=True)
     
+    # ===== Indexes =====
+    
+    def _iter_hot_conversation_ids(self):
+        """Yield the ID of every conversation in the hot store (one header file each)."""
+        with os.scandir(self.storage_path) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    yield entry.name[:-len(".json")]
+    
+    def iter_conversation_ids(self):
+        """Yield the ID of every stored conversation, hot or archived."""
+        seen = set()
+        for conversation_id in self._iter_hot_conversation_ids():
+            seen.add(conversation_id)
+            yield conversation_id
+        
+        for conversation_id in self.archive.conversation_ids():
+            if conversation_id not in seen:
+                yield conversation_id
+    
+    def rebuild_participant_index(self) -> int:
+        """
+        Rebuild the participant index from conversation headers.
+        
+        Returns:
+            Number of conversations indexed
+        """
+        def memberships():
+            for conversation_id in self.iter_conversation_ids():
+                header = self._load_header(conversation_id)
+                if header:
+                    yield conversation_id, header.get("participants", [])
+        
+        return self.participant_index.rebuild(memberships())
+    
+    def rebuild_search_index(self, conversations=None, progress=None) -> int:
+        """
+        Rebuild the semantic memory index from stored messages.
+        
+        Args:
+            conversations: Iterable of full conversations (defaults to all stored ones)
+            progress: Optional callback, called once per conversation
+            
+        Returns:
+            Number of messages indexed
+        """
+        if not self.semantic_memory:
+            return 0
+        
+        self.semantic_memory.clear()
+        indexed = 0
+        for conversation in conversations if conversations is not None else self.iter_conversations():
+            indexed += self.semantic_memory.add_messages(conversation["conversation_id"], conversation.get("messages", []))
+            if progress:
+                progress()
+        self.semantic_memory.mark_backfilled()
+        return indexed
+    
+    def rebuild_archive_index(self) -> int:
+        """
+        Recover the archive index from its segment files.
+        
+        Returns:
+            Number of archived conversations found
+        """
+        with self.lock:
+            return self.archive.rebuild_index(exclude_ids=self._iter_hot_conversation_ids())
+    
+    # ===== Bulk Operations =====
+    
+    def iter_conversations(self):
+        """Yield every stored conversation in full, one at a time."""
+        for conversation_id in self.iter_conversation_ids():
+            conversation = self.get_conversation(conversation_id)
+            if conversation:
+                yield conversation
+    
+    def import_conversation(self, conversation: Dict[str, Any], save_index: bool = True) -> None:
+        """
+        Store a full conversation (header plus messages) in the hot store,
+        replacing any existing copy.
+        
+        Participants' user profiles are not modified.
+        
+        Args:
+            conversation: Conversation dict including its "messages"
+            save_index: Persist the participant index immediately (pass False
+                        for bulk imports and call participant_index.save() once)
+        """
+        conversation_id = conversation["conversation_id"]
+        
+        with self.lock:
+            self.message_store.create(conversation_id, conversation.get("messages", []))
+            self._save_conversation(conversation)
+            self.archive.remove(conversation_id)
+        
+        self.participant_index.add(conversation_id, conversation.get("participants", []), save=save_index)
+    
     # ===== Helper Functions =====
     
     def _get_user_name(self, user_id: str) -> str:
         """Get a user's name from their ID."""
-        if user_id == "jupiter":
-            return "Jupiter"
-            
-        user = self.user_data_manager.get_user_by_id(user_id)
-        return user.get("name", "User") if user else "User"
+        return self._get_user_names([user_id])[user_id]
+    
+    def _get_user_names(self, user_ids: List[str]) -> Dict[str, str]:
+        """Resolve user IDs to names in one batch ("User" for unknown IDs)."""
+        names = self.user_data_manager.get_user_names([uid for uid in user_ids if uid != "jupiter"])
+        names["jupiter"] = "Jupiter"
+        return {user_id: names.get(user_id, "User") for user_id in set(user_ids) | {"jupiter"}}
     
     def add_participant(self, conversation_id: str, user_id: str) -> bool:
         """
@@ -341,7 +843,7 @@ class ConversationManager:
         Returns:
             True if successful, False otherwise
         """
-        conversation = self.get_conversation(conversation_id)
+        conversation = self._ensure_hot(conversation_id)
         
         if not conversation:
             return False
@@ -349,6 +851,7 @@ class ConversationManager:
         if user_id not in conversation["participants"]:
             conversation["participants"].append(user_id)
             self._save_conversation(conversation)
+            self.participant_index.add(conversation_id, [user_id])
             self._add_conversation_to_user(user_id, conversation_id)
             return True
             
@@ -366,29 +869,14 @@ class ConversationManager:
         """
         if not user_ids:
             return []
-            
-        # Get first user's conversations
-        user = self.user_data_manager.get_user_by_id(user_ids[0])
-        
-        if not user or "conversations" not in user:
-            return []
-            
-        # Start with all of first user's conversations
-        potential_shared = set(user["conversations"])
         
-        # Intersect with each additional user's conversations
-        for user_id in user_ids[1:]:
-            user = self.user_data_manager.get_user_by_id(user_id)
-            
-            if not user or "conversations" not in user:
-                return []
-                
-            potential_shared.intersection_update(user["conversations"])
+        # Intersect participant bitmaps in memory
+        potential_shared = self.participant_index.shared(user_ids)
         
         # Retrieve the shared conversations
         results = []
         for conv_id in potential_shared:
-            conv = self.get_conversation(conv_id)
+            conv = self._load_header(conv_id)
             if conv:
                 # Create a summary with limited info
                 summary = {
@@ -396,7 +884,7 @@ class ConversationManager:
                     "title": conv["title"],
                     "created_at": conv["created_at"],
                     "participants": conv["participants"],
-                    "message_count": len(conv["messages"])
+                    "message_count": self._count_messages(conv_id)
                 }
                 results.append(summary)
                 
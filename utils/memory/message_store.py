@@ -0,0 +1,198 @@
+import os
+import json
+import struct
+import threading
+from typing import List, Dict, Any, Optional, Iterator
+
+# Each index entry is the byte offset of one message line in the messages file
+OFFSET_FORMAT = "<Q"
+OFFSET_SIZE = struct.calcsize(OFFSET_FORMAT)
+
+def page_bounds(total: int, offset: int = 0, limit: Optional[int] = None, from_end: bool = False):
+    """
+    Convert a page request into a [start, end) range of message positions.
+
+    Args:
+        total: Number of messages available
+        offset: Messages to skip (from the newest message when from_end is True)
+        limit: Maximum page size (None for no limit)
+        from_end: Count the page back from the end
+
+    Returns:
+        (start, end) tuple, with start >= end for an empty page
+    """
+    offset = max(0, offset)
+    if from_end:
+        end = max(0, total - offset)
+        start = 0 if limit is None else max(0, end - limit)
+    else:
+        start = min(offset, total)
+        end = total if limit is None else min(total, start + limit)
+    return start, end
+
+class MessageStore:
+    """
+    Append-only message storage for a directory of conversations.
+
+    Messages for each conversation are kept as one compact JSON object per line
+    in "<conversation_id>.messages.jsonl", alongside "<conversation_id>.idx",
+    a fixed-width table of byte offsets into that file. The offset table makes
+    message counts and paged reads (from either end) independent of the
+    conversation length.
+    """
+
+    def __init__(self, storage_path: str):
+        """
+        Initialize the MessageStore.
+
+        Args:
+            storage_path: Directory containing the conversation files
+        """
+        self.storage_path = storage_path
+        self.lock = threading.RLock()  # Thread-safe appends
+        os.makedirs(storage_path, exist_ok=True)
+
+    def _messages_path(self, conversation_id: str) -> str:
+        return os.path.join(self.storage_path, f"{conversation_id}.messages.jsonl")
+
+    def _index_path(self, conversation_id: str) -> str:
+        return os.path.join(self.storage_path, f"{conversation_id}.idx")
+
+    def exists(self, conversation_id: str) -> bool:
+        """Check whether message files exist for a conversation."""
+        return os.path.exists(self._index_path(conversation_id))
+
+    def create(self, conversation_id: str, messages: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Create (or overwrite) the message files for a conversation.
+
+        Args:
+            conversation_id: UUID of the conversation
+            messages: Initial messages to write, oldest first
+        """
+        with self.lock:
+            offsets = bytearray()
+            position = 0
+
+            with open(self._messages_path(conversation_id), 'wb') as f:
+                for message in messages or []:
+                    line = self._encode(message)
+                    offsets += struct.pack(OFFSET_FORMAT, position)
+                    f.write(line)
+                    position += len(line)
+
+            with open(self._index_path(conversation_id), 'wb') as f:
+                f.write(bytes(offsets))
+
+    def append(self, conversation_id: str, message: Dict[str, Any]) -> int:
+        """
+        Append a message to a conversation.
+
+        The message line is written before its offset entry, so an interrupted
+        append leaves at most an unindexed trailing line that readers ignore.
+
+        Returns:
+            The new message count
+        """
+        with self.lock:
+            if not self.exists(conversation_id):
+                self.create(conversation_id)
+
+            line = self._encode(message)
+
+            with open(self._messages_path(conversation_id), 'ab') as f:
+                position = f.seek(0, os.SEEK_END)
+                f.write(line)
+
+            with open(self._index_path(conversation_id), 'ab') as f:
+                f.write(struct.pack(OFFSET_FORMAT, position))
+                count = f.tell() // OFFSET_SIZE
+
+            return count
+
+    def last_modified(self, conversation_id: str) -> float:
+        """Return the time of the last append (0 if missing)."""
+        try:
+            return os.path.getmtime(self._index_path(conversation_id))
+        except OSError:
+            return 0.0
+
+    def count(self, conversation_id: str) -> int:
+        """Return the number of messages in a conversation (0 if missing)."""
+        try:
+            return os.path.getsize(self._index_path(conversation_id)) // OFFSET_SIZE
+        except OSError:
+            return 0
+
+    def read(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None,
+             from_end: bool = False) -> List[Dict[str, Any]]:
+        """
+        Read a page of messages, always returned oldest first.
+
+        Args:
+            conversation_id: UUID of the conversation
+            offset: Number of messages to skip, counted from the start
+                    (or from the newest message when from_end is True)
+            limit: Maximum number of messages to return (None for all)
+            from_end: Page backwards from the newest message
+
+        Returns:
+            List of message dicts
+        """
+        total = self.count(conversation_id)
+        start, end = page_bounds(total, offset, limit, from_end)
+
+        if start >= end:
+            return []
+
+        return self._read_range(conversation_id, start, end, total)
+
+    def iter_messages(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        """Stream every indexed message of a conversation, oldest first."""
+        total = self.count(conversation_id)
+        if not total:
+            return
+
+        try:
+            with open(self._messages_path(conversation_id), 'rb') as f:
+                for i, line in enumerate(f):
+                    if i >= total:
+                        break
+                    yield json.loads(line)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading messages for {conversation_id}: {e}")
+
+    def delete(self, conversation_id: str) -> None:
+        """Remove the message files for a conversation."""
+        with self.lock:
+            for path in (self._messages_path(conversation_id), self._index_path(conversation_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _read_range(self, conversation_id: str, start: int, end: int, total: int) -> List[Dict[str, Any]]:
+        """Read messages [start, end) using the offset index."""
+        try:
+            with open(self._index_path(conversation_id), 'rb') as f:
+                f.seek(start * OFFSET_SIZE)
+                # One extra entry (when available) gives the end of the byte range
+                entries = min(end, total - 1) - start + 1
+                raw = f.read(entries * OFFSET_SIZE)
+
+            offsets = [value for (value,) in struct.iter_unpack(OFFSET_FORMAT, raw)]
+
+            with open(self._messages_path(conversation_id), 'rb') as f:
+                f.seek(offsets[0])
+                if end < total:
+                    data = f.read(offsets[end - start] - offsets[0])
+                else:
+                    data = f.read()
+
+            lines = data.splitlines()[:end - start]
+            return [json.loads(line) for line in lines]
+        except (OSError, IndexError, json.JSONDecodeError) as e:
+            print(f"Error reading messages for {conversation_id}: {e}")
+            return []
+
+    @staticmethod
+    def _encode(message: Dict[str, Any]) -> bytes:
+        return (json.dumps(message, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
@@ -0,0 +1,142 @@
+import os
+import json
+import threading
+from typing import List, Iterable, Tuple
+
+class ParticipantIndex:
+    """
+    In-memory participant -> conversation index.
+
+    Every conversation gets a small integer ordinal, and each participant is
+    represented by a bitmap (a Python int) with one bit set per conversation
+    they take part in. N-way shared-conversation queries are a bitwise AND of
+    the participants' bitmaps, with no user or conversation files touched.
+    The index is persisted as a JSON snapshot with hex-encoded bitmaps.
+
+    When two users are linked, the source's bitmap is folded into the
+    target's and the source ID is kept as an alias, so later adds and
+    rebuilds from conversation headers still credit the target.
+    """
+
+    def __init__(self, index_file: str):
+        """
+        Initialize the ParticipantIndex.
+
+        Args:
+            index_file: Path of the JSON snapshot
+        """
+        self.index_file = index_file
+        self.lock = threading.RLock()
+        self.conversation_ids = []
+        self.ordinals = {}
+        self.bitmaps = {}
+        self.aliases = {}
+        self.loaded = self._load()
+
+    def _load(self) -> bool:
+        """Load the snapshot. Returns False if it is missing or unreadable."""
+        if not os.path.exists(self.index_file):
+            return False
+
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading participant index: {e}")
+            return False
+
+        self.conversation_ids = data.get("conversations", [])
+        self.ordinals = {conv_id: i for i, conv_id in enumerate(self.conversation_ids)}
+        self.bitmaps = {user_id: int(bitmap, 16) for user_id, bitmap in data.get("participants", {}).items()}
+        self.aliases = data.get("aliases", {})
+        return True
+
+    def save(self) -> None:
+        """Write the snapshot atomically."""
+        with self.lock:
+            data = {
+                "conversations": self.conversation_ids,
+                "participants": {user_id: format(bitmap, 'x') for user_id, bitmap in self.bitmaps.items()},
+                "aliases": self.aliases
+            }
+            temp_file = self.index_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_file, self.index_file)
+
+    def _ordinal(self, conversation_id: str) -> int:
+        if conversation_id not in self.ordinals:
+            self.ordinals[conversation_id] = len(self.conversation_ids)
+            self.conversation_ids.append(conversation_id)
+        return self.ordinals[conversation_id]
+
+    def add(self, conversation_id: str, user_ids: Iterable[str], save: bool = True) -> None:
+        """Record that the given users participate in a conversation."""
+        with self.lock:
+            bit = 1 << self._ordinal(conversation_id)
+            for user_id in user_ids:
+                if user_id:
+                    user_id = self.aliases.get(user_id, user_id)
+                    self.bitmaps[user_id] = self.bitmaps.get(user_id, 0) | bit
+            if save:
+                self.save()
+
+    def merge(self, source_id: str, target_id: str, save: bool = True) -> None:
+        """Fold a linked user's conversations into the user they were merged into."""
+        with self.lock:
+            target_id = self.aliases.get(target_id, target_id)
+            if source_id == target_id:
+                return
+            self.bitmaps[target_id] = self.bitmaps.get(target_id, 0) | self.bitmaps.pop(source_id, 0)
+
+            # Anything merged into the source earlier now resolves to the target
+            for alias, user_id in self.aliases.items():
+                if user_id == source_id:
+                    self.aliases[alias] = target_id
+            self.aliases[source_id] = target_id
+            if save:
+                self.save()
+
+    def rebuild(self, memberships: Iterable[Tuple[str, List[str]]]) -> int:
+        """
+        Replace the index contents from (conversation_id, participants) pairs.
+
+        Returns:
+            Number of conversations indexed
+        """
+        with self.lock:
+            self.conversation_ids = []
+            self.ordinals = {}
+            self.bitmaps = {}
+            count = 0
+            for conversation_id, participants in memberships:
+                self.add(conversation_id, participants, save=False)
+                count += 1
+            self.save()
+            self.loaded = True
+            return count
+
+    def _expand(self, bitmap: int) -> List[str]:
+        """Convert a bitmap into conversation IDs, oldest first."""
+        ids = []
+        while bitmap:
+            lowest = bitmap & -bitmap
+            ids.append(self.conversation_ids[lowest.bit_length() - 1])
+            bitmap ^= lowest
+        return ids
+
+    def conversations_for(self, user_id: str) -> List[str]:
+        """All conversations a user participates in, oldest first."""
+        with self.lock:
+            return self._expand(self.bitmaps.get(user_id, 0))
+
+    def shared(self, user_ids: Iterable[str]) -> List[str]:
+        """Conversations that every one of the given users participates in."""
+        with self.lock:
+            result = None
+            for user_id in user_ids:
+                bitmap = self.bitmaps.get(user_id, 0)
+                result = bitmap if result is None else result & bitmap
+                if not result:
+                    return []
+            return self._expand(result or 0)
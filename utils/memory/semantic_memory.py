@@ -0,0 +1,491 @@
+import os
+import re
+import json
+import math
+import zlib
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger("jupiter.memory")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']{2,}")
+
+# Vectors are stored at half precision; scores are computed in float32
+STORAGE_DTYPE = np.float16
+
+class HashedTfidfEmbedder:
+    """
+    Model-free embedder using the hashing trick.
+
+    Tokens are hashed into a fixed number of signed buckets, weighted by
+    sublinear term frequency and a smoothed inverse document frequency taken
+    from the document counts the index has seen so far.
+    """
+
+    name = "hashed"
+    remote = False
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+        self.doc_freq = np.zeros(dimensions, dtype=np.float32)
+        self.doc_count = 0
+
+    def _bucket_counts(self, text: str) -> Dict[int, float]:
+        counts = {}
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            # Bare numbers are mostly unique and only add hash collisions
+            if token.isdigit():
+                continue
+            h = zlib.crc32(token.encode('utf-8'))
+            bucket = h % self.dimensions
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        return counts
+
+    def embed(self, texts: List[str], update_stats: bool = False) -> np.ndarray:
+        """Return an L2-normalized float32 matrix with one row per text."""
+        bucket_counts = [self._bucket_counts(text) for text in texts]
+
+        if update_stats:
+            for counts in bucket_counts:
+                for bucket in counts:
+                    self.doc_freq[bucket] += 1
+            self.doc_count += len(texts)
+
+        idf = np.log((1.0 + self.doc_count) / (1.0 + self.doc_freq)) + 1.0
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+
+        for row, counts in enumerate(bucket_counts):
+            for bucket, count in counts.items():
+                if count:
+                    weight = 1.0 + math.log(abs(count))
+                    vectors[row, bucket] = math.copysign(weight, count) * idf[bucket]
+
+        return _normalize(vectors)
+
+class LLMEmbedder:
+    """Embedder backed by the local LLM backend's embedding endpoint."""
+
+    name = "llm"
+    remote = True
+
+    def __init__(self, llm_client, model: str, dimensions: Optional[int] = None):
+        self.llm_client = llm_client
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed(self, texts: List[str], update_stats: bool = False) -> Optional[np.ndarray]:
+        """Return an L2-normalized float32 matrix, or None if the backend failed."""
+        embeddings = self.llm_client.generate_embeddings(texts, model=self.model)
+        if embeddings is None:
+            return None
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dimensions is None:
+            self.dimensions = vectors.shape[1]
+        elif vectors.shape[1] != self.dimensions:
+            logger.error(f"Embedding size changed from {self.dimensions} to {vectors.shape[1]}, skipping batch")
+            return None
+
+        return _normalize(vectors)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class SemanticMemory:
+    """
+    Local vector index over past conversation messages.
+
+    Vectors are stored in a float16 memmap ("vectors.f16") with one row per
+    message, and the matching message metadata in "entries.jsonl". Messages
+    are embedded in batches on a background thread; searches scan the matrix
+    in fixed-size blocks and keep a running top-k by cosine similarity.
+
+    Only each row's conversation and entry file offset are kept in memory;
+    the entries of the top-k hits are read back from "entries.jsonl".
+    """
+
+    BLOCK_ROWS = 4096
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, storage_path: str, config: Dict[str, Any], llm_client=None):
+        """
+        Initialize the SemanticMemory.
+
+        Args:
+            storage_path: Directory for the index files
+            config: The "memory" section of the application config
+            llm_client: LLM client used when the "llm" backend is configured
+        """
+        self.storage_path = storage_path
+        self.config = config
+        self.min_chars = config.get('min_message_chars', 12)
+        self.batch_size = config.get('batch_size', 32)
+        # lock guards the index state searches read; index_lock serializes
+        # writers, which may hold it across a remote embedding call
+        self.lock = threading.RLock()
+        self.index_lock = threading.Lock()
+        os.makedirs(storage_path, exist_ok=True)
+
+        self.vectors_file = os.path.join(storage_path, "vectors.f16")
+        self.entries_file = os.path.join(storage_path, "entries.jsonl")
+        self.meta_file = os.path.join(storage_path, "meta.json")
+        self.doc_freq_file = os.path.join(storage_path, "doc_freq.npy")
+
+        if config.get('backend', 'hashed') == 'llm' and llm_client is not None:
+            self.embedder = LLMEmbedder(llm_client, config.get('embedding_model', 'nomic-embed-text'))
+        else:
+            self.embedder = HashedTfidfEmbedder(config.get('dimensions', 1024))
+
+        self.count = 0
+        self.message_ids = set()
+        self.row_conversations = np.zeros(0, dtype=np.int32)
+        self.row_offsets = np.zeros(0, dtype=np.int64)
+        self.conversation_ordinals = {}
+        self.vectors = None
+        self.capacity = 0
+        self.backfilled = False  # Every stored conversation has been indexed once
+        self._load()
+
+        # Background indexing
+        self.pending = queue.Queue()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True, name="SemanticMemoryThread")
+        self.worker_thread.start()
+
+    # ===== Persistence =====
+
+    def _load(self):
+        """Load an existing index, discarding it if the embedder changed."""
+        meta = {}
+        if os.path.exists(self.meta_file):
+            try:
+                with open(self.meta_file, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                logger.error(f"Error loading memory index metadata: {e}")
+
+        expected_dims = self.embedder.dimensions
+        if meta and (meta.get('backend') != self.embedder.name or
+                     (expected_dims is not None and meta.get('dimensions') != expected_dims)):
+            logger.info("Memory embedder changed, starting a new index")
+            meta = {}
+
+        if not meta:
+            for path in (self.vectors_file, self.entries_file, self.doc_freq_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+
+        self.embedder.dimensions = meta['dimensions']
+        self.backfilled = meta.get('backfilled', False)
+        if isinstance(self.embedder, HashedTfidfEmbedder):
+            self.embedder.doc_count = meta.get('doc_count', 0)
+            if os.path.exists(self.doc_freq_file):
+                self.embedder.doc_freq = np.load(self.doc_freq_file)
+
+        self.capacity = meta.get('capacity', 0)
+        if not self.capacity or not os.path.exists(self.vectors_file):
+            self._reset_rows()
+            return
+
+        self.vectors = np.memmap(self.vectors_file, dtype=STORAGE_DTYPE, mode='r+',
+                                 shape=(self.capacity, self.embedder.dimensions))
+
+        # Entries are written after their vectors, so they define the valid row count
+        message_ids = set()
+        ordinals = []
+        offsets = []
+        end = 0
+        if os.path.exists(self.entries_file):
+            with open(self.entries_file, 'rb') as f:
+                for line in f:
+                    if len(offsets) >= self.capacity:
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        break
+                    message_ids.add(entry['message_id'])
+                    ordinals.append(self._conversation_ordinal(entry['conversation_id']))
+                    offsets.append(end)
+                    end += len(line)
+
+            # Drop a torn last line so new entries start on a line of their own
+            if os.path.getsize(self.entries_file) > end:
+                with open(self.entries_file, 'r+b') as f:
+                    f.truncate(end)
+
+        self.count = len(offsets)
+        self.message_ids = message_ids
+        self.row_conversations = np.asarray(ordinals, dtype=np.int32)
+        self.row_offsets = np.asarray(offsets, dtype=np.int64)
+
+    def _reset_rows(self):
+        self.count = 0
+        self.message_ids = set()
+        self.row_conversations = np.zeros(0, dtype=np.int32)
+        self.row_offsets = np.zeros(0, dtype=np.int64)
+
+    def _read_entries(self, rows: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Read the entries of the given rows back from the entries file."""
+        entries = {}
+        with open(self.entries_file, 'rb') as f:
+            for row in sorted(rows):
+                f.seek(int(self.row_offsets[row]))
+                entries[row] = json.loads(f.readline())
+        return entries
+
+    def _conversation_ordinal(self, conversation_id: str) -> int:
+        if conversation_id not in self.conversation_ordinals:
+            self.conversation_ordinals[conversation_id] = len(self.conversation_ordinals)
+        return self.conversation_ordinals[conversation_id]
+
+    def _ensure_capacity(self, rows: int):
+        """Grow the vector memmap (doubling) so it can hold the given number of rows."""
+        if self.vectors is not None and rows <= self.capacity:
+            return
+
+        new_capacity = max(self.INITIAL_CAPACITY, self.capacity)
+        while new_capacity < rows:
+            new_capacity *= 2
+
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+
+        with open(self.vectors_file, 'ab') as f:
+            f.truncate(new_capacity * self.embedder.dimensions * np.dtype(STORAGE_DTYPE).itemsize)
+
+        self.capacity = new_capacity
+        self.vectors = np.memmap(self.vectors_file, dtype=STORAGE_DTYPE, mode='r+',
+                                 shape=(self.capacity, self.embedder.dimensions))
+
+    def _save_meta(self):
+        meta = {
+            "backend": self.embedder.name,
+            "dimensions": self.embedder.dimensions,
+            "capacity": self.capacity,
+            "count": self.count,
+            "backfilled": self.backfilled
+        }
+        if isinstance(self.embedder, HashedTfidfEmbedder):
+            meta["doc_count"] = self.embedder.doc_count
+            np.save(self.doc_freq_file, self.embedder.doc_freq)
+
+        with open(self.meta_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    # ===== Indexing =====
+
+    def _should_index(self, message: Dict[str, Any]) -> bool:
+        """Skip very short messages and slash commands."""
+        content = message.get('content', '').strip()
+        return len(content) >= self.min_chars and not content.startswith('/')
+
+    def add_message(self, conversation_id: str, message: Dict[str, Any]) -> None:
+        """Queue a stored message for indexing (non-blocking)."""
+        if self._should_index(message):
+            self.pending.put((conversation_id, message))
+
+    def add_messages(self, conversation_id: str, messages: Iterable[Dict[str, Any]]) -> int:
+        """Index a batch of messages synchronously. Returns the number indexed."""
+        batch = [(conversation_id, message) for message in messages if self._should_index(message)]
+        indexed = 0
+        for i in range(0, len(batch), self.batch_size):
+            indexed += self._index_batch(batch[i:i + self.batch_size])
+        return indexed
+
+    def mark_backfilled(self) -> None:
+        """Record that all previously stored messages have been indexed."""
+        with self.lock:
+            self.backfilled = True
+            self._save_meta()
+
+    def flush(self) -> None:
+        """Block until all queued messages have been indexed."""
+        self.pending.join()
+
+    def _worker_loop(self):
+        """Drain the pending queue in batches."""
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._index_batch(batch)
+            except Exception as e:
+                logger.error(f"Error indexing messages: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+
+    def _embed(self, texts: List[str], update_stats: bool = False) -> Optional[np.ndarray]:
+        """Embed texts, holding the index lock only for local embedders."""
+        if self.embedder.remote:
+            return self.embedder.embed(texts, update_stats=update_stats)
+        with self.lock:
+            return self.embedder.embed(texts, update_stats=update_stats)
+
+    def _index_batch(self, batch) -> int:
+        with self.index_lock:
+            with self.lock:
+                batch = [(conv_id, msg) for conv_id, msg in batch if msg.get('message_id') not in self.message_ids]
+            if not batch:
+                return 0
+
+            # Searches keep running while a remote backend embeds the batch
+            vectors = self._embed([msg['content'] for _, msg in batch], update_stats=True)
+            if vectors is None:
+                return 0
+
+            with self.lock:
+                start = self.count
+                self._ensure_capacity(start + len(batch))
+                self.vectors[start:start + len(batch)] = vectors
+                self.vectors.flush()
+
+                lines = []
+                for conversation_id, message in batch:
+                    lines.append(json.dumps({
+                        "message_id": message.get('message_id'),
+                        "conversation_id": conversation_id,
+                        "sender_id": message.get('sender_id'),
+                        "type": message.get('type'),
+                        "timestamp": message.get('timestamp', 0),
+                        "content": message['content']
+                    }, ensure_ascii=False).encode('utf-8') + b"\n")
+
+                offsets = []
+                with open(self.entries_file, 'ab') as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    for line in lines:
+                        offsets.append(offset)
+                        offset += len(line)
+                    f.write(b"".join(lines))
+
+                self.message_ids.update(message.get('message_id') for _, message in batch)
+                ordinals = [self._conversation_ordinal(conversation_id) for conversation_id, _ in batch]
+                self.row_conversations = np.concatenate(
+                    [self.row_conversations, np.asarray(ordinals, dtype=np.int32)]
+                )
+                self.row_offsets = np.concatenate([self.row_offsets, np.asarray(offsets, dtype=np.int64)])
+                self.count += len(batch)
+
+                self._save_meta()
+                return len(batch)
+
+    def clear(self) -> None:
+        """Drop the whole index."""
+        with self.index_lock, self.lock:
+            self.vectors = None
+            self.capacity = 0
+            self.backfilled = False
+            for path in (self.vectors_file, self.entries_file, self.meta_file, self.doc_freq_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            if isinstance(self.embedder, HashedTfidfEmbedder):
+                self.embedder.doc_freq = np.zeros(self.embedder.dimensions, dtype=np.float32)
+                self.embedder.doc_count = 0
+            self._reset_rows()
+
+    # ===== Retrieval =====
+
+    def search(self, query: str, conversation_ids: Optional[Iterable[str]] = None,
+               exclude_message_ids: Optional[Iterable[str]] = None,
+               top_k: int = 5, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Find the stored messages most similar to a query.
+
+        Args:
+            query: Text to search for
+            conversation_ids: Only consider messages from these conversations
+            exclude_message_ids: Message IDs to leave out (e.g. the live context)
+            top_k: Maximum number of results
+            min_score: Minimum cosine similarity
+
+        Returns:
+            Entry dicts with an added "score", best first
+        """
+        if not self.count or not query.strip():
+            return []
+
+        query_vector = self._embed([query])
+        if query_vector is None:
+            return []
+        query_vector = query_vector[0]
+
+        with self.lock:
+            count = self.count
+            if not count:
+                return []
+
+            allowed = None
+            if conversation_ids is not None:
+                ordinals = [self.conversation_ordinals[c] for c in conversation_ids if c in self.conversation_ordinals]
+                if not ordinals:
+                    return []
+                allowed = np.asarray(ordinals, dtype=np.int32)
+
+            excluded = set(exclude_message_ids or ())
+            # Over-fetch so exclusions don't starve the result list
+            k = top_k + len(excluded)
+
+            best_scores = np.zeros(0, dtype=np.float32)
+            best_rows = np.zeros(0, dtype=np.int64)
+
+            for start in range(0, count, self.BLOCK_ROWS):
+                end = min(count, start + self.BLOCK_ROWS)
+                scores = self.vectors[start:end].astype(np.float32) @ query_vector
+
+                mask = scores >= min_score
+                if allowed is not None:
+                    mask &= np.isin(self.row_conversations[start:end], allowed)
+
+                rows = np.nonzero(mask)[0]
+                if not rows.size:
+                    continue
+
+                best_scores = np.concatenate([best_scores, scores[rows]])
+                best_rows = np.concatenate([best_rows, rows + start])
+
+                if best_scores.size > k:
+                    keep = np.argpartition(-best_scores, k)[:k]
+                    best_scores = best_scores[keep]
+                    best_rows = best_rows[keep]
+
+            order = np.argsort(-best_scores)
+            entries = self._read_entries([int(row) for row in best_rows[order]])
+
+            results = []
+            for i in order:
+                entry = entries[int(best_rows[i])]
+                if entry['message_id'] in excluded:
+                    continue
+                result = dict(entry)
+                result['score'] = float(best_scores[i])
+                results.append(result)
+                if len(results) >= top_k:
+                    break
+
+            return results
+
+    @staticmethod
+    def format_snippet(entry: Dict[str, Any], sender_name: str, max_chars: int = 200) -> str:
+        """Format a search result as a single prompt line."""
+        content = " ".join(entry['content'].split())
+        if len(content) > max_chars:
+            content = content[:max_chars - 3] + "..."
+        date_str = datetime.fromtimestamp(entry.get('timestamp') or 0).strftime("%Y-%m-%d")
+        return f"- [{date_str}] {sender_name}: {content}"
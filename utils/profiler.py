@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import pstats
+import logging
+import cProfile
+import datetime
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from utils.log_retention import unique_path
+
+logger = logging.getLogger("jupiter.profiler")
+
+MODES = ("cprofile", "sample")
+
+class ProfileSession:
+    """State of one profiling run"""
+
+    def __init__(self, mode, turns=None, seconds=None):
+        self.mode = mode
+        self.max_turns = turns
+        self.deadline = time.time() + seconds if seconds else None
+        self.started_at = time.time()
+        self.turns = 0
+        self.profiles = []       # cProfile.Profile per finished turn (cprofile mode)
+        self.stacks = Counter()  # Collapsed stack -> samples (sample mode)
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+class Profiler:
+    """Opt-in profiling of the next N turns or a time window
+
+    Two modes:
+    - "cprofile" profiles each turn deterministically on the thread that
+      runs it (terminal, voice or Discord) and writes the merged pstats,
+      plus a text summary, to logs/profiles/.
+    - "sample" samples the stacks of every thread (main, Discord,
+      wake-word processing, ...) every sample_interval seconds and writes
+      collapsed stacks (one "thread;frame;...;frame count" line per stack,
+      the input format of flame graph tools) to logs/profiles/.
+
+    Turns are counted through turn(), which the tracer calls for every turn.
+    """
+
+    def __init__(self, logs_folder, sample_interval=0.005):
+        self.profiles_folder = os.path.join(logs_folder, "profiles")
+        self.sample_interval = sample_interval
+        self.session = None
+        self.last_output = None
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self, mode="cprofile", turns=None, seconds=None):
+        """Profile the next `turns` turns or the next `seconds` seconds (whichever ends first)
+
+        Returns:
+            str: Status message
+        """
+        if mode not in MODES:
+            return f"Unknown profiling mode '{mode}' (use {' or '.join(MODES)})"
+        if not turns and not seconds:
+            return "Give a number of turns or seconds to profile"
+
+        with self.lock:
+            if self.session:
+                return "A profile is already running; stop it first"
+            session = ProfileSession(mode, turns, seconds)
+            self.session = session
+
+        if mode == "sample":
+            session.thread = threading.Thread(target=self._sample_loop, args=(session,), daemon=True,
+                                              name="ProfilerSampleThread")
+            session.thread.start()
+        elif seconds:
+            # Turns end the session themselves; a window needs a timer
+            session.thread = threading.Thread(target=self._window_loop, args=(session,), daemon=True,
+                                              name="ProfilerTimerThread")
+            session.thread.start()
+
+        limits = [f"{turns} turns" if turns else None, f"{seconds} seconds" if seconds else None]
+        return f"Profiling ({mode}) for the next {' or '.join(limit for limit in limits if limit)}"
+
+    def stop(self):
+        """End the running profile early and write what it has
+
+        Returns:
+            str: Path of the profile written, or None
+        """
+        with self.lock:
+            session = self.session
+        if not session:
+            return None
+        return self._finish(session)
+
+    def status(self):
+        with self.lock:
+            session = self.session
+        if not session:
+            return "Not profiling" + (f" (last profile: {self.last_output})" if self.last_output else "")
+
+        elapsed = time.time() - session.started_at
+        status = f"Profiling ({session.mode}) for {elapsed:.0f}s, {session.turns} turns"
+        if session.max_turns:
+            status += f" of {session.max_turns}"
+        if session.deadline:
+            status += f", {max(0, session.deadline - time.time()):.0f}s left"
+        return status
+
+    @contextmanager
+    def turn(self, platform=None):
+        """Count (and in cprofile mode, profile) one turn; nested calls join the outer turn"""
+        session = self.session
+        if session is None or getattr(self._local, "active", False):
+            yield
+            return
+
+        self._local.active = True
+        profile = None
+        if session.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                profile = None  # Another profiler owns this thread
+        try:
+            yield
+        finally:
+            self._local.active = False
+            if profile:
+                profile.disable()
+            self._turn_finished(session, profile)
+
+    def _turn_finished(self, session, profile):
+        with self.lock:
+            if self.session is not session:
+                return  # Finished while this turn ran
+            session.turns += 1
+            if profile:
+                session.profiles.append(profile)
+            done = session.max_turns and session.turns >= session.max_turns
+        if done:
+            self._finish(session)
+
+    def _window_loop(self, session):
+        if not session.stop_event.wait(max(0, session.deadline - time.time())):
+            self._finish(session)
+
+    def _sample_loop(self, session):
+        """Sample every other thread's stack until the session ends"""
+        own_ident = threading.get_ident()
+        while not session.stop_event.wait(self.sample_interval):
+            if session.deadline and time.time() >= session.deadline:
+                self._finish(session)
+                break
+
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                session.stacks[";".join(reversed(stack))] += 1
+            session.samples += 1
+
+    def _finish(self, session):
+        """End a session (once) and write its profile"""
+        with self.lock:
+            if self.session is not session:
+                return None
+            self.session = None
+        session.stop_event.set()
+        # The sampler must be done with the stacks before they are written
+        if session.thread and session.thread is not threading.current_thread():
+            session.thread.join()
+
+        os.makedirs(self.profiles_folder, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.profiles_folder, f"profile_{timestamp}_{session.mode}")
+
+        try:
+            if session.mode == "cprofile":
+                if not session.profiles:
+                    logger.info("Profiling ended with no turns profiled")
+                    return None
+                path = unique_path(base, ".pstats")
+                stats = pstats.Stats(*session.profiles)
+                stats.dump_stats(path)
+                with open(path[:-len(".pstats")] + ".txt", 'w', encoding='utf-8') as f:
+                    f.write(f"{session.turns} turns\n\n")
+                    pstats.Stats(path, stream=f).sort_stats("cumulative").print_stats(40)
+            else:
+                path = unique_path(base, ".collapsed")
+                with open(path, 'w', encoding='utf-8') as f:
+                    for stack, count in session.stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error(f"Error writing profile: {e}")
+            return None
+
+        self.last_output = path
+        logger.info(f"Profile written to {path}")
+        return path
@@ -0,0 +1,148 @@
+import os
+import math
+import json
+import time
+import uuid
+import datetime
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager, ExitStack
+
+from utils.log_retention import unique_path
+
+# Stages in pipeline order, for summaries; any other span names follow
+STAGES = ["turn", "intent", "prompt.load", "prompt.profile", "prompt.context", "llm", "validate", "retry",
+          "tts", "persist"]
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+class Tracer:
+    """Records per-turn latency spans to a JSONL trace file
+
+    A turn (one user message, on any platform) is opened with turn(); the
+    spans timed inside it on the same thread share its trace ID, and the
+    turn's own total is recorded as a "turn" span. Spans are written to
+    logs/traces/trace_<timestamp>.jsonl when their turn ends, and the most
+    recent samples_per_stage durations of each stage are kept for summary().
+
+    Turn hooks (such as the profiler) are entered around every turn, even
+    with tracing disabled.
+    """
+
+    def __init__(self, logs_folder, enabled=True, samples_per_stage=1000):
+        self.enabled = enabled
+        self.trace_folder = os.path.join(logs_folder, "traces")
+        self.trace_file = None
+        self.samples = defaultdict(lambda: deque(maxlen=samples_per_stage))
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self.turn_hooks = []
+
+        if enabled:
+            os.makedirs(self.trace_folder, exist_ok=True)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+            self.trace_file = unique_path(os.path.join(self.trace_folder, f"trace_{timestamp}"), ".jsonl")
+
+    def get_trace_file(self):
+        return self.trace_file
+
+    def add_turn_hook(self, hook):
+        """Register a context manager factory, entered with the platform around every turn"""
+        self.turn_hooks.append(hook)
+
+    @contextmanager
+    def turn(self, platform):
+        """Trace one turn; nested calls on the same thread join the turn already open"""
+        if getattr(self._local, "trace", None) is not None:
+            yield
+            return
+
+        with ExitStack() as hooks:
+            for hook in self.turn_hooks:
+                hooks.enter_context(hook(platform))
+
+            if not self.enabled:
+                yield
+                return
+
+            trace = {"trace_id": uuid.uuid4().hex[:12], "platform": platform, "spans": []}
+            self._local.trace = trace
+            started_at = time.time()
+            start = time.perf_counter()
+            error = False
+            try:
+                yield
+            except BaseException:
+                error = True
+                raise
+            finally:
+                self._local.trace = None
+                self._record(trace, "turn", started_at, time.perf_counter() - start, error)
+                self._write(trace["spans"])
+
+    @contextmanager
+    def span(self, name):
+        """Time a stage of the current turn (or a standalone span outside any turn)"""
+        if not self.enabled:
+            yield
+            return
+
+        started_at = time.time()
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            trace = getattr(self._local, "trace", None)
+            span = self._record(trace, name, started_at, time.perf_counter() - start, error)
+            if trace is None:
+                self._write([span])
+
+    def _record(self, trace, name, started_at, duration, error=False):
+        span = {
+            "trace_id": trace["trace_id"] if trace else None,
+            "platform": trace["platform"] if trace else None,
+            "span": name,
+            "start": round(started_at, 6),
+            "ms": round(duration * 1000, 3)
+        }
+        if error:
+            span["error"] = True
+        if trace:
+            trace["spans"].append(span)
+
+        with self.lock:
+            self.samples[name].append(span["ms"])
+        return span
+
+    def _write(self, spans):
+        if not spans:
+            return
+        try:
+            with self.lock:
+                with open(self.trace_file, 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(span) + "\n" for span in spans))
+        except OSError as e:
+            print(f"Error writing trace file: {e}")
+
+    def summary(self):
+        """Get {stage: {"count", "p50", "p95"}} in milliseconds over the recent samples"""
+        with self.lock:
+            samples = {name: sorted(values) for name, values in self.samples.items() if values}
+
+        order = [name for name in STAGES if name in samples] + sorted(name for name in samples if name not in STAGES)
+        return {
+            name: {
+                "count": len(samples[name]),
+                "p50": percentile(samples[name], 0.5),
+                "p95": percentile(samples[name], 0.95)
+            }
+            for name in order
+        }